@@ -0,0 +1,292 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: aio_server.py
+
+File summary:
+    The purpose of this file is to drive the server sockets with asyncio instead of asyncore. asyncore and asynchat are
+    select() based, slow with many sockets and no longer part of current Python releases. asyncio uses the best selector
+    of the platform (epoll on Linux), and any EventLoopPolicy (e.g. uvloop) can be plugged in with --loop.
+
+    AsyncChatHandler is the asyncio counterpart of asyncore_server.ChatHandler. It adds the incoming bytes to the
+    InboundQueue of the connection (see inbound.py), and the RequestRunner has the RequestScheduler of the ChatService
+    split them into frames with the codec of the connection (a new line for 1.0 JSON, the uint32 length for 2.0 binary)
+    and process the requests of all the connections in turns, at the next turn of the loop. The connection is no longer
+    read while too many bytes are waiting. It is the same ChatService that the asyncore engine uses. Responses are
+    written straight to the transport, which only copies them into its own buffer when the socket cannot take them
+    right away. Pushed frames wait in the bounded
+    OutboundQueue of the connection (see outbound.py) until the WriteScheduler flushes it, so that all the frames for a
+    client in one turn of the loop are written with one call. Once the transport buffer is over its high water mark,
+    the frames stay in the queue until asyncio resumes writing.
+
+    The connections count the bytes they read and hand to the transport in the Metrics of the service. With a metrics
+    address the loop also serves the metrics over HTTP, on a loopback port or a Unix socket (see metrics.py).
+
+    Requires Python 3.
+"""
+
+import asyncio
+import importlib
+import os
+import selectors
+import time
+import pdu_codec
+import metrics
+from outbound import OutboundQueue
+from inbound import InboundQueue
+
+# Seconds a client of the metrics endpoint has to send its request
+METRICS_TIMEOUT = 5
+
+
+"""A new AsyncChatHandler object is created each time a client connects with the server"""
+class AsyncChatHandler(asyncio.Protocol):
+
+    """Constructor of AsyncChatHandler
+    service -> ChatService that processes the requests of all the clients
+    scheduler -> WriteScheduler flushing the queued frames, None to send every frame as soon as it is pushed
+    runner -> RequestRunner processing the requests of the connections"""
+    def __init__(self, service, scheduler=None, runner=None):
+        # Processes the requests of all the clients
+        self.service = service
+        self.metrics = service.metrics
+        self.scheduler = scheduler
+        self.runner = runner
+        self.transport = None
+
+        # Incoming bytes waiting for their turn
+        self.inbound = InboundQueue(service.rate_limits, time.time())
+
+        # Frames waiting while the transport buffer is full
+        self.outbound = OutboundQueue(service.outbound_limits)
+        self.writing = True
+
+        # Every connection starts with the 1.0 JSON format, REDY can switch it to another format
+        self.setCodec(pdu_codec.CODECS[1.0])
+
+    """Called by asyncio when a client makes a connection with the server"""
+    def connection_made(self, transport):
+        self.transport = transport
+        print('Incoming connection from %s' % repr(transport.get_extra_info('peername')))
+
+        # Updating the client_map with the details of the new client that has connected with the server
+        self.service.connect(self)
+
+    """Called by asyncio when the connection has been closed. The session of the client is removed from the client_map"""
+    def connection_lost(self, exc):
+        self.service.disconnect(self)
+        self.transport = None
+        self.inbound.closed = True
+
+    """Switches the wire format used in both directions on this connection"""
+    def setCodec(self, codec):
+        self.codec = codec
+
+    """Sends an encoded frame to the client. droppable is True for chat messages, see outbound.py. The frame waits in
+    the bounded queue until the scheduler flushes the connection"""
+    def push(self, frame, droppable=False):
+        if self.transport is None:
+            return
+        if not self.outbound.put(frame, droppable):
+            print('Closing the connection of a slow client %s' % repr(self.transport.get_extra_info('peername')))
+            self.abort()
+        elif self.writing:
+            if self.scheduler is not None:
+                self.scheduler.schedule(self)
+            else:
+                self.flush()
+
+    """Closes the connection without sending the queued frames"""
+    def abort(self):
+        if self.transport is not None:
+            self.transport.abort()
+            # connection_lost is called later on, nothing more is pushed or read in the meantime
+            self.transport = None
+            self.inbound.closed = True
+
+    """Writes the queued frames to the transport, up to BATCH_BYTES with each call, until the transport buffer is full"""
+    def flush(self):
+        outbound = self.outbound
+        queued = outbound.bytes
+        while self.writing and outbound.frames and self.transport is not None:
+            self.transport.writelines(outbound.popBatch())
+        self.metrics.bytes_out += queued - outbound.bytes
+
+    """Called by asyncio when the transport buffer has gone over its high water mark"""
+    def pause_writing(self):
+        self.writing = False
+
+    """Called by asyncio when the transport buffer has drained below its low water mark"""
+    def resume_writing(self):
+        self.writing = True
+        self.flush()
+
+    ## STATEFUL - every complete frame is processed by the ChatService ##
+    """Called by asyncio with the bytes received from the client. The bytes wait in the InboundQueue for the turn of the
+    connection, the connection is no longer read while the queue holds too many of them"""
+    def data_received(self, data):
+        if self.transport is None:
+            return
+        self.metrics.bytes_in += len(data)
+        self.inbound.active = self.service.heartbeats.clock
+        if not self.inbound.feed(data) and self.inbound.reading:
+            self.inbound.reading = False
+            self.transport.pause_reading()
+        self.service.requests.add(self)
+        self.runner.schedule()
+
+    """Called by the RequestScheduler once the InboundQueue has been drained"""
+    def resumeReading(self):
+        if self.transport is not None:
+            self.transport.resume_reading()
+
+
+"""WriteScheduler collects the connections that frames have been pushed to and flushes each of them once, at the next
+turn of the loop or after delay seconds. A message fanned out to a group, or several messages arriving in the same turn,
+then cost one send call per client"""
+class WriteScheduler:
+
+    """Constructor of WriteScheduler
+    loop -> event loop of the server
+    delay -> most seconds a frame waits to be flushed, 0 flushes at the next turn of the loop"""
+    def __init__(self, loop, delay=0.0):
+        self.loop = loop
+        self.delay = delay
+        self.pending = set()        # connections with frames to flush
+        self.scheduled = False      # True while a flush is scheduled
+
+    """Flushes handler along with the other pending connections"""
+    def schedule(self, handler):
+        self.pending.add(handler)
+        if not self.scheduled:
+            self.scheduled = True
+            if self.delay > 0:
+                self.loop.call_later(self.delay, self.flush)
+            else:
+                self.loop.call_soon(self.flush)
+
+    """Flushes every pending connection"""
+    def flush(self):
+        pending = self.pending
+        self.pending = set()
+        self.scheduled = False
+        for handler in pending:
+            handler.flush()
+
+
+"""RequestRunner runs the RequestScheduler of the service at the next turn of the loop once bytes have been received,
+and again as long as requests are waiting. The loop reads the sockets between two runs"""
+class RequestRunner:
+
+    """Constructor of RequestRunner
+    loop -> event loop of the server
+    requests -> RequestScheduler of the service"""
+    def __init__(self, loop, requests):
+        self.loop = loop
+        self.requests = requests
+        self.scheduled = False      # True while a run is scheduled at the next turn of the loop
+        self.timer = None           # run scheduled for the connections waiting for a token, or None
+
+    """Runs the scheduler at the next turn of the loop"""
+    def schedule(self):
+        if not self.scheduled:
+            self.scheduled = True
+            self.loop.call_soon(self.run)
+
+    """Processes up to a quantum of requests and schedules the next run"""
+    def run(self):
+        self.scheduled = False
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        delay = self.requests.run(time.time())
+        if delay == 0:
+            self.schedule()
+        elif delay is not None:
+            self.timer = self.loop.call_later(delay, self.run)
+
+
+"""Answers a single HTTP request on the metrics endpoint with the metrics of service"""
+async def serve_metrics(service, reader, writer):
+    try:
+        request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), METRICS_TIMEOUT)
+        writer.write(metrics.httpResponse(request.split(b"\r\n", 1)[0], service.metrics))
+        await writer.drain()
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+"""Starts the metrics endpoint of service on address, a (host, port) pair or the path of a Unix socket"""
+async def start_metrics(service, address):
+    handler = lambda reader, writer: serve_metrics(service, reader, writer)
+    if isinstance(address, tuple):
+        server = await asyncio.start_server(handler, address[0], address[1], reuse_address=True)
+    else:
+        if os.path.exists(address):
+            os.unlink(address)
+        server = await asyncio.start_unix_server(handler, address)
+    print('Metrics served on %s' % (address if isinstance(address, str) else "%s:%d" % address))
+    return server
+
+
+"""Returns a new event loop. module is the name of a module providing an EventLoopPolicy (e.g. uvloop), without it the
+loop uses the default selector of the platform, which is epoll on Linux"""
+def new_event_loop(module=None):
+    if module:
+        policy = importlib.import_module(module).EventLoopPolicy()
+        asyncio.set_event_loop_policy(policy)
+        loop = policy.new_event_loop()
+    else:
+        loop = asyncio.SelectorEventLoop(selectors.DefaultSelector())
+    asyncio.set_event_loop(loop)
+    return loop
+
+
+"""Starts the asyncio engine and serves until the process is stopped
+sock -> already listening socket to serve instead of binding host and port
+reuse_port -> binds with SO_REUSEPORT so that several processes can listen on the same port
+startup -> coroutine function called with the loop before the server starts accepting connections
+metrics_address -> address of the metrics endpoint (see metrics.endpointAddress), None serves no endpoint"""
+def run(service, host, port, loop_module=None, sock=None, reuse_port=False, startup=None, metrics_address=None):
+    loop = new_event_loop(loop_module)
+
+    # The workers of the CredentialPool hand their results back to the loop
+    service.credentials.post = loop.call_soon_threadsafe
+    if startup is not None:
+        loop.run_until_complete(startup(loop))
+
+    limits = service.outbound_limits
+    scheduler = WriteScheduler(loop, limits.flush_delay) if limits.coalesce else None
+    runner = RequestRunner(loop, service.requests)
+    factory = lambda: AsyncChatHandler(service, scheduler, runner)
+
+    if sock is not None:
+        server = loop.run_until_complete(loop.create_server(factory, sock=sock))
+    else:
+        server = loop.run_until_complete(loop.create_server(factory, host, port, reuse_address=True,
+                                                           reuse_port=reuse_port or None, backlog=1024))
+    print('Server listening on %s:%d (asyncio, %s, pid %d)' % (host, port, type(loop).__name__, os.getpid()))
+
+    # The idle connections are probed once per tick of the Heartbeats
+    def beat():
+        delay = service.heartbeats.tick(time.time())
+        if delay is not None:
+            loop.call_later(delay, beat)
+    loop.call_soon(beat)
+
+    metrics_server = None
+    if metrics_address is not None:
+        metrics_server = loop.run_until_complete(start_metrics(service, metrics_address))
+
+    try:
+        loop.run_forever()
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        if metrics_server is not None:
+            metrics_server.close()
+            loop.run_until_complete(metrics_server.wait_closed())
+        loop.close()
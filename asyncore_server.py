@@ -0,0 +1,306 @@
+"""
+CS 544 - Computer Networks
+5.23.2017
+Project Name: Chat Service Protocol
+File: asyncore_server.py
+
+File summary:
+    The purpose of the file is to drive the server sockets with asyncore, the legacy engine of the server (server.py
+    --engine asyncore). asyncore and asynchat are only available up to Python 3.11.
+
+    Async_chat sends the responses, and keeps updating the chat_room object with the clients IP address as well as the
+    port number whenever a new client connects with the server. The bytes received are added to the InboundQueue of the
+    connection (see inbound.py). After every poll the ChatServer has the RequestScheduler of the ChatService split them
+    into frames and process the requests of all the connections in turns. A connection is not read while too many of
+    its bytes are waiting.
+
+    The chat_room object is updated by async chat. It has all the IP addresses and port numbers of all the clients that
+    are connected to the server. Every new ChatHandler is registered with the ChatService, which keeps the client_map
+    (see chat_service.py).
+
+    Each ChatHandler has a codec (see pdu_codec.py) for the wire format of its connection. Connections start with the
+    1.0 JSON format, a REDY with version 2.0 switches the connection to length prefixed binary frames.
+
+    async_chat only holds the bytes that are being sent. Pushed frames wait in the bounded OutboundQueue of the
+    connection (see outbound.py). The ChatServer flushes the connections that frames have been pushed to once per turn of
+    the polling loop, handing all their queued frames to async_chat at once so that they go out with one send call.
+
+    The Waker lets the workers of the CredentialPool hand the checked passwords back to the polling loop.
+
+    The ChatHandlers count the bytes they read and hand to async_chat in the Metrics of the service. With a metrics
+    address a MetricsServer also serves the metrics over HTTP, on a loopback port or a Unix socket (see metrics.py).
+"""
+
+import asynchat
+import asyncore
+import os
+import socket
+import time
+from collections import deque
+import pdu_codec
+import metrics
+from outbound import OutboundQueue, BATCH_BYTES
+from inbound import InboundQueue
+
+## CONCURRENT - the chat_room map accepts and stores multiple client objects ##
+chat_room = {}                  # chat_room is being updated by async chat
+
+"""A new ChatHandler object is created each time a client connects with the server"""
+class ChatHandler(asynchat.async_chat):
+
+    """Constructor of ChatHandler"""
+    def __init__(self, sock, server_obj):
+        # Initialises async_chat with the clients socket as its parameter. chat_room is passed along for it to be updated with the new client details
+        asynchat.async_chat.__init__(self, sock=sock, map=chat_room)
+
+        # Every connection starts with the 1.0 JSON format, REDY can switch it to another format
+        self.setCodec(pdu_codec.CODECS[1.0])
+
+        # Incoming bytes waiting for their turn
+        self.inbound = InboundQueue(server_obj.service.rate_limits, time.time())
+
+        # This is the ChatServer classes object
+        self.server_obj = server_obj
+        self.metrics = server_obj.service.metrics
+
+        # Frames waiting to be flushed, or for async_chat to have sent the earlier frames
+        self.outbound = OutboundQueue(server_obj.service.outbound_limits)
+
+        # async_chat sends at most this many bytes with each send call
+        self.ac_out_buffer_size = BATCH_BYTES
+
+    ## STATEFUL - the requests are processed by the RequestScheduler ##
+    """Called by asyncore when bytes have been received from the client. The bytes wait in the InboundQueue for the
+    turn of the connection"""
+    def handle_read(self):
+        try:
+            data = self.recv(self.ac_in_buffer_size)
+        except socket.error:
+            self.handle_error()
+            return
+        if data:
+            self.metrics.bytes_in += len(data)
+            self.inbound.active = self.server_obj.service.heartbeats.clock
+            if not self.inbound.feed(data):
+                self.inbound.reading = False
+            self.server_obj.service.requests.add(self)
+
+    """The connection is read unless its InboundQueue holds too many bytes"""
+    def readable(self):
+        return self.inbound.reading
+
+    """Called by the RequestScheduler once the InboundQueue has been drained, the next poll reads the connection"""
+    def resumeReading(self):
+        pass
+
+    """Closes a connection that has not answered a heartbeat probe"""
+    def abort(self):
+        self.handle_close()
+
+    """Called by async_chat when the client closes the connection. The session of the client is removed from the client_map"""
+    def handle_close(self):
+        if not self.inbound.closed:
+            self.inbound.closed = True
+            self.server_obj.service.disconnect(self)
+        self.close()
+
+    """Sends an encoded frame to the client. droppable is True for chat messages, see outbound.py. The frame waits in
+    the bounded queue until the ChatServer flushes the connection"""
+    def push(self, frame, droppable=False):
+        if not self.outbound.put(frame, droppable):
+            print('Closing the connection of a slow client %s' % repr(self.addr))
+            self.handle_close()
+        elif self.server_obj.service.outbound_limits.coalesce:
+            self.server_obj.schedule(self)
+        else:
+            self.flush()
+
+    """Hands the queued frames, up to BATCH_BYTES, to async_chat once it has sent the previous ones"""
+    def flush(self):
+        if self.connected and not self.producer_fifo and self.outbound.frames:
+            batch = b''.join(self.outbound.popBatch())
+            self.metrics.bytes_out += len(batch)
+            asynchat.async_chat.push(self, batch)
+
+    """The connection is writable while async_chat or the OutboundQueue has frames to send"""
+    def writable(self):
+        return bool(self.outbound.frames) or asynchat.async_chat.writable(self)
+
+    """Called by asyncore when the socket can take more data"""
+    def handle_write(self):
+        asynchat.async_chat.handle_write(self)
+        self.flush()
+
+    """Switches the wire format used in both directions on this connection"""
+    def setCodec(self, codec):
+        self.codec = codec
+
+"""Waker runs functions handed over by other threads on the asyncore thread. A byte written to a socket pair wakes up
+the poll, which then calls the queued functions"""
+class Waker(asyncore.dispatcher):
+
+    """Constructor of Waker"""
+    def __init__(self):
+        self.reader, self.writer = socket.socketpair()
+        self.writer.setblocking(False)
+        asyncore.dispatcher.__init__(self, self.reader, map=chat_room)
+
+        # (function, args) waiting to be called, deque appends and pops are thread safe
+        self.calls = deque()
+
+    """Called from any thread, function is called with args on the asyncore thread"""
+    def post(self, function, *args):
+        self.calls.append((function, args))
+        try:
+            self.writer.send(b'x')
+        except socket.error:
+            # The socket buffer is full, the poll has been woken up already
+            pass
+
+    """Called by asyncore once bytes have been written to the socket pair"""
+    def handle_read(self):
+        self.recv(4096)
+        while self.calls:
+            function, args = self.calls.popleft()
+            function(*args)
+
+    """The socket pair is only read"""
+    def writable(self):
+        return False
+
+"""MetricsHandler answers a single HTTP request on the metrics endpoint"""
+class MetricsHandler(asynchat.async_chat):
+
+    """Constructor of MetricsHandler
+    service -> ChatService whose metrics are sent"""
+    def __init__(self, sock, service):
+        asynchat.async_chat.__init__(self, sock=sock, map=chat_room)
+        self.set_terminator(b"\r\n\r\n")
+        self.service = service
+        self.buffer = []
+
+    """Collects the HTTP request"""
+    def collect_incoming_data(self, data):
+        self.buffer.append(data)
+
+    """Called once the headers of the HTTP request have been received"""
+    def found_terminator(self):
+        request_line = b''.join(self.buffer).split(b"\r\n", 1)[0]
+        self.push(metrics.httpResponse(request_line, self.service.metrics))
+        self.close_when_done()
+
+
+"""MetricsServer accepts the connections of the metrics endpoint"""
+class MetricsServer(asyncore.dispatcher):
+
+    """Constructor of MetricsServer
+    service -> ChatService whose metrics are served
+    address -> (host, port) pair or the path of a Unix socket"""
+    def __init__(self, service, address):
+        self.service = service
+        asyncore.dispatcher.__init__(self, map=chat_room)
+        if isinstance(address, tuple):
+            self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.set_reuse_addr()
+        else:
+            if os.path.exists(address):
+                os.unlink(address)
+            self.create_socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.bind(address)
+        self.listen(5)
+        print('Metrics served on %s' % (address if not isinstance(address, tuple) else "%s:%d" % address))
+
+    """Asyncore calls this function when a client connects with the metrics endpoint"""
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            MetricsHandler(pair[0], self.service)
+
+
+"""ChatServer is the class that sets up the server and is responsible for listening to the incoming requests from the client"""
+class ChatServer(asyncore.dispatcher):
+
+    """Constructor of ChatServer class
+    service -> ChatService that processes the requests of all the clients
+    host -> IP of the server
+    port -> The server will listen to incoming requests on this port
+    metrics_address -> address of the metrics endpoint (see metrics.endpointAddress), None serves no endpoint"""
+    def __init__(self, service, host, port, metrics_address=None):
+        # Processes the requests of all the clients
+        self.service = service
+
+        # Connections with frames to flush, and the time by which they have to be flushed
+        self.pending = set()
+        self.flush_at = 0.0
+
+        self.host = host
+        self.port = port
+
+        # Initializes asyncore dispatcher
+        asyncore.dispatcher.__init__(self, map=chat_room)
+        # Creates a new socket
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Binds server ip and port number
+        self.set_reuse_addr()
+        self.bind((self.host, self.port))
+        # Start listening to requests from the client
+        self.listen(5)
+        print('Server listening on %s:%d (asyncore)' % (self.host, self.port))
+
+        # The workers of the CredentialPool hand their results back to the polling loop
+        self.waker = Waker()
+        self.service.credentials.post = self.waker.post
+
+        self.metrics_server = MetricsServer(service, metrics_address) if metrics_address is not None else None
+
+    ## CONCURRENT - the server accepts multiple connections and stores each new client's details in the client_map ##
+    """Asyncore calls this function when a client makes a connection with the server"""
+    def handle_accept(self):
+        # pair is a tuple of the client socket and port number
+        pair = self.accept()
+        if pair is not None:
+            sock, addr = pair
+            print('Incoming connection from %s' % repr(addr))
+
+            # Creating a new instance of ChatHandler when a new client connects with the server
+            handler = ChatHandler(sock, self)
+
+            # Updating the client_map with the details of the new client that has connected with the server
+            self.service.connect(handler)
+
+    """Flushes handler along with the other pending connections, at the latest flush_delay seconds from now"""
+    def schedule(self, handler):
+        if not self.pending:
+            self.flush_at = time.time() + self.service.outbound_limits.flush_delay
+        self.pending.add(handler)
+
+    """Flushes every pending connection"""
+    def flush(self):
+        pending = self.pending
+        self.pending = set()
+        for handler in pending:
+            handler.flush()
+
+    """Enter a polling loop that terminates after all channels have been closed. After each poll the RequestScheduler
+    processes up to a quantum of requests, then the pending connections are flushed once their flush_delay has passed.
+    The Heartbeats are ticked when their next tick is due"""
+    def serve_forever(self):
+        requests = self.service.requests
+        heartbeats = self.service.heartbeats
+        delay = None
+        beat_at = time.time()
+        while chat_room:
+            timeout = 30.0
+            if self.pending:
+                timeout = max(0.0, self.flush_at - time.time())
+            if delay is not None:
+                timeout = min(timeout, delay)
+            if beat_at is not None:
+                timeout = max(0.0, min(timeout, beat_at - time.time()))
+            asyncore.poll(timeout, chat_room)
+            if beat_at is not None and time.time() >= beat_at:
+                beat = heartbeats.tick(time.time())
+                beat_at = time.time() + beat if beat is not None else None
+            delay = requests.run(time.time())
+            if self.pending and time.time() >= self.flush_at:
+                self.flush()
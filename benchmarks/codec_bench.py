@@ -0,0 +1,68 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: benchmarks/codec_bench.py
+
+File summary:
+    Compares the 1.0 JSON wire format with the 2.0 binary wire format (see pdu_codec.py). For a few typical PDUs it
+    prints the number of bytes on the wire and the time taken to encode and decode a single frame.
+
+    Command to execute the benchmark:
+
+        python benchmarks/codec_bench.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pdu_codec import CODECS
+from pdu_request import PDURequest
+from pdu_response import PDUResponse
+
+ROUNDS = 20000
+
+# PDUs sent over the connection, named after the command or response code
+SAMPLES = [
+    ("MSSG request", PDURequest(1.0, "MSSG", {"username": "alice", "chat_name": "general", "echo": False}, "DC",
+                                "(alice) are we still meeting at five?")),
+    ("140 response", PDUResponse("140", {}, "DC", "(alice) are we still meeting at five?")),
+    ("AUTH request", PDURequest(1.0, "AUTH", {"username": "alice", "password": "secret", "chat_name": ""}, "CC", "")),
+    ("180 response", PDUResponse("180", {"username": "alice", "chat_name": "general"}, "CC",
+                                 "alice has joined the group")),
+    ("130 response", PDUResponse("130", {"username": "alice"}, "", ["group %d" % i for i in range(200)])),
+]
+
+
+"""Returns the encoded frame and the number of microseconds it takes to encode and decode it once"""
+def measure(codec, pdu):
+    if isinstance(pdu, PDURequest):
+        encode = codec.encodeRequest
+    else:
+        encode = codec.encodeResponse
+    frame = encode(pdu)
+
+    # The decoder sees the frame without its framing, as handed over by found_terminator
+    if codec.version == 1.0:
+        body = frame[:-1]
+    else:
+        body = frame[4:]
+
+    encode_us = timeit.timeit(lambda: encode(pdu), number=ROUNDS) / ROUNDS * 1e6
+    decode_us = timeit.timeit(lambda: codec.decode(body), number=ROUNDS) / ROUNDS * 1e6
+    return frame, encode_us, decode_us
+
+
+def main():
+    print("%-14s %-6s %8s %12s %12s" % ("pdu", "format", "bytes", "encode us", "decode us"))
+    for name, pdu in SAMPLES:
+        for version in sorted(CODECS):
+            frame, encode_us, decode_us = measure(CODECS[version], pdu)
+            print("%-14s %-6s %8d %12.2f %12.2f" % (name, version, len(frame), encode_us, decode_us))
+
+
+if __name__ == "__main__":
+    main()
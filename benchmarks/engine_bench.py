@@ -0,0 +1,169 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: benchmarks/engine_bench.py
+
+File summary:
+    Compares the asyncio engine with the legacy asyncore engine. For each engine a server is started in a temporary
+    directory, then the benchmark opens the given number of connections, signs every client up (NWUA) and puts them in
+    groups of --room-size clients (CHAT for the first client of a group, JOIN for the others). It reports how many
+    connections the engine accepted and how long that took. Then the first client of every group sends --messages MSSG
+    requests and the benchmark reports how many 140 responses per second reached the clients.
+
+    asyncore uses select(), so it cannot go past FD_SETSIZE (1024) sockets. Raise the open file limit (ulimit -n) for
+    runs with more connections.
+
+    Command to execute the benchmark (Python 3):
+
+        python3 benchmarks/engine_bench.py --connections 1000 --room-size 50 --messages 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# A connection that is not logged in after this many seconds counts as refused. The asyncore engine listens with a
+# backlog of 5, so connections beyond that wait for the kernel to retransmit their SYN
+LOGIN_TIMEOUT = 5
+
+
+"""Serializes a 1.0 request"""
+def request(command, parameters, channel="CC", payload=""):
+    return (json.dumps({"version": 1.0, "command": command, "parameters": parameters, "channel": channel,
+                        "payload": payload}) + "\n").encode("utf-8")
+
+
+"""Starts a server with engine and the extra command line options in a temporary directory and waits until it accepts
+connections"""
+def start_server(engine, port, options=()):
+    directory = tempfile.mkdtemp()
+    process = subprocess.Popen([sys.executable, os.path.join(REPO, "server.py"), "--engine", engine, "--port", str(port)]
+                               + list(options), cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process, directory
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("server did not start")
+
+
+"""Reads responses until a line with response_code arrives"""
+async def wait_for(reader, response_code):
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("connection closed")
+        if json.loads(line)["response_code"] == response_code:
+            return
+
+
+"""Connects and signs up a single client, returns its streams and username or None if the server refused the
+connection or did not answer within LOGIN_TIMEOUT seconds"""
+async def login(port, username):
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), LOGIN_TIMEOUT)
+        writer.write(request("NWUA", {"username": username, "password": "pw", "chat_name": ""}))
+        await asyncio.wait_for(wait_for(reader, "110"), LOGIN_TIMEOUT)
+        return reader, writer, username
+    except (OSError, ConnectionError, asyncio.TimeoutError):
+        return None
+
+
+"""Counts the 140 responses a client receives until it has seen expected of them"""
+async def receive(reader, expected, counter):
+    while counter[0] < expected:
+        line = await reader.readline()
+        if not line:
+            return
+        if b'"140"' in line:
+            counter[0] += 1
+
+
+"""Runs the benchmark against a server listening on port"""
+async def run(port, connections, room_size, messages):
+    # Connections and logins
+    started = time.time()
+    clients = []
+    for first in range(0, connections, 200):
+        batch = await asyncio.gather(*[login(port, "user%d" % i)
+                                       for i in range(first, min(first + 200, connections))])
+        clients.extend(client for client in batch if client is not None)
+    connect_seconds = time.time() - started
+
+    # Groups of room_size clients
+    rooms = [clients[i:i + room_size] for i in range(0, len(clients), room_size)]
+    for number, room in enumerate(rooms):
+        chat_name = "room%d" % number
+        reader, writer, username = room[0]
+        writer.write(request("CHAT", {"username": username, "chat_name": chat_name}))
+        await wait_for(reader, "170")
+    for number, room in enumerate(rooms):
+        chat_name = "room%d" % number
+        for reader, writer, username in room[1:]:
+            writer.write(request("JOIN", {"username": username, "chat_name": chat_name}))
+            await wait_for(reader, "180")
+
+        # Every member also receives the 180 of the clients that joined after it. A message sent to the whole group
+        # marks the end of them
+        room[0][1].write(request("MSSG", {"username": room[0][2], "chat_name": chat_name}, "DC", "(owner) ready"))
+        await asyncio.gather(*[wait_for(reader, "140") for reader, writer, username in room])
+
+    # Messages, the first client of every group sends, the others receive
+    receivers = []
+    expected = 0
+    started = time.time()
+    for number, room in enumerate(rooms):
+        reader, writer, username = room[0]
+        for i in range(messages):
+            writer.write(request("MSSG", {"username": username, "chat_name": "room%d" % number, "echo": False}, "DC",
+                                 "(owner) message %d" % i))
+        for reader, writer, username in room[1:]:
+            receivers.append(receive(reader, messages, [0]))
+            expected += messages
+    await asyncio.gather(*receivers)
+    message_seconds = time.time() - started
+
+    for reader, writer, username in clients:
+        writer.close()
+    return len(clients), connect_seconds, expected, message_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="asyncio vs asyncore engine benchmark")
+    parser.add_argument("--connections", type=int, default=500)
+    parser.add_argument("--room-size", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--port", type=int, default=12400)
+    parser.add_argument("--engines", default="asyncore,asyncio")
+    args = parser.parse_args()
+
+    print("%-9s %12s %12s %14s %14s" % ("engine", "connections", "connect s", "deliveries", "deliveries/s"))
+    for offset, engine in enumerate(args.engines.split(",")):
+        port = args.port + offset
+        process, directory = start_server(engine, port)
+        try:
+            accepted, connect_seconds, delivered, message_seconds = asyncio.run(
+                run(port, args.connections, args.room_size, args.messages))
+            print("%-9s %12d %12.2f %14d %14.0f" % (engine, accepted, connect_seconds, delivered,
+                                                    delivered / message_seconds))
+        finally:
+            process.kill()
+            process.wait()
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
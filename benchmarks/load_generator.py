@@ -0,0 +1,426 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: benchmarks/load_generator.py
+
+File summary:
+    Headless load generator for the Chat Service Protocol. It opens --sessions connections from a single process and
+    every session runs the same scenario a user of client.py would, without any console:
+
+        NWUA (AUTH when the account exists) -> CHAT for the first session of a group, LIST and JOIN for the others
+        -> MSSG every 1 / --rate seconds while in the group
+
+    While the sessions chat, a churn task makes sessions leave and rejoin their group (LEVE, --leave-rate per second),
+    has the creator of a group kick a member (KICK, --kick-rate per second), who joins again, and ban a member (BANN,
+    --ban-rate per second), who moves to another group.
+
+    Every request that gets a response is sent with a request_id, its latency is the time between sending the request
+    and receiving the response carrying the request_id. Chat messages carry the time they were sent, their latency is
+    the time between sending the MSSG and a member of the group receiving the 140 response. The report has the count,
+    the rate and the p50 / p95 / p99 / max latency per response code.
+
+    The generator only connects to a local server. --spawn starts one in a temporary directory for the run.
+
+    Command to execute the load generator (Python 3):
+
+        python3 benchmarks/load_generator.py --spawn --sessions 1000 --room-size 20 --rate 1 --duration 30
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import resource
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pdu_codec
+from pdu_request import PDURequest
+from engine_bench import start_server
+
+timer = time.perf_counter
+
+# Seconds a session waits for the response to a request before counting it as lost
+RESPONSE_TIMEOUT = 30
+
+
+"""Stats collects the latencies of the responses by response code and command"""
+class Stats:
+
+    def __init__(self):
+        self.latencies = {}     # (response_code, command) -> latencies in seconds
+        self.sent = 0           # MSSG requests sent
+        self.notices = 0        # responses about other clients (180, 190, ... of the group)
+        self.replayed = 0       # chat messages sent before the session joined, replayed by the history of the group
+        self.lost = 0           # requests without a response within RESPONSE_TIMEOUT
+        self.refused = 0        # sessions that could not connect or log in
+
+    """Records a response to command received latency seconds after the request was sent"""
+    def record(self, response_code, command, latency):
+        self.latencies.setdefault((response_code, command), []).append(latency)
+
+    """Returns the report as a printable table, rates are per second of duration"""
+    def report(self, duration):
+        lines = ["%-5s %-9s %10s %10s %9s %9s %9s %9s" % ("code", "command", "count", "rate/s", "p50 ms", "p95 ms",
+                                                          "p99 ms", "max ms")]
+        for (response_code, command), values in sorted(self.latencies.items()):
+            values.sort()
+            lines.append("%-5s %-9s %10d %10.0f %9.2f %9.2f %9.2f %9.2f" % (
+                response_code, command, len(values), len(values) / duration, percentile(values, 0.50),
+                percentile(values, 0.95), percentile(values, 0.99), percentile(values, 1.0)))
+        lines.append("MSSG sent %d, replayed %d, notices %d, lost requests %d, refused sessions %d" % (
+            self.sent, self.replayed, self.notices, self.lost, self.refused))
+        return "\n".join(lines)
+
+
+"""Returns the given percentile of the sorted values in milliseconds"""
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+
+"""Session is a single connection running the scenario of a user"""
+class Session:
+
+    """Constructor of Session
+    username -> username of the session, also its password
+    stats -> Stats of the run
+    version -> 1.0 for JSON frames, 2.0 for binary frames
+    compress -> True to offer the compressions of pdu_codec.py with the binary frames"""
+    def __init__(self, username, stats, version, compress=False):
+        self.username = username
+        self.stats = stats
+        self.version = version
+        self.compress = compress
+        self.codec = pdu_codec.CODECS[1.0]
+        self.reader = None
+        self.writer = None
+
+        self.next_request_id = 0
+        self.pending = {}           # request_id -> (command, chat_name, time sent, future)
+
+        self.chat_name = ""         # group the session is in, empty while it is not in a group
+        self.joined = 0.0           # time the session last asked to be in a group
+        self.banned = set()         # groups the session has been banned from
+        self.moved_out = None       # future set when the session is kicked or banned
+        self.closed = False
+
+    """Connects, negotiates the wire format and logs in. Returns False if the server refused the session"""
+    async def start(self, host, port):
+        try:
+            self.reader, self.writer = await asyncio.open_connection(host, port)
+        except OSError:
+            return False
+        asyncio.ensure_future(self.receive())
+
+        if self.version != 1.0:
+            offer = {"compression": pdu_codec.COMPRESSIONS} if self.compress else {}
+            response = await self.call("REDY", offer, version=self.version)
+            if response is None or response["response_code"] != "100":
+                return False
+
+        credentials = {"username": self.username, "password": self.username, "chat_name": ""}
+        response = await self.call("NWUA", credentials)
+        if response is not None and response["response_code"] == "200":
+            # The account exists from an earlier run
+            response = await self.call("AUTH", credentials)
+        return response is not None and response["response_code"] == "110"
+
+    """Sends a request without a request_id"""
+    def send(self, command, parameters, channel="CC", payload=""):
+        if not self.closed:
+            self.writer.write(self.codec.encodeRequest(PDURequest(self.codec.version, command, parameters, channel,
+                                                                  payload)))
+
+    """Sends a request with a request_id and returns its response, or None if none arrived in time"""
+    async def call(self, command, parameters, channel="CC", payload="", version=None):
+        if self.closed:
+            return None
+        self.next_request_id += 1
+        request_id = self.next_request_id
+        future = asyncio.get_event_loop().create_future()
+        started = timer()
+        self.pending[request_id] = (command, parameters.get("chat_name", ""), started, future)
+        if command in ("CHAT", "JOIN"):
+            self.joined = started
+        request = PDURequest(version or self.codec.version, command, parameters, channel, payload, request_id)
+        self.writer.write(self.codec.encodeRequest(request))
+        try:
+            return await asyncio.wait_for(future, RESPONSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.pending.pop(request_id, None)
+            self.stats.lost += 1
+            return None
+
+    """Reads the responses of the session until the connection is closed"""
+    async def receive(self):
+        try:
+            while True:
+                codec = self.codec
+                if isinstance(codec.terminator, int):
+                    header = await self.reader.readexactly(codec.terminator)
+                    body = await self.reader.readexactly(codec.bodyLength(header))
+                else:
+                    body = await self.reader.readuntil(codec.terminator)
+                self.handle(codec.decode(body))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.closed = True
+            for command, chat_name, started, future in self.pending.values():
+                if not future.done():
+                    future.set_result(None)
+
+    ## STATEFUL - the session follows the state the responses put it in ##
+    """Records a response and updates the state of the session"""
+    def handle(self, response):
+        code = response["response_code"]
+        parameters = response["parameters"]
+        received = timer()
+
+        pending = self.pending.pop(response.get("request_id"), None)
+        if pending is not None:
+            command, chat_name, started, future = pending
+            self.stats.record(code, command, received - started)
+            if code == "100" and command == "REDY":
+                compressor = pdu_codec.negotiateCompression(parameters.get("compression"))
+                self.codec = compressor or pdu_codec.CODECS[parameters["version"]]
+            elif code in ("170", "180"):
+                self.chat_name = chat_name
+            future.set_result(response)
+            return
+
+        if code == "140":
+            # Chat message of the group, its payload carries the time it was sent
+            try:
+                sent = float(response["payload"].split(" ")[1])
+            except (IndexError, ValueError):
+                self.stats.notices += 1
+                return
+            if sent < self.joined:
+                self.stats.replayed += 1
+            else:
+                self.stats.record(code, "MSSG", received - sent)
+            return
+
+        if code == "102":
+            # Heartbeat probe of an idle session
+            self.send("PING", {})
+            return
+
+        self.stats.notices += 1
+        if code == "192" and parameters.get("kicked_user") == self.username:
+            self.movedOut(None)
+        elif code == "191" and parameters.get("banned_user") == self.username:
+            self.movedOut(self.chat_name)
+
+    """Called when the session has been kicked out of its group, or banned from banned_from"""
+    def movedOut(self, banned_from):
+        if banned_from:
+            self.banned.add(banned_from)
+        self.chat_name = ""
+        if self.moved_out is not None and not self.moved_out.done():
+            self.moved_out.set_result(True)
+
+    """Joins chat_name, returns True if the session is in the group"""
+    async def join(self, chat_name):
+        if chat_name in self.banned:
+            return False
+        response = await self.call("LIST", {"username": self.username, "prefix": chat_name, "count": 1})
+        if response is None or response["response_code"] != "130" or chat_name not in response["payload"]:
+            return False
+        response = await self.call("JOIN", {"username": self.username, "chat_name": chat_name})
+        return response is not None and response["response_code"] == "180"
+
+    """Closes the connection"""
+    def close(self):
+        self.closed = True
+        if self.writer is not None:
+            self.writer.close()
+
+
+"""Room is a group of sessions, its first session creates the group and is its admin"""
+class Room:
+
+    def __init__(self, chat_name, sessions):
+        self.chat_name = chat_name
+        self.admin = sessions[0]
+        self.sessions = sessions
+        self.created = asyncio.Event()
+
+
+"""LoadGenerator runs the scenario of every session and the churn"""
+class LoadGenerator:
+
+    def __init__(self, args):
+        self.args = args
+        self.stats = Stats()
+        self.rooms = []
+        self.running = True
+
+    """Creates and logs in the sessions, puts them in their rooms and returns the sessions that are in a group"""
+    async def setup(self):
+        args = self.args
+        sessions = [Session("%s%d" % (args.prefix, i), self.stats, args.version, args.compress)
+                    for i in range(args.sessions)]
+
+        # Connections are opened in batches so that the accept queue of the server does not overflow
+        started = []
+        for first in range(0, len(sessions), args.batch):
+            batch = sessions[first:first + args.batch]
+            results = await asyncio.gather(*[session.start(args.host, args.port) for session in batch])
+            for session, ok in zip(batch, results):
+                if ok:
+                    started.append(session)
+                else:
+                    self.stats.refused += 1
+                    session.close()
+
+        for number, first in enumerate(range(0, len(started), args.room_size)):
+            self.rooms.append(Room("%sroom%d" % (args.prefix, number), started[first:first + args.room_size]))
+        await asyncio.gather(*[self.enter(room) for room in self.rooms])
+        return started
+
+    """Creates the group of room with its admin, then the other sessions join it"""
+    async def enter(self, room):
+        admin = room.admin
+        response = await admin.call("CHAT", {"username": admin.username, "chat_name": room.chat_name})
+        if response is not None and response["response_code"] == "230":
+            # The group exists from an earlier run
+            await admin.join(room.chat_name)
+        room.created.set()
+        await asyncio.gather(*[session.join(room.chat_name) for session in room.sessions[1:]])
+
+    """Sends a MSSG every 1 / rate seconds while the session is in a group. The first message is sent at a random time
+    within the first interval so that the sessions do not send in lockstep"""
+    async def chat(self, session):
+        interval = 1.0 / self.args.rate
+        await asyncio.sleep(random.uniform(0, interval))
+        while self.running and not session.closed:
+            if session.chat_name:
+                session.send("MSSG", {"username": session.username, "chat_name": session.chat_name, "echo": False},
+                             "DC", "(%s) %.6f" % (session.username, timer()))
+                self.stats.sent += 1
+            await asyncio.sleep(interval)
+
+    """Makes a random member of a random room leave and rejoin, get kicked and rejoin or get banned and move to another
+    room, each kind at its rate per second"""
+    async def churn(self, kind, rate):
+        if rate <= 0:
+            return
+        while self.running:
+            await asyncio.sleep(random.expovariate(rate))
+            room = random.choice(self.rooms)
+            members = [session for session in room.sessions[1:] if session.chat_name == room.chat_name]
+            if not members or not room.admin.chat_name:
+                continue
+            asyncio.ensure_future(self.churnOne(kind, room, random.choice(members)))
+
+    """Runs one churn action on session, a member of room"""
+    async def churnOne(self, kind, room, session):
+        admin = room.admin
+        if kind == "leave":
+            response = await session.call("LEVE", {"username": session.username, "chat_name": room.chat_name})
+            if response is not None and response["response_code"] == "190":
+                session.chat_name = ""
+            await session.join(room.chat_name)
+            return
+
+        session.moved_out = asyncio.get_event_loop().create_future()
+        if kind == "kick":
+            await admin.call("KICK", {"username": admin.username, "chat_name": room.chat_name,
+                                      "kicked_user": session.username})
+        else:
+            await admin.call("BANN", {"username": admin.username, "chat_name": room.chat_name,
+                                      "banned_user": session.username})
+        try:
+            await asyncio.wait_for(session.moved_out, RESPONSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return
+
+        # A kicked session joins its group again, a banned one moves to another group
+        if kind == "kick":
+            await session.join(room.chat_name)
+        else:
+            others = [other for other in self.rooms if other.chat_name not in session.banned]
+            if others:
+                target = random.choice(others)
+                if await session.join(target.chat_name):
+                    target.sessions.append(session)
+
+    """Runs the load and prints the report"""
+    async def run(self):
+        args = self.args
+        started = timer()
+        sessions = await self.setup()
+        print("%d sessions in %d rooms after %.2f s" % (len(sessions), len(self.rooms), timer() - started))
+
+        # Only the chat and the churn count towards the rates
+        self.stats.latencies = {}
+        tasks = [asyncio.ensure_future(self.chat(session)) for session in sessions]
+        tasks.append(asyncio.ensure_future(self.churn("leave", args.leave_rate)))
+        tasks.append(asyncio.ensure_future(self.churn("kick", args.kick_rate)))
+        tasks.append(asyncio.ensure_future(self.churn("ban", args.ban_rate)))
+        started = timer()
+        await asyncio.sleep(args.duration)
+        self.running = False
+        duration = timer() - started
+
+        # Messages still on their way are received before the report
+        await asyncio.sleep(1.0)
+        for task in tasks:
+            task.cancel()
+        for session in sessions:
+            session.close()
+        print(self.stats.report(duration))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="headless Chat Service Protocol load generator")
+    parser.add_argument("--sessions", type=int, default=200, help="number of concurrent sessions")
+    parser.add_argument("--room-size", type=int, default=20, help="sessions per group")
+    parser.add_argument("--rate", type=float, default=1.0, help="MSSG per second sent by every session")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of chat after the setup")
+    parser.add_argument("--leave-rate", type=float, default=1.0, help="LEVE and rejoin per second")
+    parser.add_argument("--kick-rate", type=float, default=0.5, help="KICK and rejoin per second")
+    parser.add_argument("--ban-rate", type=float, default=0.1, help="BANN and move to another group per second")
+    parser.add_argument("--binary", dest="version", action="store_const", const=2.0, default=1.0,
+                        help="use the 2.0 binary wire format")
+    parser.add_argument("--compress", action="store_true", help="negotiate compression along with --binary")
+    parser.add_argument("--batch", type=int, default=200, help="sessions connecting at the same time")
+    parser.add_argument("--prefix", default="load", help="prefix of the usernames and group names")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the churn")
+    parser.add_argument("--port", type=int, default=12345)
+    parser.add_argument("--spawn", action="store_true", help="start a server in a temporary directory for the run")
+    parser.add_argument("--engine", default="asyncio", help="engine of the spawned server")
+    parser.add_argument("--server-options", default="", help="extra command line options of the spawned server")
+    args = parser.parse_args()
+    args.host = "127.0.0.1"
+    random.seed(args.seed)
+
+    # Every session holds a file descriptor, the soft limit is raised up to the hard limit if needed
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < args.sessions + 64:
+        wanted = args.sessions + 64 if hard == resource.RLIM_INFINITY else min(hard, args.sessions + 64)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+    process = directory = None
+    if args.spawn:
+        process, directory = start_server(args.engine, args.port, args.server_options.split())
+    try:
+        asyncio.run(LoadGenerator(args).run())
+    finally:
+        if process is not None:
+            process.kill()
+            process.wait()
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: benchmarks/login_bench.py
+
+File summary:
+    Measures the latency of the chat messages of clients that are already connected while a storm of logins reaches the
+    server (see credentials.py). --room-size clients join a group, one of them sends a MSSG every --interval
+    milliseconds carrying the time it was sent, and every member records how long it took to arrive. The latencies are
+    first measured for --seconds seconds without logins, then while --logins new connections each send an AUTH at once.
+
+    The server is run with --auth-workers 0, which checks the passwords on the event loop, and with the workers of the
+    CredentialPool.
+
+    Command to execute the benchmark (Python 3):
+
+        python3 benchmarks/login_bench.py --logins 1000 --room-size 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from engine_bench import request, start_server, wait_for, login
+
+timer = time.perf_counter
+
+
+"""Records the latency of every 140 response the client receives in latencies[phase[0]]"""
+async def receive(reader, phase, latencies):
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        response = json.loads(line)
+        if response["response_code"] == "140":
+            latencies[phase[0]].append(timer() - float(response["payload"]))
+
+
+"""Sends a MSSG carrying the time it was sent every interval seconds until stop is set"""
+async def send(writer, username, chat_name, interval, stop):
+    while not stop.is_set():
+        writer.write(request("MSSG", {"username": username, "chat_name": chat_name}, "DC", repr(timer())))
+        await asyncio.sleep(interval)
+
+
+"""Connects a new client and logs it in as username, returns the response code of the AUTH"""
+async def authenticate(port, username, password):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request("AUTH", {"username": username, "password": password, "chat_name": ""}))
+    line = await reader.readline()
+    writer.close()
+    return json.loads(line)["response_code"] if line else None
+
+
+"""Runs the benchmark against a server listening on port, returns the latencies of both phases, the number of
+successful logins and the seconds the storm took"""
+async def run(port, room_size, logins, seconds, interval):
+    # Account the storm logs in to
+    storm = await login(port, "storm")
+    storm[1].close()
+
+    room = [client for client in await asyncio.gather(*[login(port, "member%d" % i) for i in range(room_size)])
+            if client is not None]
+    reader, writer, username = room[0]
+    writer.write(request("CHAT", {"username": username, "chat_name": "room"}))
+    await wait_for(reader, "170")
+    for reader, writer, username in room[1:]:
+        writer.write(request("JOIN", {"username": username, "chat_name": "room"}))
+        await wait_for(reader, "180")
+
+    phase = ["baseline"]
+    latencies = {"baseline": [], "storm": []}
+    receivers = [asyncio.ensure_future(receive(reader, phase, latencies)) for reader, writer, username in room]
+    stop = asyncio.Event()
+    sender = asyncio.ensure_future(send(room[0][1], room[0][2], "room", interval, stop))
+
+    await asyncio.sleep(seconds)
+
+    # Every login opens its own connection, all of them at once
+    phase[0] = "storm"
+    started = time.time()
+    codes = await asyncio.gather(*[authenticate(port, "storm", "pw") for i in range(logins)])
+    storm_seconds = time.time() - started
+
+    stop.set()
+    await sender
+    await asyncio.sleep(0.5)
+    for receiver in receivers:
+        receiver.cancel()
+    for reader, writer, username in room:
+        writer.close()
+    return latencies, codes.count("110"), storm_seconds
+
+
+"""Returns the given percentile of the sorted values in milliseconds"""
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="chat message latency during a login storm")
+    parser.add_argument("--logins", type=int, default=1000)
+    parser.add_argument("--room-size", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=2.0, help="length of the phase without logins")
+    parser.add_argument("--interval", type=float, default=10.0, help="milliseconds between two chat messages")
+    parser.add_argument("--workers", default="0,4", help="--auth-workers values to compare")
+    parser.add_argument("--engine", default="asyncio")
+    parser.add_argument("--port", type=int, default=12500)
+    args = parser.parse_args()
+
+    print("%-8s %-9s %8s %10s %10s %10s %10s %10s" % ("workers", "phase", "messages", "p50 ms", "p99 ms", "max ms",
+                                                     "logins", "logins/s"))
+    for offset, workers in enumerate(args.workers.split(",")):
+        port = args.port + offset
+        process, directory = start_server(args.engine, port, ["--auth-workers", workers])
+        try:
+            latencies, logged_in, storm_seconds = asyncio.run(
+                run(port, args.room_size, args.logins, args.seconds, args.interval / 1000.0))
+            for phase in ("baseline", "storm"):
+                values = sorted(latencies[phase])
+                logins = "%10d %10.0f" % (logged_in, logged_in / storm_seconds) if phase == "storm" else ""
+                print("%-8s %-9s %8d %10.2f %10.2f %10.2f %s" % (workers, phase, len(values), percentile(values, 0.5),
+                                                                percentile(values, 0.99), percentile(values, 1.0),
+                                                                logins))
+        finally:
+            process.kill()
+            process.wait()
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
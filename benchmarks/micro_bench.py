@@ -0,0 +1,357 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: benchmarks/micro_bench.py
+
+File summary:
+    Times the hot paths of the server in isolation, without sockets:
+
+        pdu ...     -> PDURequest.createRequestStr, PDUResponse.createResponseStr and the encode / decode of both wire
+                       formats (see pdu_codec.py)
+        command ... -> every command, dispatched by the ChatService against a synthetic state of USERS users logged in
+                       and spread over ROOMS groups
+        route ...   -> what found_terminator does for a MSSG frame, decode it and have the ChatService route it, in a
+                       group of a growing number of clients
+
+    Every benchmark is run REPEAT times for --min-time seconds in total, and the fastest run is reported in
+    microseconds per operation. --save writes the results as a JSON baseline, --compare reports the change against a
+    baseline and flags every benchmark that got slower by more than --threshold percent. The exit status is 1 when a
+    benchmark got slower, so the comparison can gate a change to these paths.
+
+    Baselines depend on the machine and the interpreter, the default baseline file is per major Python version. Record
+    one before a change and compare with it after the change, on the same machine.
+
+    Command to execute the benchmark:
+
+        python benchmarks/micro_bench.py --save
+        python benchmarks/micro_bench.py --compare --threshold 10
+"""
+
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import credentials
+from chat_service import ChatService
+from pdu_codec import CODECS
+from pdu_request import PDURequest
+from pdu_response import PDUResponse
+
+timer = timeit.default_timer
+
+USERS = 10000                       # users of the synthetic state, all of them logged in
+ROOMS = 1000                        # groups of the synthetic state, USERS / ROOMS members each
+ROUTE_CLIENTS = [1, 10, 100, 1000]  # group sizes of the route benchmarks
+REPEAT = 9                          # runs of every benchmark, the fastest one is reported
+PAYLOAD = "(user1) are we still meeting at five?"
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+
+"""Connection stands in for the handler of a connection, it only counts the frames pushed to it"""
+class Connection:
+
+    def __init__(self):
+        self.codec = CODECS[1.0]
+        self.frames = 0
+
+    def push(self, frame, droppable=False):
+        self.frames += 1
+
+    def setCodec(self, codec):
+        self.codec = codec
+
+
+"""Returns the stored form of the password of every synthetic user, hashed once"""
+def storedPassword(cache={}):
+    if "pw" not in cache:
+        cache["pw"] = credentials.hashPassword("pw")
+    return cache["pw"]
+
+
+"""Returns a ChatService holding users logged in users spread over rooms groups, and the connection of every user. The
+first user of every group is its admin. Nothing is written to disk unless log_directory is given"""
+def buildService(users=USERS, rooms=ROOMS, log_directory=None):
+    service = ChatService(writable=False, auth_workers=0, log_directory=log_directory)
+    store = service.store
+    members = users // rooms
+
+    for i in range(users):
+        store.apply({"op": "user", "username": "user%d" % i, "password": storedPassword()})
+    for room in range(rooms):
+        store.apply({"op": "chat", "chat_name": "room%d" % room, "username": "user%d" % (room * members)})
+        store.apply({"op": "admin", "chat_name": "room%d" % room, "username": "user%d" % (room * members)})
+
+    connections = []
+    for i in range(users):
+        connection = Connection()
+        service.connect(connection)
+        service.client_map.login("user%d" % i, connection)
+        service.client_map.join("user%d" % i, "room%d" % min(i // members, rooms - 1), connection)
+        connections.append(connection)
+    return service, connections
+
+
+"""Returns the decoded form of a 1.0 request, as the engines hand it to the ChatService"""
+def decoded(command, parameters, channel="CC", payload=""):
+    return {"version": 1.0, "command": command, "parameters": parameters, "channel": channel, "payload": payload}
+
+
+"""Returns the benchmarks of the wire formats as (name, setup) pairs. setup returns the function timed with the index
+of the operation"""
+def pduBenchmarks():
+    mssg = PDURequest(1.0, "MSSG", {"username": "user1", "chat_name": "room0", "echo": False}, "DC", PAYLOAD)
+    chat = PDUResponse("140", {}, "DC", PAYLOAD)
+    joined = PDUResponse("180", {"username": "user1", "chat_name": "room0"}, "CC", "user1 has joined the group")
+    groups = PDUResponse("130", {"username": "user1"}, "", ["room%d" % i for i in range(ROOMS)])
+
+    benchmarks = [
+        ("pdu createRequestStr MSSG", lambda: lambda i: mssg.createRequestStr()),
+        ("pdu createResponseStr 140", lambda: lambda i: chat.createResponseStr()),
+        ("pdu createResponseStr 130", lambda: lambda i: groups.createResponseStr()),
+    ]
+    for version in sorted(CODECS):
+        codec = CODECS[version]
+        for name, pdu in [("MSSG", mssg), ("140", chat), ("180", joined), ("130", groups)]:
+            benchmarks.append(("pdu %s encode %s" % (version, name), encoder(codec, pdu)))
+            benchmarks.append(("pdu %s decode %s" % (version, name), decoder(codec, pdu)))
+    return benchmarks
+
+
+"""Returns the setup of the benchmark encoding pdu with codec"""
+def encoder(codec, pdu):
+    encode = codec.encodeRequest if isinstance(pdu, PDURequest) else codec.encodeResponse
+    return lambda: lambda i: encode(pdu)
+
+
+"""Returns the setup of the benchmark decoding pdu with codec. The decoder sees the frame without its framing, as
+handed over by found_terminator"""
+def decoder(codec, pdu):
+    def setup():
+        frame = codec.encodeRequest(pdu) if isinstance(pdu, PDURequest) else codec.encodeResponse(pdu)
+        body = frame[:-1] if codec.version == 1.0 else frame[4:]
+        return lambda i: codec.decode(body)
+    return setup
+
+
+"""Returns the setup of the benchmark dispatching the requests made by requests(i) on the connections of the given
+users of the synthetic state. requests returns a list of (user, decoded request) pairs"""
+def command(requests, log_messages=0):
+    def setup():
+        directory = tempfile.mkdtemp() if log_messages else None
+        service, connections = buildService(log_directory=directory)
+        if log_messages:
+            frame = CODECS[1.0].encodeResponse(PDUResponse("140", {}, "DC", PAYLOAD))
+            for i in range(log_messages):
+                service.message_log.append("room0", frame)
+            # Written to disk before the benchmark starts
+            service.message_log.close()
+
+        def step(i):
+            for user, request in requests(i):
+                service.handleRequest(request, connections[user])
+        step.cleanup = lambda: cleanup(service, directory)
+        return step
+    return setup
+
+
+"""Stops service and removes the directory of its MessageLog"""
+def cleanup(service, directory):
+    service.close()
+    if directory is not None:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+"""Returns the benchmarks of the commands as (name, setup) pairs. user0 is the admin of room0, user1 and user2 are
+members of room0"""
+def commandBenchmarks():
+    members = USERS // ROOMS
+    credentials_of = lambda username: {"username": username, "password": "pw", "chat_name": ""}
+    member = lambda command, username, chat_name: decoded(command, {"username": username, "chat_name": chat_name})
+
+    # Usernames and group names that have never been used, so that every NWUA and CHAT creates one
+    fresh = itertools.count()
+
+    return [
+        ("command REDY", command(lambda i: [(1, decoded("REDY", {}))])),
+        ("command NWUA existing user", command(lambda i: [(1, decoded("NWUA", credentials_of("user1")))])),
+        ("command NWUA new user", command(lambda i: [(1, decoded("NWUA", credentials_of("new%d" % next(fresh))))])),
+        ("command AUTH", command(lambda i: [(1, decoded("AUTH", credentials_of("user1")))])),
+        ("command LIST", command(lambda i: [(1, decoded("LIST", {"username": "user1"}))])),
+        ("command LIST prefix", command(lambda i: [(1, decoded("LIST", {"username": "user1", "count": 20,
+                                                                        "prefix": "room1%d" % (i % 10)}))])),
+        ("command LIST not modified", command(lambda i: [(1, decoded("LIST", {"username": "user1",
+                                                                              "revision": ROOMS}))])),
+        ("command CHAT existing group", command(lambda i: [(1, member("CHAT", "user1", "room1"))])),
+        ("command CHAT new group", command(lambda i: [(1, member("CHAT", "user1", "new%d" % next(fresh)))])),
+        ("command JOIN", command(lambda i: [(1, member("JOIN", "user1", "room%d" % (i % 2)))])),
+        ("command LEVE and JOIN", command(lambda i: [(1, member("LEVE", "user1", "room0")),
+                                                      (1, member("JOIN", "user1", "room0"))])),
+        ("command KICK and JOIN", command(lambda i: [(0, decoded("KICK", {"username": "user0", "chat_name": "room0",
+                                                                         "kicked_user": "user1"})),
+                                                      (1, member("JOIN", "user1", "room0"))])),
+        ("command BANN", command(lambda i: [(0, decoded("BANN", {"username": "user0", "chat_name": "room0",
+                                                                 "banned_user": "user%d" % (1 + i % (members - 1))}))])),
+        ("command MSSG", command(lambda i: [(1, decoded("MSSG", {"username": "user1", "chat_name": "room0"}, "DC",
+                                                        PAYLOAD))])),
+        ("command HIST", command(lambda i: [(1, decoded("HIST", {"username": "user1", "chat_name": "room0"}))],
+                                 log_messages=1000)),
+    ]
+
+
+"""Returns the setup of the benchmark routing a MSSG frame in version through a group of clients clients"""
+def route(clients, version):
+    def setup():
+        service, connections = buildService(users=clients, rooms=1)
+        codec = CODECS[version]
+        for connection in connections:
+            connection.setCodec(codec)
+        frame = codec.encodeRequest(PDURequest(version, "MSSG", {"username": "user0", "chat_name": "room0"}, "DC",
+                                               PAYLOAD))
+        body = frame[:-1] if version == 1.0 else frame[4:]
+        sender = connections[0]
+
+        # The part of found_terminator that follows the framing
+        def step(i):
+            service.handleRequest(sender.codec.decode(body), sender)
+        step.cleanup = lambda: cleanup(service, None)
+        return step
+    return setup
+
+
+"""Returns the benchmarks of the routing loop as (name, setup) pairs"""
+def routeBenchmarks():
+    benchmarks = []
+    for version in sorted(CODECS):
+        for clients in ROUTE_CLIENTS:
+            benchmarks.append(("route %s MSSG %d clients" % (version, clients), route(clients, version)))
+    return benchmarks
+
+
+"""Returns the microseconds per operation of the fastest of REPEAT runs of step, each run lasting at least
+min_time / REPEAT seconds"""
+def measure(step, min_time):
+    loops = 1
+    while True:
+        elapsed = run(step, loops)
+        if elapsed >= min_time / REPEAT:
+            break
+        loops *= 2
+
+    best = elapsed
+    for repeat in range(REPEAT - 1):
+        best = min(best, run(step, loops))
+    return best / loops * 1e6
+
+
+"""Returns the seconds taken by loops calls of step. The garbage collector is turned off while step runs, as timeit
+does, since a collection walks the whole synthetic state and would land on a random run"""
+def run(step, loops):
+    gc.collect()
+    gc.disable()
+    try:
+        started = timer()
+        for i in range(loops):
+            step(i)
+        return timer() - started
+    finally:
+        gc.enable()
+
+
+"""Runs the benchmarks whose name contains only and returns name -> microseconds per operation"""
+def runAll(only, min_time):
+    results = {}
+    for name, setup in pduBenchmarks() + commandBenchmarks() + routeBenchmarks():
+        if only and only not in name:
+            continue
+        step = setup()
+        try:
+            results[name] = measure(step, min_time)
+        finally:
+            if hasattr(step, "cleanup"):
+                step.cleanup()
+        print("%-34s %12.2f" % (name, results[name]))
+        sys.stdout.flush()
+    return results
+
+
+"""Prints the change of every result against baseline, returns the names of the benchmarks that got slower by more
+than threshold percent"""
+def compare(results, baseline, threshold):
+    regressions = []
+    print("%-34s %12s %12s %9s" % ("benchmark", "baseline us", "current us", "change"))
+    for name in sorted(set(results) | set(baseline)):
+        if name not in baseline:
+            print("%-34s %12s %12.2f %9s" % (name, "-", results[name], "new"))
+            continue
+        if name not in results:
+            continue
+        change = (results[name] - baseline[name]) / baseline[name] * 100
+        flag = ""
+        if change > threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "improved"
+        print("%-34s %12.2f %12.2f %+8.1f%% %s" % (name, baseline[name], results[name], change, flag))
+    return regressions
+
+
+"""Returns the default baseline file of the running interpreter"""
+def defaultBaseline():
+    return os.path.join(BASELINES, "micro_bench_py%d.json" % sys.version_info[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="micro-benchmarks of the codec, the commands and the routing")
+    parser.add_argument("--save", nargs="?", const=defaultBaseline(), help="write the results as a baseline")
+    parser.add_argument("--compare", nargs="?", const=defaultBaseline(), help="compare the results with a baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent slower that counts as a regression")
+    parser.add_argument("--only", default="", help="only run the benchmarks whose name contains this text")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds every benchmark runs for, at least")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+
+    # The ChatService looks for its files in the working directory, it is run in an empty one
+    cwd = os.getcwd()
+    directory = tempfile.mkdtemp()
+    os.chdir(directory)
+    try:
+        print("%-34s %12s" % ("benchmark", "us / op"))
+        results = runAll(args.only, args.min_time)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.save:
+        if not os.path.isdir(os.path.dirname(os.path.abspath(args.save))):
+            os.makedirs(os.path.dirname(os.path.abspath(args.save)))
+        with open(args.save, "w") as baseline_file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results},
+                      baseline_file, indent=2, sort_keys=True)
+        print("Baseline written to %s" % args.save)
+
+    if baseline is not None:
+        print("")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("%d benchmarks slower by more than %.0f%%" % (len(regressions), args.threshold))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
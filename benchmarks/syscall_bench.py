@@ -0,0 +1,190 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: benchmarks/syscall_bench.py
+
+File summary:
+    Counts the send calls the server makes per delivered chat message, with and without write coalescing (see
+    outbound.py). The server runs in a child process whose sockets count every send, sendall and sendmsg call. The
+    benchmark puts --connections clients in groups of --room-size, then --senders clients of every group send
+    --messages MSSG requests each while every member of the group receives them.
+
+    Each engine is run with --no-coalesce (every frame is sent as soon as it is pushed), with one flush per loop turn
+    and with a flush delay of --delay milliseconds.
+
+    Command to execute the benchmark (Python 3):
+
+        python3 benchmarks/syscall_bench.py --connections 200 --room-size 20 --senders 5 --messages 200
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from engine_bench import request, wait_for, login
+from outbound import OutboundLimits
+
+
+"""Socket that counts its send calls, the sockets it accepts count theirs as well"""
+class CountingSocket(socket.socket):
+
+    counter = None      # multiprocessing.RawValue shared with the parent process
+
+    def accept(self):
+        fd, address = self._accept()
+        sock = CountingSocket(self.family, self.type, self.proto, fileno=fd)
+        if socket.getdefaulttimeout() is None and self.gettimeout():
+            sock.setblocking(True)
+        return sock, address
+
+    def send(self, *args):
+        CountingSocket.counter.value += 1
+        return super(CountingSocket, self).send(*args)
+
+    def sendall(self, *args):
+        CountingSocket.counter.value += 1
+        return super(CountingSocket, self).sendall(*args)
+
+    def sendmsg(self, *args):
+        CountingSocket.counter.value += 1
+        return super(CountingSocket, self).sendmsg(*args)
+
+
+"""Body of the server process"""
+def serve(engine, port, limits, counter, directory):
+    os.chdir(directory)
+    sys.stdout = open(os.devnull, "w")
+    CountingSocket.counter = counter
+    from chat_service import ChatService
+    service = ChatService(outbound_limits=limits)
+
+    if engine == "asyncio":
+        import aio_server
+        sock = CountingSocket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("127.0.0.1", port))
+        sock.listen(1024)
+        sock.setblocking(False)
+        aio_server.run(service, "127.0.0.1", port, sock=sock)
+    else:
+        # asyncore creates its listening socket with socket.socket
+        socket.socket = CountingSocket
+        import asyncore_server
+        asyncore_server.ChatServer(service, "127.0.0.1", port).serve_forever()
+
+
+"""Starts the server process and waits until it accepts connections"""
+def start_server(engine, port, limits, counter):
+    directory = tempfile.mkdtemp()
+    process = multiprocessing.get_context("fork").Process(target=serve,
+                                                          args=(engine, port, limits, counter, directory))
+    process.start()
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process, directory
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("server did not start")
+
+
+"""Reads responses until count 140 responses have arrived"""
+async def receive(reader, count):
+    received = 0
+    while received < count:
+        line = await reader.readline()
+        if not line:
+            return
+        if b'"140"' in line:
+            received += 1
+
+
+"""Runs the benchmark against a server listening on port, returns the messages delivered and the seconds taken"""
+async def run(port, connections, room_size, senders, messages, counter):
+    clients = [client for client in await asyncio.gather(*[login(port, "user%d" % i) for i in range(connections)])
+               if client is not None]
+    rooms = [clients[i:i + room_size] for i in range(0, len(clients), room_size)]
+
+    for number, room in enumerate(rooms):
+        chat_name = "room%d" % number
+        reader, writer, username = room[0]
+        writer.write(request("CHAT", {"username": username, "chat_name": chat_name}))
+        await wait_for(reader, "170")
+        for reader, writer, username in room[1:]:
+            writer.write(request("JOIN", {"username": username, "chat_name": chat_name}))
+            await wait_for(reader, "180")
+        room[0][1].write(request("MSSG", {"username": room[0][2], "chat_name": chat_name}, "DC", "ready"))
+        await asyncio.gather(*[wait_for(reader, "140") for reader, writer, username in room])
+
+    # Every member receives the messages of all the senders of its group, its own included
+    sends = counter.value
+    started = time.time()
+    receivers = []
+    delivered = 0
+    for number, room in enumerate(rooms):
+        for reader, writer, username in room[:senders]:
+            for i in range(messages):
+                writer.write(request("MSSG", {"username": username, "chat_name": "room%d" % number}, "DC",
+                                     "(%s) message %d" % (username, i)))
+        count = min(senders, len(room)) * messages
+        for reader, writer, username in room:
+            receivers.append(receive(reader, count))
+            delivered += count
+    await asyncio.gather(*receivers)
+    seconds = time.time() - started
+    sends = counter.value - sends
+
+    for reader, writer, username in clients:
+        writer.close()
+    return delivered, seconds, sends
+
+
+def main():
+    parser = argparse.ArgumentParser(description="send calls per delivered message with and without write coalescing")
+    parser.add_argument("--connections", type=int, default=200)
+    parser.add_argument("--room-size", type=int, default=20)
+    parser.add_argument("--senders", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=2.0, help="flush delay in milliseconds")
+    parser.add_argument("--port", type=int, default=12450)
+    parser.add_argument("--engines", default="asyncio,asyncore")
+    args = parser.parse_args()
+
+    modes = [
+        ("immediate", OutboundLimits(coalesce=False)),
+        ("per tick", OutboundLimits()),
+        ("%g ms" % args.delay, OutboundLimits(flush_delay=args.delay / 1000.0)),
+    ]
+
+    print("%-9s %-10s %12s %12s %14s %14s" % ("engine", "writes", "deliveries", "send calls", "sends/message",
+                                              "deliveries/s"))
+    port = args.port
+    for engine in args.engines.split(","):
+        for name, limits in modes:
+            counter = multiprocessing.RawValue("L", 0)
+            process, directory = start_server(engine, port, limits, counter)
+            try:
+                delivered, seconds, sends = asyncio.run(run(port, args.connections, args.room_size, args.senders,
+                                                            args.messages, counter))
+                print("%-9s %-10s %12d %12d %14.3f %14.0f" % (engine, name, delivered, sends,
+                                                               float(sends) / delivered, delivered / seconds))
+            finally:
+                process.kill()
+                process.join()
+                shutil.rmtree(directory, ignore_errors=True)
+            port += 1
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: broker.py
+
+File summary:
+    The purpose of this file is to let several servers, on different ports or hosts, share the groups, so that a
+    single server process is neither the limit of the capacity nor a single point of failure. Every server (node) is
+    started with --broker and connects to a small broker process:
+
+        python3 broker.py --port 12400
+        python3 server.py --port 12345 --broker 127.0.0.1:12400
+        python3 server.py --port 12346 --broker 127.0.0.1:12400
+
+    A node subscribes to a group at the broker when it gets its first local client in the group and unsubscribes when
+    the last one is gone, the same way the workers of cluster.py subscribe at the owner of the group. A response for a
+    group (MSSG, JOIN, LEVE, KICK, BANN) is delivered to the local members first and then published to the broker once.
+    The broker sends it on to the other nodes subscribed to the group, which deliver it to their own members. The load
+    of a node therefore depends on its own connections and the groups they are in, not on the traffic of the cluster.
+
+    Changes to the user accounts and groups are published as well and sent to every other node. The broker numbers
+    them and keeps the last RECORDS of them, so a node started later catches up with the accounts and groups created
+    before. Every node acknowledges the changes it has written to its journal, and a node that connects again is only
+    sent the changes after the last one it has acknowledged. A node that has missed changes the broker no longer holds
+    is warned and has to start from a copy of the files of another node. Every node keeps its own files, each node must
+    run in its own directory.
+
+    A node that loses the broker keeps serving its own clients and reconnects, subscribing again to the groups it has
+    clients in. The group responses published while it is not connected are held back, up to PENDING of them, the
+    oldest ones are dropped beyond that. The state changes are all held back, the other nodes would never get a
+    dropped one.
+
+    The chat messages of a group are logged by every node with members in it, HIST reads the log of the local node.
+    The history replayed on JOIN is kept by each node as well (see history.py), it only holds the messages the node
+    has received while it had members in the group.
+    The roster of a group lists the members connected to the local node (see roster.py).
+
+    Messages between the nodes and the broker are JSON objects prefixed by their uint32 length. The broker forwards the
+    bytes it has received without encoding them again. Requires Python 3.
+"""
+
+import argparse
+import asyncio
+import json
+import struct
+from collections import deque
+from pdu_response import PDUResponse
+
+HOST = "127.0.0.1"
+PORT = 12400
+PENDING = 65536     # messages a node holds back while it is not connected to the broker
+RECORDS = 100000    # state changes the broker keeps for the nodes connecting later
+RETRY = 0.5         # seconds between two attempts to connect to the broker
+
+
+"""Connection carries length prefixed JSON messages between a node and the broker, in both directions"""
+class Connection(asyncio.Protocol):
+
+    LENGTH = struct.Struct(">I")
+
+    """Constructor of Connection
+    receive -> function called with the connection, every message received and its frame
+    lost -> function called with the connection once it has been closed"""
+    def __init__(self, receive, lost):
+        self.receive = receive
+        self.lost = lost
+        self.transport = None
+        self.buffer = bytearray()
+
+    """Called by asyncio when the connection is up"""
+    def connection_made(self, transport):
+        self.transport = transport
+
+    """Called by asyncio with the bytes received"""
+    def data_received(self, data):
+        buffer = self.buffer
+        buffer.extend(data)
+        start = 0
+        while len(buffer) - start >= 4:
+            end = start + 4 + Connection.LENGTH.unpack_from(buffer, start)[0]
+            if len(buffer) < end:
+                break
+            frame = bytes(buffer[start:end])
+            self.receive(self, json.loads(frame[4:].decode('utf-8')), frame)
+            start = end
+        del buffer[:start]
+
+    """Called by asyncio when the connection has been closed"""
+    def connection_lost(self, exc):
+        self.transport = None
+        self.lost(self)
+
+    """Sends an encoded message"""
+    def send(self, frame):
+        if self.transport is not None:
+            self.transport.write(frame)
+
+
+"""Returns message encoded for a Connection"""
+def encode(message):
+    data = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    return Connection.LENGTH.pack(len(data)) + data
+
+
+"""Returns the address of the broker given the --broker option, (host, port) or the path of a Unix socket"""
+def brokerAddress(option):
+    host, separator, port = option.rpartition(":")
+    if separator and port.isdigit():
+        return (host or HOST, int(port))
+    return option
+
+
+"""Broker relays the group responses and the state changes between the nodes"""
+class Broker:
+
+    """Constructor of Broker
+    limit -> number of state changes kept for the nodes connecting later"""
+    def __init__(self, limit=RECORDS):
+        self.limit = limit
+        self.nodes = {}         # Connection -> name of the node
+        self.subscribers = {}   # chat_name -> set of the Connections of the nodes with clients in the group
+        self.records = deque()  # (sequence, name of the node, frame) of the last state changes, oldest first
+        self.sequence = 0       # sequence number of the last state change
+        self.cursors = {}       # name of every node that has connected -> sequence of its last acknowledged change
+
+    """Returns the Connection of a node that has connected"""
+    def connection(self):
+        return Connection(self.receive, self.lost)
+
+    ## STATEFUL - messages from the nodes ##
+    """Processes a message received from a node"""
+    def receive(self, node, message, frame):
+        op = message["op"]
+
+        if op == "room":
+            for subscriber in self.subscribers.get(message["chat_name"], ()):
+                if subscriber is not node:
+                    subscriber.send(frame)
+
+        elif op == "sub":
+            self.subscribers.setdefault(message["chat_name"], set()).add(node)
+
+        elif op == "unsub":
+            self.unsubscribe(message["chat_name"], node)
+
+        elif op == "state":
+            self.sequence += 1
+            origin = self.nodes.get(node)
+            frame = encode({"op": "state", "sequence": self.sequence, "record": message["record"]})
+            self.records.append((self.sequence, origin, frame))
+            for other in self.nodes:
+                if other is not node:
+                    other.send(frame)
+            # The node that made the change has it
+            if self.cursors.get(origin) == self.sequence - 1:
+                self.cursors[origin] = self.sequence
+            if len(self.records) > self.limit:
+                self.records.popleft()
+
+        elif op == "ack":
+            name = self.nodes.get(node)
+            if name is not None:
+                self.acknowledge(name, message["sequence"])
+
+        elif op == "hello":
+            # The node catches up with the changes made since the last one it has acknowledged
+            name = message["node"]
+            self.nodes[node] = name
+            cursor = self.cursors.setdefault(name, 0)
+            print("Node %s connected" % name)
+            if self.records and self.records[0][0] > cursor + 1:
+                print("Node %s has missed %d dropped changes" % (name, self.records[0][0] - cursor - 1))
+                node.send(encode({"op": "missed", "count": self.records[0][0] - cursor - 1}))
+            node.send(b''.join(record for sequence, origin, record in self.records
+                               if sequence > cursor and origin != name))
+
+    """Records that the node name has every change up to sequence, and the ones it made itself right after"""
+    def acknowledge(self, name, sequence):
+        records = self.records
+        if sequence <= self.cursors.get(name, 0):
+            return
+        if records and sequence >= records[0][0] - 1:
+            position = sequence - records[0][0] + 1
+            while position < len(records) and records[position][1] == name:
+                position += 1
+            sequence = records[0][0] + position - 1
+        self.cursors[name] = sequence
+
+    """Removes node from the subscribers of chat_name"""
+    def unsubscribe(self, chat_name, node):
+        nodes = self.subscribers.get(chat_name)
+        if nodes is not None:
+            nodes.discard(node)
+            if not nodes:
+                del self.subscribers[chat_name]
+
+    """Forgets a node whose connection has been closed"""
+    def lost(self, node):
+        name = self.nodes.pop(node, None)
+        for chat_name in list(self.subscribers):
+            self.unsubscribe(chat_name, node)
+        if name is not None:
+            print("Node %s disconnected" % name)
+
+
+"""BrokerLink connects the ChatService of a node to the broker. It takes the place of the Cluster of cluster.py"""
+class BrokerLink:
+
+    """Constructor of BrokerLink
+    service -> ChatService of this node
+    address -> (host, port) or Unix socket path of the broker
+    name -> name of this node, unique in the cluster"""
+    def __init__(self, service, address, name):
+        self.service = service
+        self.address = address
+        self.name = name
+        self.loop = None
+        self.connection = None                  # Connection to the broker, None while it is not connected
+        self.pending = deque(maxlen=PENDING)    # group responses waiting for the connection
+        self.changes = deque()                  # state changes waiting for the connection, never dropped
+        self.acknowledged = None                # sequence number of the last change to acknowledge, None if sent
+
+        service.cluster = self
+        service.client_map.listener = self
+        service.store.replicate = self.replicate
+
+    """Starts connecting to the broker, the node accepts clients in the meantime"""
+    async def start(self, loop):
+        self.loop = loop
+        loop.create_task(self.connect())
+
+    """Connects to the broker, retrying until it is listening"""
+    async def connect(self):
+        while True:
+            try:
+                if isinstance(self.address, tuple):
+                    transport, connection = await self.loop.create_connection(
+                        lambda: Connection(self.receive, self.lost), *self.address)
+                else:
+                    transport, connection = await self.loop.create_unix_connection(
+                        lambda: Connection(self.receive, self.lost), self.address)
+                break
+            except (OSError, ConnectionError):
+                await asyncio.sleep(RETRY)
+        print("Connected to the broker at %s" % (self.address,))
+
+        # The broker has forgotten the groups of this node if the connection was lost
+        connection.send(encode({"op": "hello", "node": self.name}))
+        client_map = self.service.client_map
+        for chat_name in set(client_map.rooms) | set(client_map.lingering):
+            connection.send(encode({"op": "sub", "chat_name": chat_name}))
+        self.connection = connection
+        while self.changes:
+            connection.send(self.changes.popleft())
+        while self.pending:
+            connection.send(self.pending.popleft())
+
+    """Called when the connection to the broker has been closed, the node connects again"""
+    def lost(self, connection):
+        if connection is self.connection:
+            self.connection = None
+            print("Lost the broker at %s" % (self.address,))
+            self.loop.create_task(self.connect())
+
+    """Sends an encoded message to the broker, holding it back while the broker is not connected. state is True for the
+    state changes, which are held back whatever their number"""
+    def send(self, frame, state=False):
+        if self.connection is not None:
+            self.connection.send(frame)
+        elif state:
+            self.changes.append(frame)
+        else:
+            self.pending.append(frame)
+
+    """Called by the RoutingIndex when the first local client enters or lingers in chat_name"""
+    def roomOpened(self, chat_name):
+        if self.connection is not None:
+            self.connection.send(encode({"op": "sub", "chat_name": chat_name}))
+
+    """Called by the RoutingIndex when the last local client of chat_name is gone"""
+    def roomClosed(self, chat_name):
+        if self.connection is not None:
+            self.connection.send(encode({"op": "unsub", "chat_name": chat_name}))
+
+    """Returns True since every node logs the messages of the groups it has clients in"""
+    def logs(self, chat_name):
+        return True
+
+    """Returns False since every node replays the history it keeps itself"""
+    def requestHistory(self, chat_name, handler):
+        return False
+
+    """Publishes a group response that has been delivered to the local members to the other nodes in the group"""
+    def publish(self, chat_name, command, response, moved_out):
+        self.send(encode({
+            "op": "room",
+            "origin": self.name,
+            "chat_name": chat_name,
+            "command": command,
+            "response": [response.response_code, response.parameters, response.channel, response.payload],
+            "moved_out": moved_out
+        }))
+
+    """Publishes a state change made by this node to every other node"""
+    def replicate(self, record):
+        self.send(encode({"op": "state", "record": record}), True)
+
+    ## STATEFUL - messages relayed by the broker ##
+    """Processes a message received from the broker"""
+    def receive(self, connection, message, frame):
+        op = message["op"]
+
+        if op == "room":
+            code, parameters, channel, payload = message["response"]
+            self.service.deliverRelayed(message["chat_name"], message["command"],
+                                        PDUResponse(code, parameters, channel, payload), message["moved_out"])
+
+        elif op == "state":
+            # The changes are sent again when the node connects, only the new ones are written to the journal
+            if self.service.store.apply(message["record"]):
+                self.service.store.persist(message["record"])
+
+            # A burst of changes, e.g. when the node catches up, is acknowledged once
+            if self.acknowledged is None:
+                self.loop.call_soon(self.acknowledge)
+            self.acknowledged = message["sequence"]
+
+        elif op == "missed":
+            print("Missed %d changes to the accounts and groups dropped by the broker, copy the files of another node"
+                  % message["count"])
+
+    """Acknowledges the changes received so far to the broker. A node that has lost the broker acknowledges nothing, it
+    catches up again when it reconnects"""
+    def acknowledge(self):
+        if self.acknowledged is not None and self.connection is not None:
+            self.connection.send(encode({"op": "ack", "sequence": self.acknowledged}))
+        self.acknowledged = None
+
+
+"""Runs the broker until it is stopped"""
+def serve(host, port, path=None):
+    broker = Broker()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    if path is not None:
+        server = loop.run_until_complete(loop.create_unix_server(broker.connection, path))
+        print("Broker listening on %s" % path)
+    else:
+        server = loop.run_until_complete(loop.create_server(broker.connection, host, port))
+        print("Broker listening on %s:%d" % (host, port))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chat Service Protocol broker relaying the groups between servers")
+    parser.add_argument("--host", default=HOST, help="IP the broker listens on")
+    parser.add_argument("--port", type=int, default=PORT, help="port the broker listens on")
+    parser.add_argument("--unix", default=None, metavar="PATH", help="listen on this Unix socket instead")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.unix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,647 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: chat_service.py
+
+File summary:
+    The purpose of this file is to hold the part of the server that does not depend on how the sockets are driven. The
+    ChatService owns the StateStore and the client_map, processes the decoded requests and pushes the responses. It is
+    shared by the legacy asyncore engine in asyncore_server.py and the asyncio engine in aio_server.py, so both engines follow the
+    same PDU semantics and return the same response codes.
+
+    Each engine creates one handler object per connection. The ChatService only relies on three things from a handler:
+
+        handler.codec           -> wire format of the connection (see pdu_codec.py)
+        handler.push(frame, droppable)
+                                -> sends an encoded frame to the client, droppable is True for chat messages
+        handler.outbound        -> OutboundQueue of the frames waiting to be sent (see outbound.py)
+        handler.setCodec(codec) -> switches the wire format of the connection
+        handler.inbound         -> InboundQueue of the bytes received that have not been processed (see inbound.py)
+        handler.resumeReading() -> reads the connection again once its InboundQueue has been drained
+        handler.abort()         -> closes a connection that has not answered a heartbeat probe (see heartbeat.py)
+
+    The engine also sets credentials.post to a function that runs a function on its event loop thread, so that the
+    CredentialPool can hand the checked passwords back from its workers (see credentials.py).
+
+    The engine calls connect when a client connects, adds the connections it has read bytes from to the RequestScheduler
+    (requests), which calls handleRequest for every decoded request in turns and within the rate limits of the server,
+    and calls disconnect when the connection is closed. The engine ticks the Heartbeats, which probe the idle
+    connections and close the ones that do not answer. Every request is dispatched by the CommandRegistry (see
+    commands.py), which also keeps the number of calls and the processing time of every command.
+
+    The chat messages of every group are kept in the MessageHistory (see history.py) and replayed to a client once it
+    has joined the group. They are also appended to the MessageLog on disk (see message_log.py), which HIST reads back
+    a page at a time.
+
+    The Metrics of the service (see metrics.py) count the requests, the chat message fan-out and the bytes the engine
+    has read and sent, and read the connections, sessions and queue depths when they are rendered. The users given as
+    admins of the server get them with STAT. They can also switch the SamplingProfiler on and off with PROF (see
+    profiler.py).
+
+    LIST pages through the RoomDirectory of the StateStore (see room_directory.py). RSTR sends the members of a group,
+    which the client_map keeps in a RoomRoster, and then every change of them as a delta (see roster.py).
+
+    A successful NWUA or AUTH response holds a token, which RSUM uses to resume the session on a new connection and
+    replay the chat messages missed in the meantime (see resume.py).
+"""
+
+import time
+import request_handler as reqh
+import commands
+import pdu_codec
+from state_store import StateStore
+from routing import RoutingIndex
+from pdu_response import PDUResponse
+from outbound import OutboundLimits
+from credentials import CredentialPool
+from history import MessageHistory
+from message_log import MessageLog, SEGMENT_BYTES
+from metrics import Metrics
+from profiler import SamplingProfiler, RATE
+from resume import SessionTokens, RETENTION
+from inbound import RateLimits, RequestScheduler
+from heartbeat import Heartbeats
+
+USER_FILE = "./user_accounts.txt"       # File that stores the user credentials
+LIST_FILE = "./list.txt"                # File that stores the group / chat room details
+JOURNAL_FILE = "./journal.txt"          # File that the changes to the user accounts and groups are appended to
+
+
+"""Returns the StateStore loaded from the files of the server. With several worker processes it is loaded once by the
+parent before the workers are forked (see cluster.py)"""
+def loadStore(writable=True):
+    return StateStore(USER_FILE, LIST_FILE, JOURNAL_FILE, writable=writable)
+
+
+"""ChatService processes the requests of all the connected clients"""
+class ChatService:
+
+    __version = 1.0                         # Server protocol version
+    __versions = [1.0, 2.0]                 # Protocol versions the server accepts, 2.0 uses the binary wire format
+    __history_page = 500                    # Most messages returned by a single HIST request
+    __list_page = 500                       # Most group names returned by a single LIST request
+    __list_pages = 1024                     # Most LIST pages cached at the same time
+    __roster_page = 500                     # Most usernames returned by a single RSTR request
+
+    """Constructor of ChatService
+    writable -> False if another worker process writes the journal (see cluster.py)
+    outbound_limits -> OutboundLimits of the queue of every connection (see outbound.py)
+    auth_workers -> number of workers hashing and checking the passwords, 0 hashes on the event loop
+    history_limits -> HistoryLimits of the messages kept for every group (see history.py)
+    log_directory -> directory of the MessageLog keeping every chat message on disk, None keeps no log
+    segment_bytes -> size at which the log of a group starts a new segment
+    admins -> usernames allowed to read the metrics of the server with STAT and to run the profiler with PROF
+    profile_directory -> directory the profiles are written to
+    profile_rate -> samples per second of the profiler
+    compress_threshold -> frames with a longer body are compressed on the connections that negotiated compression,
+                          None never negotiates it
+    resume_seconds -> seconds a session that has lost its connection can be resumed with RSUM, 0 issues no tokens
+    rate_limits -> RateLimits of the requests of every connection and group (see inbound.py)
+    heartbeats -> Heartbeats probing the idle connections (see heartbeat.py)
+    store -> StateStore already loaded, None loads it from the files"""
+    def __init__(self, writable=True, outbound_limits=None, auth_workers=4, history_limits=None,
+                 log_directory="./messages", segment_bytes=SEGMENT_BYTES, admins=(), profile_directory="./profiles",
+                 profile_rate=RATE, compress_threshold=pdu_codec.COMPRESS_BYTES, resume_seconds=RETENTION,
+                 rate_limits=None, heartbeats=None, store=None):
+        # Loads the user accounts and group details once. All requests are served from this in-memory copy
+        if store is None:
+            store = loadStore(writable)
+        store.writable = writable
+        self.store = store
+
+        # client_map holds a session per connected client. Every change of the members of a group is sent to the
+        # members that have fetched its roster
+        self.client_map = RoutingIndex()
+        self.client_map.roster_listener = self.rosterChanged
+
+        # Hashes and checks the passwords of NWUA and AUTH off the event loop
+        self.credentials = CredentialPool(auth_workers)
+
+        # A single RequestHandler serves every request. The registry maps the commands to its functions
+        self.request_handler = reqh.RequestHandler(self.store, self.client_map, self.credentials, self.respond)
+        self.registry = commands.CommandRegistry(self.client_map, self.respond)
+        self.registerCommands()
+
+        # Cluster relaying group responses to the other worker processes (see cluster.py) or to the other servers through
+        # a broker (see broker.py), or None when the server is a single process
+        self.cluster = None
+
+        # handler -> group whose history has been asked from the owner of the group and has not been received yet
+        self.replaying = {}
+
+        # Limits on the frames waiting for a slow client, the engines create the queue of every connection with them
+        self.outbound_limits = outbound_limits or OutboundLimits()
+
+        # Rates of the requests, the engines create the InboundQueue of every connection with them. The scheduler
+        # processes the requests of the connections in turns
+        self.rate_limits = rate_limits or RateLimits()
+        self.requests = RequestScheduler(self, self.rate_limits)
+
+        # Probes the connections that have been idle and closes the ones that are gone
+        self.heartbeats = heartbeats or Heartbeats()
+
+        # Last chat messages of every group, replayed on JOIN
+        self.history = MessageHistory(history_limits)
+
+        # Every chat message on disk, or None
+        self.message_log = MessageLog(log_directory, segment_bytes) if log_directory else None
+
+        # Counters and histograms of the server, the engine adds the bytes it reads and sends
+        self.admins = frozenset(admins)
+        self.metrics = Metrics()
+        self.registerMetrics()
+
+        # LIST responses with their frames by (prefix, cursor, count, not modified), dropped when CHAT creates a group
+        self.list_pages = {}
+        self.list_revision = None
+
+        # Samples the stack of the event loop thread, which creates the ChatService, while an admin has it switched on
+        self.profiler = SamplingProfiler(profile_directory, profile_rate)
+
+        # Wire formats of the connections that negotiated compression, by compression. Every connection of a kind shares
+        # the same codec, so a frame fanned out to a group is compressed once
+        self.compressors = {}
+        if compress_threshold is not None:
+            for compression in pdu_codec.COMPRESSIONS:
+                self.compressors[compression] = pdu_codec.DeflateCodec(compression, compress_threshold)
+
+        # Tokens resuming the sessions whose connection has dropped, or None
+        self.sessions = SessionTokens(resume_seconds) if resume_seconds > 0 else None
+
+    """Returns version number of servers protocol"""
+    def getVersion(self):
+        return self.__version
+
+    """Returns True if the server can talk to a client running on version"""
+    def supportsVersion(self, version):
+        return version in self.__versions
+
+    """Called by the engine when a client connects with the server"""
+    def connect(self, handler):
+        # Only the handler field is filled as the username, chat_name and prev_chat details won't exist when the
+        # client first connects with the server
+        self.client_map.connect(handler)
+        self.heartbeats.add(handler)
+        self.metrics.accepted += 1
+
+    """Called by the engine when the connection of a client has been closed"""
+    def disconnect(self, handler):
+        # The session can be resumed with its token, in the group it was in
+        session = self.client_map.getSession(handler)
+        if self.sessions is not None and session is not None and session.username != "":
+            self.sessions.detach(session.username, session.chat_name, self.history.sequence, time.time())
+        self.replaying.pop(handler, None)
+        self.client_map.disconnect(handler)
+
+    """Declares every command the server accepts with its parameters, the state the session must be in and the function
+    handling it"""
+    def registerCommands(self):
+        reqh_obj = self.request_handler
+        register = self.registry.register
+
+        # Commands sent before the client has logged in
+        register("REDY", [], commands.ANY, self.readyAction, optional={"compression": None}, fields=["version"])
+        register("NWUA", ["username", "password"], commands.ANY, reqh_obj.createNewUserAccount)
+        register("AUTH", ["username", "password"], commands.ANY, reqh_obj.loginAuthentication)
+        register("VRSN", [], commands.ANY, reqh_obj.incompatibleVersion)
+        register("RSUM", ["token"], commands.ANY, self.resumeAction)
+        register("PING", [], commands.ANY, self.pingAction)
+
+        # Commands of a logged in client
+        register("LIST", ["username"], commands.AUTHENTICATED, self.listAction,
+                 optional={"prefix": "", "cursor": None, "count": 100, "revision": None})
+        register("CHAT", ["username", "chat_name"], commands.AUTHENTICATED, reqh_obj.createNewChat)
+        register("JOIN", ["username", "chat_name"], commands.AUTHENTICATED, reqh_obj.joinAction)
+
+        # Commands of a client in a group
+        register("LEVE", ["username", "chat_name"], commands.IN_GROUP, reqh_obj.leaveChat)
+        register("KICK", ["username", "chat_name", "kicked_user"], commands.IN_GROUP, reqh_obj.kickAction)
+        register("BANN", ["username", "chat_name", "banned_user"], commands.IN_GROUP, reqh_obj.banAction)
+        register("MSSG", ["username", "chat_name"], commands.IN_GROUP, self.broadcastMessage,
+                 optional={"echo": True}, fields=["payload"], data=True)
+        register("HIST", ["username", "chat_name"], commands.IN_GROUP, self.historyAction,
+                 optional={"start": None, "count": 100})
+
+        # Commands of an admin of the server
+        register("STAT", ["username"], commands.AUTHENTICATED, self.statsAction)
+        register("PROF", ["username", "action"], commands.AUTHENTICATED, self.profileAction, optional={"rate": None})
+        register("RSTR", ["username", "chat_name"], commands.IN_GROUP, self.rosterAction,
+                 optional={"cursor": None, "count": 100, "revision": None})
+
+    """Declares the metrics that are read from the state of the server when they are rendered"""
+    def registerMetrics(self):
+        metrics = self.metrics
+        client_map = self.client_map
+        register = metrics.register
+        registered = self.registry.commands.values
+
+        register("chat_requests_total", "counter", "Requests processed by command",
+                 lambda: [((("command", command.name),), command.calls) for command in registered()])
+        register("chat_requests_rejected_total", "counter", "Requests answered with 300 by command",
+                 lambda: [((("command", command.name),), command.rejected) for command in registered()])
+        register("chat_request_duration_seconds", "histogram",
+                 "Time spent processing a request and delivering its responses, NWUA and AUTH without the hashing",
+                 lambda: [((("command", command.name),), command.latency) for command in registered()])
+        register("chat_requests_throttled_total", "counter", "Requests that waited or were rejected over a rate limit",
+                 lambda: self.requests.throttled)
+        register("chat_mssg_fanout", "histogram", "Members of the group a chat message has been pushed to",
+                 lambda: metrics.fanout)
+        register("chat_bytes_received_total", "counter", "Bytes read from the connections",
+                 lambda: metrics.bytes_in)
+        register("chat_bytes_sent_total", "counter", "Bytes handed to the connections", lambda: metrics.bytes_out)
+        register("chat_connections_accepted_total", "counter", "Connections accepted", lambda: metrics.accepted)
+        register("chat_connections", "gauge", "Open connections", lambda: len(client_map.connections))
+        register("chat_heartbeat_probes_total", "counter", "Heartbeat probes sent to idle connections",
+                 lambda: self.heartbeats.probes)
+        register("chat_connections_reaped_total", "counter", "Connections closed for not answering a heartbeat probe",
+                 lambda: self.heartbeats.reaped)
+        register("chat_authenticated_users", "gauge", "Logged in users", lambda: len(client_map.users))
+        register("chat_rooms", "gauge", "Groups with at least one member", lambda: len(client_map.rooms))
+        register("chat_outbound_queue_bytes", "gauge", "Bytes waiting to be sent, for every connection that has any",
+                 self.queueDepths)
+        register("chat_outbound_dropped", "gauge", "Chat messages dropped for the open connections",
+                 lambda: sum(handler.outbound.dropped for handler in client_map.connections))
+        register("chat_history_bytes", "gauge", "Bytes of chat messages kept in memory for the groups",
+                 lambda: self.history.bytes)
+        register("chat_uptime_seconds", "gauge", "Seconds since the server started",
+                 lambda: time.time() - metrics.started)
+
+    """Returns the depth of every outbound queue that is not empty, labelled with the connection and its username"""
+    def queueDepths(self):
+        depths = []
+        for handler, session in self.client_map.connections.items():
+            if handler.outbound.bytes:
+                labels = (("connection", "%x" % id(handler)), ("username", session.username))
+                depths.append((labels, handler.outbound.bytes))
+        return depths
+
+    ## STATEFUL - the CommandRegistry checks the state of the session before calling the function of the command ##
+    """Processes a request that the engine has decoded from the connection of handler"""
+    def handleRequest(self, req_obj, handler):
+        # checking if client and the server are running on the same version of the protocol
+        if not self.supportsVersion(req_obj.get("version")):
+            # The versions of the client and server is not the same. Returns response code associated with incompatible version
+            self.registry.dispatch("VRSN", req_obj, handler)
+        else:
+            self.registry.dispatch(req_obj.get("command"), req_obj, handler)
+
+    """Delivers the response of a command to the clients that should receive it. Called by the CommandRegistry
+    command -> command of the request
+    obj -> parameters of the request
+    response -> PDUResponse returned by the function of the command
+    handler -> connection that sent the request"""
+    def respond(self, command, obj, response, handler):
+        # A successful login holds the token that resumes the session once its connection has dropped
+        if response.response_code == "110" and self.sessions is not None:
+            response.parameters["token"] = self.sessions.issue(obj["username"])
+
+        # The client_map works out who receives the response. Responses for a group only touch the members of
+        # the group and the clients whose prev_chat is the group
+        chat_name = obj.get("chat_name", "")
+        recipients = self.client_map.recipients(command, chat_name, response.response_code, handler)
+        request_id = obj.get("request_id")
+        if request_id is None:
+            self.deliver(response, recipients)
+        else:
+            # The requester gets its own copy carrying the request_id, the other recipients share the frame without it
+            self.deliver(response, [recipient for recipient in recipients if recipient is not handler])
+            if handler in recipients:
+                self.deliver(response.withRequestId(request_id), [handler])
+
+        # Members of the group that are connected to other worker processes
+        moved_out = self.movedOutUser(obj, response)
+        if self.cluster is not None and chat_name != "" and command not in RoutingIndex.REPLY_COMMANDS:
+            self.cluster.publish(chat_name, command, response, moved_out)
+
+        # A user kicked or banned while its connection is closed does not resume in the group
+        if moved_out is not None and self.sessions is not None:
+            self.sessions.moveOut(moved_out, chat_name)
+
+        # A client that has joined a group receives the last messages of the group after the 180 response
+        if command == "JOIN" and response.response_code == "180":
+            self.replayHistory(chat_name, handler)
+
+        # REDY with a different version or a compression negotiates the wire format. The 100 response is still sent
+        # in the old format
+        if command == "REDY" and response.response_code == "100":
+            codec = self.compressors.get(response.parameters.get("compression"), pdu_codec.CODECS[obj["version"]])
+            if codec.name != handler.codec.name:
+                handler.setCodec(codec)
+
+    """Returns the 100 response to REDY. The compression of the response is the first one offered by the client that
+    the server supports, when the client uses the binary format. A single name is taken as a list of one"""
+    def readyAction(self, obj, handler):
+        response = self.request_handler.readyAction(obj, handler)
+        offered = obj["compression"]
+        if offered is not None and obj["version"] == pdu_codec.BinaryCodec.version:
+            if not isinstance(offered, list):
+                offered = [offered]
+            for compression in offered:
+                if isinstance(compression, commands.TEXT) and compression in self.compressors:
+                    response.parameters["compression"] = compression
+                    break
+        return response
+
+    """Answers a heartbeat probe (see heartbeat.py). Receiving the request is all that is needed, it gets no response"""
+    def pingAction(self, obj, handler):
+        return None
+
+    """Logs the client in again as the user the token was issued to and puts it back in the group it was in, unless it
+    has been banned from it since. The 111 response holds the username, the group and a new token, it is followed by
+    the chat messages of the group the client has missed that the MessageHistory still holds. A token that is unknown,
+    used or expired gets 210, the client then logs in with AUTH"""
+    def resumeAction(self, obj, handler):
+        now = time.time()
+        ticket = self.sessions.redeem(obj["token"], now) if self.sessions is not None else None
+        if ticket is None:
+            return PDUResponse("210", {}, "CC", "Session cannot be resumed")
+        username = ticket.username
+
+        if ticket.detached is None:
+            # The server has not noticed that the old connection is gone, the session moves to this connection
+            session = self.client_map.bind(username, handler)
+            if session is None:
+                session = self.client_map.login(username, handler)
+            chat_name = session.chat_name
+        else:
+            chat_name = ticket.chat_name
+            if chat_name != "" and self.store.isBanned(chat_name, username):
+                chat_name = ""
+            self.client_map.login(username, handler)
+            if chat_name != "":
+                self.client_map.join(username, chat_name, handler, "")
+
+        parameters = {"username": username, "chat_name": chat_name, "token": self.sessions.issue(username)}
+        response = PDUResponse("111", parameters, "CC", "Session resumed")
+        if "request_id" in obj:
+            response = response.withRequestId(obj["request_id"])
+        self.deliver(response, [handler])
+
+        # The messages sent to the group since the connection was closed
+        if chat_name != "" and ticket.sequence is not None:
+            self.history.replay(chat_name, handler, ticket.sequence)
+        return None
+
+    """Pushes response to every handler in recipients. The response is serialized once per wire format and the same
+    string is pushed to every handler using that format. Frames on the data channel are chat messages, which a slow
+    client may miss. frames holds the frames already encoded for response, by wire format name. Returns the frames"""
+    def deliver(self, response, recipients, frames=None):
+        if frames is None:
+            frames = {}
+        droppable = response.channel == "DC"
+        for handler in recipients:
+            frame = frames.get(handler.codec.name)
+            if frame is None:
+                frame = frames[handler.codec.name] = handler.codec.encodeResponse(response)
+            handler.push(frame, droppable)
+        return frames
+
+    ## STATEFUL - MSSG is only valid once the client has joined a group ##
+    """Sends a chat message to every member of the senders group. The response is serialized once per wire format and
+    the same string is pushed to every member, it is never parsed again on the server. The sender is skipped when it has
+    set the echo parameter to False, since it has already displayed its own message. Such a MSSG gets no response, even
+    with a request_id"""
+    def broadcastMessage(self, obj, handler):
+        response = PDUResponse("140", {}, "DC", obj["payload"])
+        members = self.client_map.members(obj["chat_name"])
+        self.metrics.fanout.observe(len(members))
+
+        if obj["echo"] and "request_id" not in obj:
+            frames = self.deliver(response, [session.handler for session in members])
+        else:
+            frames = self.deliver(response, [session.handler for session in members if session.handler is not handler])
+            if obj["echo"]:
+                # The senders copy carries the request_id of the MSSG
+                self.deliver(response.withRequestId(obj["request_id"]), [handler])
+
+        # The frames without a request_id are kept for the clients joining later on
+        self.history.record(obj["chat_name"], response, frames)
+        self.logMessage(obj["chat_name"], response, frames)
+
+        # Members of the group that are connected to other worker processes
+        if self.cluster is not None:
+            self.cluster.publish(obj["chat_name"], "MSSG", response, None)
+
+    """Returns the user that a successful KICK or BANN has taken out of the group, or None"""
+    def movedOutUser(self, obj, response):
+        if response.response_code == "192":
+            return obj["kicked_user"]
+        elif response.response_code == "191":
+            return obj["banned_user"]
+        return None
+
+    """Delivers a group response that was relayed from another worker process to the local members of the group.
+    moved_out is the user taken out of the group by a KICK or BANN, it is moved out here if it is connected locally"""
+    def deliverRelayed(self, chat_name, command, response, moved_out):
+        if moved_out is not None and self.client_map.getUserSession(moved_out) is not None:
+            self.client_map.moveOut(moved_out)
+        elif moved_out is not None and self.sessions is not None:
+            self.sessions.moveOut(moved_out, chat_name)
+        recipients = self.client_map.groupRecipients(command, chat_name)
+
+        # A member waiting for the history of the group gets the message with it
+        if command == "MSSG" and self.replaying:
+            recipients = [handler for handler in recipients if self.replaying.get(handler) != chat_name]
+        frames = self.deliver(response, recipients)
+        if command == "MSSG":
+            self.metrics.fanout.observe(len(recipients))
+            self.history.record(chat_name, response, frames)
+            self.logMessage(chat_name, response, frames)
+
+    """Pushes the last messages of chat_name to handler once it has joined the group. With several worker processes a
+    worker only keeps the messages of the groups it has members in, so the history is asked from the owner of the group
+    (see cluster.py). The relayed messages the worker receives until the answer arrives are part of it and are not
+    pushed to handler meanwhile"""
+    def replayHistory(self, chat_name, handler):
+        if self.cluster is not None and self.cluster.requestHistory(chat_name, handler):
+            self.replaying[handler] = chat_name
+        else:
+            self.history.replay(chat_name, handler)
+
+    """Called by the Cluster with the 1.0 JSON frames of the history of chat_name sent by the owner of the group"""
+    def historyRelayed(self, chat_name, handler, frames):
+        # The client has gone, or has joined another group, since the history was asked for
+        if self.replaying.get(handler) != chat_name:
+            return
+        del self.replaying[handler]
+        session = self.client_map.getSession(handler)
+        if session is None or session.chat_name != chat_name or not frames:
+            return
+        json_codec = pdu_codec.CODECS[1.0]
+        if handler.codec.name != json_codec.name:
+            frames = [handler.codec.encodeResponse(self.toResponse(json_codec.decode(frame))) for frame in frames]
+        handler.push(b''.join(frames), True)
+
+    """Appends a chat message to the MessageLog as its 1.0 JSON frame. With several worker processes only the owner of
+    the group writes its log, every message of the group is relayed through it. With a broker every server logs the
+    groups it has clients in"""
+    def logMessage(self, chat_name, response, frames):
+        if self.message_log is None:
+            return
+        if self.cluster is not None and not self.cluster.logs(chat_name):
+            return
+        json_codec = pdu_codec.CODECS[1.0]
+        frame = frames.get(json_codec.name)
+        if frame is None:
+            frame = json_codec.encodeResponse(response)
+        self.message_log.append(chat_name, frame)
+
+    ## STATEFUL - HIST is only valid once the client has joined the group ##
+    """Sends up to count messages of the log of the group starting with message number start, or the last count messages
+    when start is not given. The 140 responses of the messages are followed by a 150 response with the range that has
+    been sent and the number of messages in the log, the client asks for the previous page with a smaller start. The
+    log is read off the event loop, the responses are sent once it has been read"""
+    def historyAction(self, obj, handler):
+        try:
+            start = None if obj["start"] is None else max(0, int(obj["start"]))
+            count = max(1, min(int(obj["count"]), ChatService.__history_page))
+        except (TypeError, ValueError):
+            return PDUResponse("300", {}, "CC", "Invalid history range")
+
+        def read(result):
+            # The client has gone while the log was read
+            if self.client_map.getSession(handler) is None:
+                return
+            chunks, start, end, total = result
+
+            # The log holds 1.0 JSON frames, they are pushed as they were read. Other wire formats get them encoded
+            # again
+            json_codec = pdu_codec.CODECS[1.0]
+            for chunk in chunks:
+                if handler.codec.name != json_codec.name:
+                    chunk = b''.join(handler.codec.encodeResponse(self.toResponse(json_codec.decode(line)))
+                                     for line in chunk.split(json_codec.terminator) if line)
+                handler.push(chunk)
+
+            response = PDUResponse("150", {"chat_name": obj["chat_name"], "start": start, "end": end, "total": total},
+                                   "CC", "")
+            self.respond("HIST", obj, response, handler)
+
+        if self.message_log is None:
+            read(([], 0, 0, 0))
+        else:
+            self.message_log.readLater(obj["chat_name"], start, count, read, self.credentials.post)
+
+    """Answers LIST with a page of the room directory. The responses are cached by page along with their frames until
+    CHAT creates a group, so a page asked for again is neither looked up nor, without a request_id, encoded again"""
+    def listAction(self, obj, handler):
+        text = (bytes, type(u""))
+        try:
+            count = max(1, min(int(obj["count"]), ChatService.__list_page))
+        except (TypeError, ValueError):
+            return PDUResponse("300", {}, "CC", "Invalid group list page")
+        if not isinstance(obj["prefix"], text) or not (obj["cursor"] is None or isinstance(obj["cursor"], text)):
+            return PDUResponse("300", {}, "CC", "Invalid group list page")
+        obj["count"] = count
+
+        # A group has been created since the pages were cached, either here or on another worker process
+        revision = self.store.directory.revision()
+        if revision != self.list_revision:
+            self.list_pages = {}
+            self.list_revision = revision
+
+        key = (obj["prefix"], obj["cursor"], count, obj["revision"] == revision)
+        page = self.list_pages.get(key)
+        if page is None:
+            if len(self.list_pages) >= ChatService.__list_pages:
+                self.list_pages = {}
+            page = self.list_pages[key] = (self.request_handler.listAction(obj, handler), {})
+
+        response, frames = page
+        if "request_id" in obj:
+            # The frame carrying the request_id is only for this request
+            return response
+        self.deliver(response, [handler], frames)
+        return None
+
+    ## STATEFUL - RSTR is only valid once the client has joined the group ##
+    """Sends the roster of the group (see roster.py). A client sending the revision it holds gets the changes since
+    then in a 133 response, or the first page of the roster when they are no longer kept. Otherwise the 132 response
+    holds at most count usernames after cursor. From then on the client receives every change of the roster"""
+    def rosterAction(self, obj, handler):
+        text = (bytes, type(u""))
+        try:
+            count = max(1, min(int(obj["count"]), ChatService.__roster_page))
+        except (TypeError, ValueError):
+            return PDUResponse("300", {}, "CC", "Invalid roster page")
+        if not (obj["cursor"] is None or isinstance(obj["cursor"], text)):
+            return PDUResponse("300", {}, "CC", "Invalid roster page")
+
+        roster = self.client_map.roster(obj["chat_name"])
+        roster.subscribers.add(self.client_map.getSession(handler))
+
+        if obj["revision"] is not None:
+            changes = roster.changesSince(obj["revision"])
+            if changes is not None:
+                parameters = {"chat_name": obj["chat_name"], "base": obj["revision"], "revision": roster.revision}
+                return PDUResponse("133", parameters, "CC", changes)
+            obj["cursor"] = None
+
+        names, next_cursor, total = roster.page(obj["cursor"], count)
+        parameters = {"chat_name": obj["chat_name"], "cursor": obj["cursor"], "next": next_cursor, "total": total,
+                      "revision": roster.revision}
+        return PDUResponse("132", parameters, "CC", names)
+
+    """Sends a change of the roster of chat_name to its subscribers, the members that have fetched it. Called by the
+    RoutingIndex"""
+    def rosterChanged(self, roster, chat_name, base, revision, action, username):
+        parameters = {"chat_name": chat_name, "base": base, "revision": revision}
+        self.deliver(PDUResponse("133", parameters, "CC", [[action, username]]),
+                     [session.handler for session in roster.subscribers])
+
+    """Returns the metrics of the server as the payload of a 160 response. Only the admins of the server get them"""
+    def statsAction(self, obj, handler):
+        if obj["username"] not in self.admins:
+            return PDUResponse("270", {"username": obj["username"]}, "CC", "You are not an admin of the server")
+        return PDUResponse("160", {"username": obj["username"]}, "CC", self.metrics.render())
+
+    """Switches the profiler on (action start, at rate samples per second) or off (action stop). Stopping it writes the
+    profile and returns its summary. Only the admins of the server can run the profiler"""
+    def profileAction(self, obj, handler):
+        parameters = {"username": obj["username"], "action": obj["action"]}
+        if obj["username"] not in self.admins:
+            return PDUResponse("270", {"username": obj["username"]}, "CC", "You are not an admin of the server")
+
+        if obj["action"] == "start":
+            try:
+                rate = None if obj["rate"] is None else float(obj["rate"])
+            except (TypeError, ValueError):
+                rate = 0
+            if rate is not None and not 0 < rate <= 10000:
+                return PDUResponse("300", {}, "CC", "Invalid profiler rate")
+            if not self.profiler.start(rate):
+                return PDUResponse("300", {}, "CC", "The profiler is already running")
+            return PDUResponse("161", parameters, "CC", "Profiler started")
+
+        elif obj["action"] == "stop":
+            result = self.profiler.stop()
+            if result is None:
+                return PDUResponse("300", {}, "CC", "The profiler is not running")
+            parameters["collapsed"], parameters["summary"], summary = result
+            return PDUResponse("161", parameters, "CC", summary)
+
+        return PDUResponse("300", {}, "CC", "Unknown profiler action " + repr(obj["action"]))
+
+    """Returns the PDUResponse of a decoded response"""
+    def toResponse(self, resp_obj):
+        return PDUResponse(resp_obj["response_code"], resp_obj["parameters"], resp_obj["channel"], resp_obj["payload"])
+
+    """Stops the password workers, syncs the journal and writes the queued messages to the MessageLog. Called when the
+    server stops"""
+    def close(self):
+        self.credentials.close()
+        self.store.close()
+        if self.profiler.running():
+            self.profiler.stop()
+        if self.message_log is not None:
+            self.message_log.close()
+
+    """Returns the username and the outbound queue depth and drop count of every connection"""
+    def outboundStats(self):
+        rows = []
+        for handler, session in self.client_map.connections.items():
+            stats = handler.outbound.stats()
+            stats["username"] = session.username
+            rows.append(stats)
+        return rows
@@ -16,6 +16,10 @@ File summary:
     The ChatClient is primarily responsible for sending requests to the server and receiving responses from the server.
     The server responds in pre-defined response codes. The ChatClient looks at the response code and decides on how to
     deal with the response code.
+
+    Requests that the console has to wait for are sent with a request_id. The server copies the request_id to the
+    response, which completes the matching PendingRequest in found_terminator. The console thread sleeps on the event of
+    the PendingRequest instead of spinning, and several requests can be in flight at the same time.
 """
 
 
@@ -23,17 +27,41 @@ import asynchat
 import asyncore
 import socket
 import threading
-import json
 from pdu_request import PDURequest
 from response_handler import ResponseHandler
+import pdu_codec
 import pdu_data
 
+"""PendingRequest is a request sent with a request_id whose response has not arrived yet"""
+class PendingRequest:
+    """Constructor for PendingRequest"""
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.response = None                # JSON object of the response, None if the connection was closed
+        self.event = threading.Event()      # set once the response has arrived
+
+    """Called by the asyncore thread with the response"""
+    def complete(self, response):
+        self.response = response
+        self.event.set()
+
+    """Blocks until the response has arrived and returns it"""
+    def wait(self):
+        # Waiting in steps keeps Ctrl-C working while the console thread waits
+        while not self.event.wait(1.0):
+            pass
+        return self.response
+
+
 ## CLIENT SPECIFICATION - hardcoding the port that the server is listening on ##
 "Each time the client uses the system, the ChatClient class is instantiated"
 class ChatClient(asynchat.async_chat):
     __host = "127.0.0.1"    # host IP
     __port = 12345          # port that server listens to
+    __history_page = 20     # number of older messages displayed by -history
+    __list_page = 20        # number of groups displayed per page when joining a group
     __version = 1.0         # client protocol version
+    __binary_version = 2.0  # protocol version with the binary wire format, used when the server supports it
 
     """constructor for ChatClient"""
     def __init__(self):
@@ -44,53 +72,116 @@ class ChatClient(asynchat.async_chat):
         # creates new socket
         self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
 
-        # Setting up the terminator. So if the response stream ends with this terminator, found_terminator function is called
-        self.set_terminator('\n')
+        # Setting up the terminator. So if the response stream ends with this terminator, found_terminator function is called.
+        # The client starts with the 1.0 JSON format and switches to binary once the server has agreed to it
+        self.setCodec(pdu_codec.CODECS[self.__version])
 
         # Async_chat stores all incoming request streams in the buffer until the terminator has been received
         self.buffer = []
 
         # Following attributes stores client specific data
-        self.obj = {}
         self.username = ""
         self.chat_name = ""
         self.groupNames = []
 
-        """The following attributes are used as while loop terminators. The client sends a request to the server, but the
-        response does not return to the same location where the request was sent. Whereas, it reaches found_terminator
-        when the response contains the terminator. In the mean while, a while loop is started where the request is sent,
-        thus halting the execution of the code at that location. The while loop terminates only when the following
-        attributes values are changed in the found_terminator function"""
+        # Pages of the group list held by the client by (prefix, cursor), sent again by the server only when a group
+        # has been created since. nextCursor is the cursor of the page after the one displayed, None on the last page
+        self.groupPages = {}
+        self.nextCursor = None
+
+        # Members of the group held by the client, kept up to date by the roster deltas once -roster has fetched them.
+        # roster_revision is None while the client holds no roster of its group, roster_resync is True while the
+        # changes it has missed are being fetched again
+        self.roster = set()
+        self.roster_chat = ""
+        self.roster_revision = None
+        self.roster_resync = False
+        self.roster_ready = threading.Event()
 
-        # authentication_complete is set to true when authentication has been complete and response is received from the server
-        self.authentication_complete = False
+        # Position of the oldest message of the group displayed by -history, None before the first -history
+        self.history_start = None
 
-        # create_group_resp_recv is set to true when the servers 'create group' function returns a response back to the client
-        self.create_group_resp_recv = False
+        # True while the messages of a -history page arrive, the messages of this client are displayed as well
+        self.reading_history = False
 
-        # groupNames_received is set to true when the client receives the group names from the server
-        self.groupNames_received = False
+        """The client sends a request to the server, but the response does not return to the same location where the
+        request was sent. Whereas, it reaches found_terminator in the asyncore thread. Requests that the console waits for
+        are kept in pending by their request_id until found_terminator receives their response"""
 
-        # ban_complete is set to true when the banning function has been called and a response has been received from the server
-        self.ban_complete = False
+        # request_id -> PendingRequest
+        self.pending = {}
+        self.next_request_id = 0
+        self.pending_lock = threading.Lock()
 
-        # ban_allowed is set to true when banning is valid and remains false if banning is invalid
-        self.ban_allowed = False
+        # The console thread pushes requests while the asyncore thread is sending, async_chat is not thread safe
+        self.send_lock = threading.RLock()
 
-        # move_out is set to true when the server removes the client from a group and the client receives a response from the server
-        self.moved_out = False
+        # negotiated is set to true when the server has answered the REDY sent by negotiateVersion
+        self.negotiated = False
+
+        # Token of the login, sent with RSUM to resume the session when the connection drops. resuming is True from
+        # the moment the client connects again until the server has answered the RSUM, logged_out once the user has
+        # logged out
+        self.token = None
+        self.resuming = False
+        self.logged_out = False
 
     """Makes connection to the server based on host and port no"""
     def connect_to_server(self):
         # Makes connection to the server given the host ip and the port no
         self.connect((ChatClient.__host, ChatClient.__port))
 
-    """Creates object of class PDURequest and serializes the object to a string.
-    The string terminates with '\n' so that the servers found_terminator function would be called on invoking push"""
-    def sendPDURequest(self, command, parameters, channel, payload):
-        str_send = PDURequest(self.__version, command, parameters, channel, payload).createRequestStr()
+    """Asks the server for the binary wire format. The REDY is sent in JSON with version 2.0, if the server answers
+    with 100 both sides switch to binary frames. A server that only knows 1.0 answers with 330 and the client stays on JSON.
+    The REDY also offers the compressions of pdu_codec.py, the 100 response names the one the server has picked, if any.
+    Must be called once the asyncore loop is running"""
+    def negotiateVersion(self):
+        pending = self.newPendingRequest()
+        request = PDURequest(self.__binary_version, "REDY", {"username": "", "chat_name": "",
+                                                             "compression": pdu_codec.COMPRESSIONS}, "CC", "",
+                             pending.request_id)
+        self.push(self.codec.encodeRequest(request))
+
+        # Wait for server response. The codec is switched in found_terminator before the next frame is read
+        pending.wait()
+
+    """Switches the wire format used in both directions"""
+    def setCodec(self, codec):
+        self.codec = codec
+        self.body_length = None
+        self.set_terminator(codec.terminator)
+
+    """Creates object of class PDURequest and serializes the object with the wire format in use. With JSON the string
+    terminates with '\n' so that the servers found_terminator function would be called on invoking push"""
+    def sendPDURequest(self, command, parameters, channel, payload, request_id=None):
+        str_send = self.codec.encodeRequest(PDURequest(self.codec.version, command, parameters, channel, payload,
+                                                       request_id))
         self.push(str_send)
 
+    """Sends the queued requests, called by async_chat from both threads"""
+    def initiate_send(self):
+        with self.send_lock:
+            asynchat.async_chat.initiate_send(self)
+
+    """Registers a new request_id in the pending table and returns its PendingRequest"""
+    def newPendingRequest(self):
+        with self.pending_lock:
+            self.next_request_id += 1
+            pending = PendingRequest(self.next_request_id)
+            self.pending[pending.request_id] = pending
+        return pending
+
+    """Sends a request with a request_id without waiting for its response. Calling wait on the returned PendingRequest
+    blocks until the response has arrived, so that several requests can be pipelined"""
+    def sendRequest(self, command, parameters, channel, payload):
+        pending = self.newPendingRequest()
+        self.sendPDURequest(command, parameters, channel, payload, pending.request_id)
+        return pending
+
+    """Sends a request and returns its response once it has arrived"""
+    def call(self, command, parameters, channel, payload):
+        return self.sendRequest(command, parameters, channel, payload).wait()
+
     """Collects all incoming data from the server until the terminator string has been received"""
     def collect_incoming_data(self, data):
         self.buffer.append(data)
@@ -104,58 +195,153 @@ class ChatClient(asynchat.async_chat):
         # Clearing the buffer array to get ready for the next response
         self.buffer = []
 
+        # Binary frames are read in two steps, first the length and then the rest of the frame
+        if isinstance(self.codec.terminator, int):
+            if self.body_length is None:
+                self.body_length = self.codec.bodyLength(resp_str)
+                self.set_terminator(self.body_length)
+                return
+            self.body_length = None
+            self.set_terminator(self.codec.terminator)
+
         # Converts the serialized message received from the server back to a JSON object
-        resp_obj = json.loads(resp_str)
+        resp_obj = self.codec.decode(resp_str)
+
+        # The request that the response answers, if a thread is waiting for it
+        with self.pending_lock:
+            pending = self.pending.pop(resp_obj.get("request_id"), None)
+
+        # Answer to the REDY sent by negotiateVersion
+        if not self.negotiated and resp_obj["response_code"] in ["100", "330"]:
+            if resp_obj["response_code"] == "100" and resp_obj["parameters"].get("version") == self.__binary_version:
+                compressor = pdu_codec.negotiateCompression(resp_obj["parameters"].get("compression"))
+                self.setCodec(compressor or pdu_codec.CODECS[self.__binary_version])
+            self.negotiated = True
+            if pending is not None:
+                pending.complete(resp_obj)
+            return
+
+        self.handleResponse(resp_obj)
+
+        # The waiting thread is woken up once the response has been handled, e.g. once chat_name has been updated
+        if pending is not None:
+            pending.complete(resp_obj)
+
+    """Updates the state of the client and displays a response received from the server"""
+    def handleResponse(self, resp_obj):
 
         """The following block of if-else loops are for handling different response codes separately.
         The response from the server can be a positive or a negative response. Thus the actions to be performed by the
         client after receiving a response depends to the response code"""
 
-        # When has successfully been authenticated into the system
+        # When has successfully been authenticated into the system, the console thread handles the response
         if resp_obj["response_code"] == "110":
-            self.obj["authenticated"] = True
-            self.authentication_complete = True
+            self.token = resp_obj["parameters"].get("token")
+
+        # When the session has been resumed on the new connection, the client is back in the group it was in unless it
+        # was kicked or banned in the meantime. The messages it has missed follow
+        elif resp_obj["response_code"] == "111":
+            self.resuming = False
+            self.token = resp_obj["parameters"]["token"]
+            if self.chat_name != "" and resp_obj["parameters"]["chat_name"] != self.chat_name:
+                print "You have been moved out of the group while the connection was down, enter -join to join a group"
+            self.chat_name = resp_obj["parameters"]["chat_name"]
+            print "Connection resumed"
+
+        # When the server checks that the client is still there after a while without requests
+        elif resp_obj["response_code"] == "102":
+            self.sendPDURequest("PING", {}, "CC", "")
+
+        # When the session could not be resumed
+        elif resp_obj["response_code"] == "210":
+            self.token = None
+            self.handle_close()
 
-        # When the list of groups have been returned from the server
-        elif resp_obj["response_code"] == "130":
-            if self.username == resp_obj["parameters"]["username"]:
-                # The group names are extracted from the payload
-                self.groupNames = resp_obj["payload"]
+        # When a page of the list of groups has been returned from the server, or the page held by the client is
+        # still up to date
+        elif resp_obj["response_code"] in ["130", "131"]:
+            parameters = resp_obj["parameters"]
+            page = (parameters["prefix"], parameters["cursor"])
+            if resp_obj["response_code"] == "131":
+                resp_obj = self.groupPages[page]
+            else:
+                self.groupPages[page] = resp_obj
 
-                self.processResponse(resp_obj)
+            # The group names are extracted from the payload
+            self.groupNames = resp_obj["payload"]
+            self.nextCursor = resp_obj["parameters"]["next"]
 
-                self.obj["group_fetch_success"] = True
-                self.groupNames_received = True
+            self.processResponse(resp_obj)
 
         # When the client receives a message from the server
         elif resp_obj["response_code"] == "140":
             # The message is extracted from the payload
             chat = resp_obj["payload"]
 
-            # Condition for not printing the message on the senders console
-            if self.username == chat[1: len(self.username) + 1]:
+            # Condition for not printing the message on the senders console. The server does not echo the message back
+            # to the sender when echo is False, this only catches servers that ignore the echo parameter
+            if self.username == chat[1: len(self.username) + 1] and not self.reading_history:
                 return
             else:
                 self.processResponse(resp_obj)
                 # comma added to allow next print to be on the same line
                 print("-> "),
 
-        # When group has been created successfully
+        # When group has been created successfully, the console thread handles the response
         elif resp_obj["response_code"] == "170":
-            self.obj["groupCreated"] = True
-            self.create_group_resp_recv = True
+            pass
 
         # When the client successfully joins a group
         elif resp_obj["response_code"] == "180":
             if self.username == resp_obj["parameters"]["username"]:
                 self.chat_name = resp_obj["parameters"]["chat_name"]
+                self.history_start = None
+                self.roster_revision = None
+            self.processResponse(resp_obj)
+
+        # When a page of the roster of the group has been returned. The first page replaces the roster held by the
+        # client and the next page is asked for right away
+        elif resp_obj["response_code"] == "132":
+            parameters = resp_obj["parameters"]
+            if parameters["chat_name"] == self.chat_name:
+                if parameters["cursor"] is None:
+                    self.roster = set()
+                    self.roster_chat = parameters["chat_name"]
+                self.roster.update(resp_obj["payload"])
+                self.roster_revision = parameters["revision"]
+                self.roster_resync = False
+                if parameters["next"] is not None:
+                    self.sendPDURequest("RSTR", {"username": self.username, "chat_name": self.chat_name,
+                                                 "cursor": parameters["next"]}, "CC", "")
+                else:
+                    self.roster_ready.set()
+
+        # When the roster of the group has changed. Changes that do not follow the revision held by the client mean
+        # that it has missed some, the server is asked for them again
+        elif resp_obj["response_code"] == "133":
+            parameters = resp_obj["parameters"]
+            if parameters["chat_name"] == self.roster_chat == self.chat_name and self.roster_revision is not None:
+                if parameters["base"] == self.roster_revision:
+                    for action, member in resp_obj["payload"]:
+                        if action == "join":
+                            self.roster.add(member)
+                        else:
+                            self.roster.discard(member)
+                    self.roster_revision = parameters["revision"]
+                    self.roster_resync = False
+                    self.roster_ready.set()
+                elif not self.roster_resync:
+                    self.roster_resync = True
+                    self.sendPDURequest("RSTR", {"username": self.username, "chat_name": self.chat_name,
+                                                 "revision": self.roster_revision}, "CC", "")
+
+        # When a page of the message log of the group has been sent, the messages have been displayed already
+        elif resp_obj["response_code"] == "150":
             self.processResponse(resp_obj)
 
         # When a client successfully leaves a group
         elif resp_obj["response_code"] == "190":
             self.processResponse(resp_obj)
-            if resp_obj["parameters"]["username"] == self.username:
-                self.moved_out = True
 
         # When banning a user was successful
         elif resp_obj["response_code"] == "191":
@@ -169,24 +355,19 @@ class ChatClient(asynchat.async_chat):
                 self.chat_name = ""
             self.processResponse(resp_obj)
 
-        # When authentication to the system failed
+        # When authentication to the system failed, the console thread handles the response
         elif resp_obj["response_code"] == "200":
-            self.obj["authenticated"] = False
-            self.authentication_complete = True
+            pass
 
-        # When group could not be created successfully
+        # When group could not be created successfully, the console thread handles the response
         elif resp_obj["response_code"] == "230":
-            self.obj["groupCreated"] = False
-            self.create_group_resp_recv = True
+            pass
 
-        # When joining group action failed
+        # When fetching the groups or joining a group failed
         elif resp_obj["response_code"] == "240":
             if self.username == resp_obj["parameters"]["username"]:
                 self.processResponse(resp_obj)
 
-                self.obj["group_fetch_success"] = False
-                self.groupNames_received = True
-
         # When banning user action failed
         elif resp_obj["response_code"] == "250":
             if resp_obj["parameters"]["username"] == self.username:
@@ -213,6 +394,7 @@ class ChatClient(asynchat.async_chat):
         # Setting up PDUData object to be used in response handling
         obj = pdu_data.PDUData()
         obj.payload = resp_obj["payload"]
+        obj.message_parameters = resp_obj["parameters"]
 
         resh_obj = ResponseHandler(obj)
         # Calls the associated function for the received response code
@@ -221,8 +403,35 @@ class ChatClient(asynchat.async_chat):
     """Async chat calls this if the client has thrown an unhandled error or if the client logs out from the system"""
     def handle_close(self):
         self.close()
+
+        # A dropped connection is replaced by a new one resuming the session, once per drop
+        if not self.logged_out and not self.resuming and self.token is not None and self.resume():
+            return
         print "Your connection has been terminated"
 
+        # Nothing will answer the pending requests anymore, the waiting threads get None
+        with self.pending_lock:
+            pending, self.pending = self.pending, {}
+        for request in pending.values():
+            request.complete(None)
+
+    """Connects to the server again and sends RSUM with the token of the session. The new connection stays on the 1.0
+    JSON format, the server answers with 111 or 210 in found_terminator. Returns False if the server cannot be
+    reached"""
+    def resume(self):
+        self.resuming = True
+        self.discard_buffers()
+        self.buffer = []
+        self.setCodec(pdu_codec.CODECS[self.__version])
+        try:
+            self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.connect_to_server()
+        except socket.error:
+            return False
+        print "Connection lost, resuming the session"
+        self.sendPDURequest("RSUM", {"token": self.token}, "CC", "")
+        return True
+
     """This function is responsible for clients authentication, creation or joining groups"""
     def initiateDialog(self):
 
@@ -236,8 +445,6 @@ class ChatClient(asynchat.async_chat):
 
             # For login
             if user_input == "1":
-                self.authentication_complete = False
-
                 # Fetching user input for username and password
                 username = raw_input("username-> ")
                 password = raw_input("password-> ")
@@ -245,14 +452,12 @@ class ChatClient(asynchat.async_chat):
                 # Setting up parameters
                 creds = {"username": username, "password": password, "chat_name": ""}
 
-                # Send request to perform authentication
-                self.sendPDURequest("AUTH", creds, "CC", "")
+                # Send request to perform authentication and wait for the server response
+                response = self.call("AUTH", creds, "CC", "")
+                if response is None:
+                    return
 
-                # Wait for server response. Value of self.authentication_complete set to true in found_terminator
-                while not self.authentication_complete:
-                    pass
-
-                if self.obj["authenticated"]:
+                if response["response_code"] == "110":
                     self.username = username
                     print("Login successful")
                     self.createOrFetchGroups()
@@ -263,8 +468,6 @@ class ChatClient(asynchat.async_chat):
 
             # For creating new account
             elif user_input == "2":
-                self.authentication_complete = False
-
                 # Fetching user input for username and password
                 username = raw_input("choose username-> ")
                 password = raw_input("choose password-> ")
@@ -272,14 +475,12 @@ class ChatClient(asynchat.async_chat):
                 # Setting up parameters
                 creds = {"username": username, "password": password, "chat_name": ""}
 
-                # Send request to create new user account
-                self.sendPDURequest("NWUA", creds, "CC", "")
+                # Send request to create new user account and wait for the server response
+                response = self.call("NWUA", creds, "CC", "")
+                if response is None:
+                    return
 
-                # Wait for server response. Value of self.authentication_complete set to true in found_terminator
-                while not self.authentication_complete:
-                    pass
-
-                if self.obj["authenticated"]:
+                if response["response_code"] == "110":
                     self.username = username
                     print("Account created")
                     self.createOrFetchGroups()
@@ -300,25 +501,15 @@ class ChatClient(asynchat.async_chat):
 
             # Join existing group
             if user_input == "1":
-                para = {"username": self.username, "chat_name": ""}
-
-                # Send request to fetch existing groups
-                self.sendPDURequest("LIST", para, "CC", "")
-
-                # Wait for server response. Value of self.groupNames_received set to true in found_terminator
-                while not self.groupNames_received:
-                    pass
+                joined = self.browseGroups()
+                if joined is None:
+                    return
 
-                if self.obj["group_fetch_success"]:
-                    self.joinGroup(self.username)
-
-                    # Resetting values
-                    self.obj["group_fetch_success"] = False
-                    self.groupNames_received = False
-                    self.groupNames = []
+                # Resetting values
+                self.groupNames = []
+                if joined:
                     break
-                else:
-                    continue
+                continue
 
             # Create new group
             elif user_input == "2":
@@ -331,14 +522,12 @@ class ChatClient(asynchat.async_chat):
 
                 para = {"username": self.username, "chat_name": groupName}
 
-                # Send request to create a new group
-                self.sendPDURequest("CHAT", para, "CC", "")
+                # Send request to create a new group and wait for the server response
+                response = self.call("CHAT", para, "CC", "")
+                if response is None:
+                    return
 
-                # Wait for server response. Value of self.create_group_resp_recv set to true in found_terminator
-                while not self.create_group_resp_recv:
-                    pass
-
-                if self.obj["groupCreated"]:
+                if response["response_code"] == "170":
                     self.chat_name = groupName
                     print("Group Created. You are the admin of this group. You have joined the group")
                     break
@@ -350,38 +539,69 @@ class ChatClient(asynchat.async_chat):
                 print "Invalid input"
                 continue
 
-    """Function responsible for joining a selected group"""
-    def joinGroup(self, username):
-        while True:
-            user_input = raw_input("-> ")
-            chatFound = False
+    """Fetches the page of the groups whose names start with prefix after cursor. The page held by the client is only
+    sent again by the server when a group has been created since. The groups are displayed by found_terminator"""
+    def fetchGroups(self, prefix, cursor):
+        para = {"username": self.username, "chat_name": "", "prefix": prefix, "cursor": cursor,
+                "count": ChatClient.__list_page}
+        page = self.groupPages.get((prefix, cursor))
+        if page is not None:
+            para["revision"] = page["parameters"]["revision"]
+        return self.call("LIST", para, "CC", "")
+
+    """Lets the user page through the groups, search them by the start of their names and join one of them. Returns
+    True if the client has joined a group, False if the user went back and None if the connection has been closed"""
+    def browseGroups(self):
+        prefix = ""
+        cursors = [None]    # cursor of every page up to the one displayed
 
-            # Displaying the group names as a list
-            for i in range(0, len(self.groupNames)):
+        while True:
+            # Send request to fetch a page of the groups and wait for the server response
+            response = self.fetchGroups(prefix, cursors[-1])
+            if response is None:
+                return None
+            if response["response_code"] not in ["130", "131"]:
+                return False
+
+            print "Number -> join, /text -> search, n -> next page, p -> previous page, b -> back"
+            user_input = raw_input("-> ").strip()
+
+            if user_input == "b":
+                return False
+            elif user_input == "n":
+                if self.nextCursor is None:
+                    print "This is the last page"
+                else:
+                    cursors.append(self.nextCursor)
+            elif user_input == "p":
+                if len(cursors) > 1:
+                    cursors.pop()
+            elif user_input.startswith("/"):
+                prefix = user_input[1:]
+                cursors = [None]
+            else:
                 try:
                     number = int(user_input)
                 except ValueError:
                     print "Please enter a valid input"
-                    break
-                else:
-                    if number == i + 1:
-                        # Setting up parameters
-                        para = {"username": username, "chat_name": self.groupNames[int(user_input) - 1]}
-
-                        # Send request to join a group
-                        self.sendPDURequest("JOIN", para, "CC", "")
-                        chatFound = True
-                    elif i == len(self.groupNames)-1 and not chatFound:
-                        print "Please enter a valid input"
-                        continue
+                    continue
+                if not 1 <= number <= len(self.groupNames):
+                    print "Please enter a valid input"
+                    continue
+                return self.joinGroup(self.groupNames[number - 1])
 
-            # Resetting for next fetch
-            self.groupNames = []
+    """Function responsible for joining a selected group"""
+    def joinGroup(self, chat_name):
+        # Setting up parameters
+        para = {"username": self.username, "chat_name": chat_name}
 
-            if not chatFound:
-                continue
-            else:
-                break
+        # Resetting for next fetch
+        self.groupNames = []
+
+        # Send request to join a group and wait for server response, chat_name has been set by found_terminator when
+        # joining succeeded
+        response = self.call("JOIN", para, "CC", "")
+        return response is not None and response["response_code"] == "180"
 
     """Display list of commands that can be fired by the client. Function is called when client types in -help"""
     def displayOptions(self):
@@ -400,6 +620,10 @@ class ChatClient(asynchat.async_chat):
 
             print "Kick User    : -kick username"
             print "Ban User     : -ban username"
+            print "Older chats  : -history"
+            print "Members      : -roster"
+            print "Server stats : -stats"
+            print "Profiler     : -profile start|stop"
 
     """Function is responsible for displaying the chat console"""
     def chatConsole(self):
@@ -408,6 +632,7 @@ class ChatClient(asynchat.async_chat):
 
             # When client wants to logout from the system
             if msg == "-logout":
+                self.logged_out = True
                 self.handle_close()
                 break
 
@@ -417,19 +642,72 @@ class ChatClient(asynchat.async_chat):
 
             # When # client wants to leave the group
             elif msg == "-moveout":
-                # Send leave group request
-                self.sendPDURequest("LEVE", {"username": self.username, "chat_name": self.chat_name}, "CC", "")
-
-                while not self.moved_out:
-                    pass
+                # Send leave group request and wait for the server response
+                response = self.call("LEVE", {"username": self.username, "chat_name": self.chat_name}, "CC", "")
+                if response is None:
+                    break
 
                 # Resetting values
-                self.moved_out = False
                 self.groupNames = []
 
                 print ""
                 self.createOrFetchGroups()
 
+            # When client wants to see the messages sent before the ones displayed
+            elif msg == "-history":
+                if self.chat_name == "":
+                    print "You are not part of a group right now. Join a group first"
+                    continue
+                if self.history_start == 0:
+                    print "No older messages"
+                    continue
+
+                para = {"username": self.username, "chat_name": self.chat_name, "count": ChatClient.__history_page}
+                if self.history_start is not None:
+                    para["start"] = max(0, self.history_start - ChatClient.__history_page)
+                    para["count"] = self.history_start - para["start"]
+
+                # The messages are displayed by found_terminator as they arrive, the 150 response ends the page
+                self.reading_history = True
+                response = self.call("HIST", para, "CC", "")
+                self.reading_history = False
+                if response is None:
+                    break
+                if response["response_code"] == "150":
+                    self.history_start = response["parameters"]["start"]
+
+            # When the client wants to see the members of its group. The roster is only fetched once, the deltas keep it
+            # up to date from then on
+            elif msg == "-roster":
+                if self.chat_name == "":
+                    print "You are not part of a group right now. Join a group first"
+                    continue
+
+                if self.roster_chat != self.chat_name or self.roster_revision is None:
+                    self.roster_ready.clear()
+                    response = self.call("RSTR", {"username": self.username, "chat_name": self.chat_name}, "CC", "")
+                    if response is None:
+                        break
+                    if response["response_code"] != "132":
+                        continue
+                    self.roster_ready.wait(10)
+
+                members = sorted(self.roster)
+                print "****", len(members), "members:", ", ".join(members), "****"
+
+            # When an admin of the server wants to see its metrics, they are displayed by found_terminator
+            elif msg == "-stats":
+                response = self.call("STAT", {"username": self.username}, "CC", "")
+                if response is None:
+                    break
+
+            # When an admin of the server switches the profiler on or off, the summary is displayed by found_terminator
+            elif msg.startswith("-profile"):
+                action = msg[len("-profile"):].strip()
+                response = self.call("PROF", {"username": self.username, "action": action}, "CC", "")
+                if response is None:
+                    break
+
             # When client wants to join a new group
             elif msg == "-join":
                 if self.chat_name != "":
@@ -486,8 +764,9 @@ class ChatClient(asynchat.async_chat):
 
                 msg = "(" + self.username + ") " + msg
 
-                # Send message request
-                self.sendPDURequest("MSSG", {"username": self.username, "chat_name": self.chat_name}, "DC", msg)
+                # Send message request. echo is False as the client does not want its own message back
+                self.sendPDURequest("MSSG", {"username": self.username, "chat_name": self.chat_name, "echo": False},
+                                    "DC", msg)
 
 # Creating a new client
 client = ChatClient()
@@ -500,5 +779,8 @@ comm = threading.Thread(target=asyncore.loop)
 comm.daemon = True
 comm.start()
 
+# Use the binary wire format if the server supports it
+client.negotiateVersion()
+
 client.initiateDialog()
 client.chatConsole()
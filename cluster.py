@@ -0,0 +1,378 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: cluster.py
+
+File summary:
+    The purpose of this file is to run the server as several worker processes (server.py --workers N) so that it can
+    use more than one core. Every worker runs the asyncio engine with its own ChatService, and all of them accept
+    connections on the same port (SO_REUSEPORT, or a listening socket shared by fork when SO_REUSEPORT is missing).
+
+    Since the members of a group can be connected to different workers, the workers talk to each other over Unix
+    sockets. Each group has an owning worker, picked with consistent hashing on the group name (HashRing). The owner
+    keeps track of which workers have clients in the group: a worker subscribes to a group when it gets its first local
+    client in it and unsubscribes when the last one is gone. Responses for a group (MSSG, JOIN, LEVE, KICK, BANN) are
+    delivered to the local members first and then sent to the owner once, which delivers them to its own members and
+    forwards them to every other subscribed worker. A message therefore reaches every member of the group whichever
+    worker accepted their connection, and a worker only receives the traffic of groups it has clients in.
+
+    Since the owner sees every message of the group, it also holds its history (see history.py). A worker that gets a
+    JOIN for a group it does not own asks the owner for the history, and holds back the messages of the group relayed
+    to the new member until the answer arrives, since they are part of it.
+
+    Changes to the user accounts and groups are sent to every worker so that all StateStores stay the same. The parent
+    loads the StateStore, migrates its passwords and compacts its journal before forking, so every worker starts from
+    the same copy and none of them reads the files while another one rewrites them. Worker 0 is the only one writing
+    the journal. Usernames and group names are checked against the local StateStore, so two
+    workers creating the same name within the time it takes to relay the change both succeed and the first record
+    applied wins.
+
+    A forked process only runs the thread that called fork. The other threads of the parent are gone in the workers,
+    and a lock one of them was holding stays locked. The parts of the ChatService that run threads or processes of
+    their own, the syncer of the Journal (see journal.py), the writer and reader of the MessageLog (see message_log.py)
+    and the pool of the CredentialPool (see credentials.py), therefore start them lazily on their first use, which only
+    happens in the workers once they have been forked. The parent closes its StateStore before forking to stop its
+    syncer.
+
+    Messages between workers are JSON objects prefixed by their uint32 length. Requires Python 3 and fork (Linux).
+"""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import os
+import shutil
+import signal
+import socket
+import struct
+import tempfile
+import aio_server
+import pdu_codec
+from chat_service import ChatService, loadStore
+from metrics import endpointAddress
+from profiler import toggleOnSignal
+from pdu_response import PDUResponse
+
+
+"""HashRing assigns every group to a worker with consistent hashing"""
+class HashRing:
+
+    """Constructor of HashRing
+    workers -> number of workers
+    replicas -> points on the ring per worker, more points spread the groups more evenly"""
+    def __init__(self, workers, replicas=100):
+        self.points = []
+        for worker in range(workers):
+            for replica in range(replicas):
+                self.points.append((self.hash("%d-%d" % (worker, replica)), worker))
+        self.points.sort()
+        self.keys = [point for point, worker in self.points]
+
+    """Returns the position of key on the ring"""
+    def hash(self, key):
+        return struct.unpack(">Q", hashlib.md5(key.encode('utf-8')).digest()[:8])[0]
+
+    """Returns the worker that owns chat_name"""
+    def owner(self, chat_name):
+        index = bisect.bisect(self.keys, self.hash(chat_name)) % len(self.points)
+        return self.points[index][1]
+
+
+"""Peer is the Unix socket connection to another worker"""
+class Peer(asyncio.Protocol):
+
+    LENGTH = struct.Struct(">I")
+
+    """Constructor of Peer"""
+    def __init__(self, cluster):
+        self.cluster = cluster
+        self.transport = None
+        self.buffer = bytearray()
+
+    """Called by asyncio when the connection to the other worker is up"""
+    def connection_made(self, transport):
+        self.transport = transport
+
+    """Called by asyncio with the bytes received from the other worker"""
+    def data_received(self, data):
+        buffer = self.buffer
+        buffer.extend(data)
+        start = 0
+        while len(buffer) - start >= 4:
+            end = start + 4 + Peer.LENGTH.unpack_from(buffer, start)[0]
+            if len(buffer) < end:
+                break
+            self.cluster.receive(json.loads(bytes(buffer[start + 4:end]).decode('utf-8')))
+            start = end
+        del buffer[:start]
+
+    """Sends an encoded message to the other worker"""
+    def send(self, frame):
+        self.transport.write(frame)
+
+
+"""Cluster relays group responses and state changes between the workers"""
+class Cluster:
+
+    """Constructor of Cluster
+    service -> ChatService of this worker
+    index -> number of this worker, from 0 to workers - 1
+    workers -> number of workers
+    run_dir -> directory holding the Unix sockets of the workers
+    parent_fd -> read end of a pipe held open by the parent process, the worker stops when the parent is gone"""
+    def __init__(self, service, index, workers, run_dir, parent_fd=None):
+        self.service = service
+        self.index = index
+        self.workers = workers
+        self.run_dir = run_dir
+        self.parent_fd = parent_fd
+        self.ring = HashRing(workers)
+
+        self.peers = {}         # worker -> Peer connected to it
+        self.pending = {}       # worker -> frames waiting for the connection to the worker
+        self.subscribers = {}   # chat_name -> set of workers with clients in the group, for the groups this worker owns
+        self.replays = {}       # number -> handler waiting for the history of a group from its owner
+        self.replay_number = 0
+
+        service.cluster = self
+        service.client_map.listener = self
+        service.store.replicate = self.replicate
+
+    """Returns the path of the Unix socket of worker"""
+    def socketPath(self, worker):
+        return os.path.join(self.run_dir, "worker-%d.sock" % worker)
+
+    """Starts listening for the other workers and connects to them"""
+    async def start(self, loop):
+        if self.parent_fd is not None:
+            loop.add_reader(self.parent_fd, loop.stop)
+
+        # SIGTERM forwarded by the parent, or SIGINT from the terminal, stop the loop so that the worker closes its
+        # ChatService like a single process server does: the queued messages are logged and the journal is synced
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, loop.stop)
+        await loop.create_unix_server(lambda: Peer(self), self.socketPath(self.index))
+        for worker in range(self.workers):
+            if worker != self.index:
+                loop.create_task(self.connect(loop, worker))
+
+    """Connects to worker, retrying until the worker is listening"""
+    async def connect(self, loop, worker):
+        while True:
+            try:
+                transport, peer = await loop.create_unix_connection(lambda: Peer(self), self.socketPath(worker))
+                break
+            except (OSError, ConnectionError):
+                await asyncio.sleep(0.05)
+        self.peers[worker] = peer
+        for frame in self.pending.pop(worker, []):
+            peer.send(frame)
+
+    """Returns message encoded for a Peer connection"""
+    def encode(self, message):
+        data = json.dumps(message, separators=(',', ':')).encode('utf-8')
+        return Peer.LENGTH.pack(len(data)) + data
+
+    """Sends an encoded frame to worker, holding it back until the connection is up"""
+    def send(self, worker, frame):
+        peer = self.peers.get(worker)
+        if peer is not None:
+            peer.send(frame)
+        else:
+            self.pending.setdefault(worker, []).append(frame)
+
+    """Called by the RoutingIndex when the first local client enters or lingers in chat_name"""
+    def roomOpened(self, chat_name):
+        self.subscribe("sub", chat_name)
+
+    """Called by the RoutingIndex when the last local client of chat_name is gone"""
+    def roomClosed(self, chat_name):
+        self.subscribe("unsub", chat_name)
+
+    """Tells the owner of chat_name whether this worker has clients in the group"""
+    def subscribe(self, op, chat_name):
+        owner = self.ring.owner(chat_name)
+        if owner == self.index:
+            self.updateSubscribers(op, chat_name, self.index)
+        else:
+            self.send(owner, self.encode({"op": op, "chat_name": chat_name, "worker": self.index}))
+
+    """Adds or removes worker from the subscribers of chat_name"""
+    def updateSubscribers(self, op, chat_name, worker):
+        if op == "sub":
+            self.subscribers.setdefault(chat_name, set()).add(worker)
+        else:
+            workers = self.subscribers.get(chat_name)
+            if workers is not None:
+                workers.discard(worker)
+                if not workers:
+                    del self.subscribers[chat_name]
+
+    """Returns True if this worker writes the message log of chat_name, only the owner of the group does"""
+    def logs(self, chat_name):
+        return self.ring.owner(chat_name) == self.index
+
+    """Sends a group response that has been delivered to the local members to the owner of the group. The owner
+    forwards it to the other workers with members in the group"""
+    def publish(self, chat_name, command, response, moved_out):
+        frame = self.encode({
+            "op": "room",
+            "origin": self.index,
+            "chat_name": chat_name,
+            "command": command,
+            "response": [response.response_code, response.parameters, response.channel, response.payload],
+            "moved_out": moved_out
+        })
+        owner = self.ring.owner(chat_name)
+        if owner == self.index:
+            self.forward(chat_name, frame, self.index)
+        else:
+            self.send(owner, frame)
+
+    """Sends frame to every worker subscribed to chat_name, except origin and this worker"""
+    def forward(self, chat_name, frame, origin):
+        for worker in self.subscribers.get(chat_name, ()):
+            if worker != origin and worker != self.index:
+                self.send(worker, frame)
+
+    """Sends a state change made by this worker to every other worker"""
+    def replicate(self, record):
+        frame = self.encode({"op": "state", "record": record})
+        for worker in range(self.workers):
+            if worker != self.index:
+                self.send(worker, frame)
+
+    """Asks the owner of chat_name for the history of the group on behalf of handler, which has just joined it. Returns
+    False when this worker owns the group, its own history holds every message of the group then"""
+    def requestHistory(self, chat_name, handler):
+        owner = self.ring.owner(chat_name)
+        if owner == self.index:
+            return False
+        self.replay_number += 1
+        self.replays[self.replay_number] = handler
+        self.send(owner, self.encode({"op": "history", "chat_name": chat_name, "worker": self.index,
+                                      "number": self.replay_number}))
+        return True
+
+    ## STATEFUL - messages from the other workers ##
+    """Processes a message received from another worker"""
+    def receive(self, message):
+        op = message["op"]
+
+        if op == "room":
+            chat_name = message["chat_name"]
+            code, parameters, channel, payload = message["response"]
+            self.service.deliverRelayed(chat_name, message["command"], PDUResponse(code, parameters, channel, payload),
+                                        message["moved_out"])
+
+            # The owner passes the response on to the other workers with members in the group
+            if self.ring.owner(chat_name) == self.index:
+                self.forward(chat_name, self.encode(message), message["origin"])
+
+        elif op == "sub" or op == "unsub":
+            self.updateSubscribers(op, message["chat_name"], message["worker"])
+
+        # The owner answers with the 1.0 JSON frames of the history of the group. The answer is sent after every
+        # message of the group the owner has already forwarded to the asking worker, and before the following ones
+        elif op == "history":
+            frames = self.service.history.frames(message["chat_name"], pdu_codec.CODECS[1.0])
+            self.send(message["worker"], self.encode({"op": "replay", "chat_name": message["chat_name"],
+                                                      "number": message["number"],
+                                                      "frames": [frame.decode('utf-8') for frame in frames]}))
+
+        elif op == "replay":
+            handler = self.replays.pop(message["number"], None)
+            if handler is not None:
+                self.service.historyRelayed(message["chat_name"], handler,
+                                            [frame.encode('utf-8') for frame in message["frames"]])
+
+        elif op == "state":
+            self.service.store.apply(message["record"])
+            self.service.store.persist(message["record"])
+
+
+"""Returns a listening socket shared by all the workers, or None when every worker can bind its own with SO_REUSEPORT"""
+def shared_socket(host, port):
+    if hasattr(socket, "SO_REUSEPORT"):
+        return None
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.setblocking(False)
+    return sock
+
+
+"""Body of a worker process. store is the StateStore loaded by the parent, service_options are passed to the
+ChatService of the worker, metrics is the --metrics option of the server"""
+def run_worker(index, workers, run_dir, host, port, loop_module, sock, parent_fd, store, service_options, metrics=None):
+    # Only worker 0 writes the journal, the others get the changes through the Cluster
+    service = ChatService(writable=(index == 0), store=store, **service_options)
+    cluster = Cluster(service, index, workers, run_dir, parent_fd)
+
+    # SIGUSR1, sent to the worker or forwarded by the parent, switches the profiler of the worker on and off
+    toggleOnSignal(service.profiler)
+    try:
+        aio_server.run(service, host, port, loop_module, sock=sock, reuse_port=(sock is None), startup=cluster.start,
+                       metrics_address=endpointAddress(metrics, index))
+    finally:
+        service.close()
+
+
+"""Forks workers worker processes and waits for them. Stopping the parent stops all the workers. service_options are
+passed to the ChatService of every worker (outbound_limits, auth_workers, ...). Every worker serves its own metrics,
+see metrics.endpointAddress. SIGUSR1 sent to the parent switches the profiler of every worker on and off"""
+def run(workers, host, port, loop_module=None, metrics=None, **service_options):
+    # The store is loaded, migrated and compacted before the fork. Its journal is closed, the thread syncing it would
+    # not be running in the workers
+    store = loadStore()
+    store.close()
+
+    run_dir = tempfile.mkdtemp(prefix="csp-workers-")
+    sock = shared_socket(host, port)
+
+    # The workers watch the read end of this pipe, it becomes readable (EOF) once the parent has exited, even when the
+    # parent was killed without being able to stop them
+    parent_fd, alive_fd = os.pipe()
+
+    children = []
+    for index in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            # Until the loop of the worker handles them (see Cluster.start)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            os.close(alive_fd)
+            try:
+                run_worker(index, workers, run_dir, host, port, loop_module, sock, parent_fd, store, service_options,
+                           metrics)
+            finally:
+                os._exit(0)
+        children.append(pid)
+    os.close(parent_fd)
+
+    def forward(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signum)
+            except OSError:
+                pass
+
+    def stop(signum, frame):
+        forward(signal.SIGTERM, frame)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGUSR1, forward)
+    try:
+        for pid in children:
+            while True:
+                try:
+                    os.waitpid(pid, 0)
+                    break
+                except InterruptedError:
+                    continue
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
@@ -0,0 +1,208 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: commands.py
+
+File summary:
+    The purpose of this file is to dispatch the requests to the function that handles them. Every command is declared
+    once in the CommandRegistry with the parameters it needs, the state the session of the client must be in and the
+    function handling it. Dispatching a request is a single dict lookup: the parameters are copied out of the request
+    by the Command, the state of the session is checked and the function is called with arguments that are known to be
+    there. A request missing a parameter, holding a parameter of the wrong type (see TYPES) or a name longer than
+    MAX_NAME characters, sent before the client is authenticated or for a group the client is not in is answered with
+    a 300 response instead of reaching the function, so the functions can rely on e.g. the username being a string.
+
+    The registry counts the calls of every command and the time spent processing them, including the delivery of the
+    responses, so that it shows which commands the server spends its time on. The processing times are also kept in a
+    histogram per command, which the Metrics of the server export (see metrics.py).
+"""
+
+import time
+from pdu_response import PDUResponse
+from metrics import Histogram, LATENCY_BUCKETS
+
+# Clock used for the per command timings
+timer = getattr(time, "perf_counter", time.time)
+
+# States the session of a client can be required to be in
+ANY = 0                 # any connection, e.g. before logging in
+AUTHENTICATED = 1       # the connection is logged in as the username parameter
+IN_GROUP = 2            # the connection is logged in as the username parameter and is in the chat_name group
+
+# Types of the parameter values, the decoded requests hold str or unicode depending on the codec and Python version
+TEXT = (bytes, type(u""))
+NUMBER = (int, float, type(2 ** 64))    # long on Python 2, bool is an int as well but is not a number (see isType)
+NONE = (type(None),)
+
+# Parameter or field name -> types its value may have. Names that are not listed take any value
+TYPES = {
+    "username": TEXT,
+    "password": TEXT,
+    "chat_name": TEXT,
+    "kicked_user": TEXT,
+    "banned_user": TEXT,
+    "token": TEXT,
+    "action": TEXT,
+    "prefix": TEXT,
+    "payload": TEXT,
+    "compression": TEXT + (list,) + NONE,
+    "cursor": TEXT + NONE,
+    "count": NUMBER,
+    "start": NUMBER + NONE,
+    "revision": NUMBER + NONE,
+    "rate": NUMBER + NONE,
+    "echo": (bool,),
+}
+
+# Longest text, in characters, of the parameters and request ids that are sent back to the clients. The binary wire
+# format holds at most 65535 bytes per parameter (see pdu_codec.py)
+MAX_NAME = 255
+NAMES = ["username", "chat_name", "kicked_user", "banned_user", "token", "action", "prefix", "cursor"]
+
+
+"""Returns True if value is of one of types. true and false are only accepted where bool is one of the types, not
+where a number is expected"""
+def isType(value, types):
+    return isinstance(value, types) and (not isinstance(value, bool) or bool in types)
+
+
+"""Returns the request_id of req_obj, or None if it has none or one that cannot be sent back"""
+def requestId(req_obj):
+    request_id = req_obj.get("request_id")
+    if isType(request_id, NUMBER) or isinstance(request_id, TEXT) and len(request_id) <= MAX_NAME:
+        return request_id
+    return None
+
+
+"""Command holds the declaration of a single command"""
+class Command:
+
+    """Constructor of Command
+    name -> 4 char command text
+    parameters -> names of the parameters the request must have
+    state -> ANY, AUTHENTICATED or IN_GROUP
+    action -> function called with the extracted arguments and the handler, returns a PDUResponse or None when the
+              function has delivered the response itself
+    optional -> parameter name -> value used when the request does not have the parameter
+    fields -> names of the fields of the request itself that the function needs (version, payload)
+    data -> True for the chat messages, which are rate limited apart from the other commands (see inbound.py)"""
+    def __init__(self, name, parameters, state, action, optional=None, fields=(), data=False):
+        self.name = name
+        self.parameters = tuple(parameters)
+        self.state = state
+        self.action = action
+        self.optional = tuple((optional or {}).items())
+        self.fields = tuple(fields)
+        self.data = data
+
+        # (name, types) of the arguments whose type is checked
+        names = self.parameters + tuple(name for name, default in self.optional) + self.fields
+        self.types = tuple((name, TYPES[name]) for name in names if name in TYPES)
+        self.names = tuple(name for name in names if name in NAMES)
+
+        self.calls = 0          # number of requests processed
+        self.rejected = 0       # number of requests answered with 300
+        self.seconds = 0.0      # time spent processing the requests
+        self.latency = Histogram(LATENCY_BUCKETS)   # processing time of every request
+
+    """Returns the arguments of the function taken from req_obj, or the reason the request is invalid: a missing
+    parameter or a parameter of the wrong type. The request_id of the request is passed along when it has one"""
+    def extract(self, req_obj):
+        parameters = req_obj.get("parameters") or {}
+        if not isinstance(parameters, dict):
+            return None, "Invalid parameters"
+        obj = {}
+        for name in self.parameters:
+            if name not in parameters:
+                return None, "Missing parameter " + name
+            obj[name] = parameters[name]
+        for name, default in self.optional:
+            obj[name] = parameters.get(name, default)
+        for name in self.fields:
+            if name not in req_obj:
+                return None, "Missing parameter " + name
+            obj[name] = req_obj[name]
+        for name, types in self.types:
+            if not isType(obj[name], types):
+                return None, "Invalid parameter " + name
+        for name in self.names:
+            if obj[name] is not None and len(obj[name]) > MAX_NAME:
+                return None, "Invalid parameter " + name
+        if req_obj.get("request_id") is not None:
+            obj["request_id"] = requestId(req_obj)
+            if obj["request_id"] is None:
+                return None, "Invalid request_id"
+        return obj, None
+
+
+"""CommandRegistry maps the command text of a request to its Command"""
+class CommandRegistry:
+
+    """Constructor of CommandRegistry
+    client_map -> RoutingIndex holding the session of every connection
+    respond -> function called with the command, the arguments, the response and the handler to deliver a response"""
+    def __init__(self, client_map, respond):
+        self.client_map = client_map
+        self.respond = respond
+        self.commands = {}
+
+    """Declares a command, see Command for the arguments"""
+    def register(self, name, parameters, state, action, optional=None, fields=(), data=False):
+        self.commands[name] = Command(name, parameters, state, action, optional, fields, data)
+
+    ## STATEFUL - a request is only processed if the session of the client is in the state its command requires ##
+    """Processes req_obj, received on the connection of handler, as the request for command name"""
+    def dispatch(self, name, req_obj, handler):
+        command = self.commands.get(name) if isinstance(name, TEXT) else None
+        if command is None:
+            self.reject(handler, "Unknown command " + repr(name), requestId(req_obj))
+            return
+
+        started = timer()
+        obj, invalid = command.extract(req_obj)
+        if invalid is not None:
+            command.rejected += 1
+            self.reject(handler, invalid, requestId(req_obj))
+        elif not self.inState(command.state, obj, handler):
+            command.rejected += 1
+            self.reject(handler, "Not allowed in the current state", obj.get("request_id"))
+        else:
+            response = command.action(obj, handler)
+            if response is not None:
+                self.respond(name, obj, response, handler)
+        elapsed = timer() - started
+        command.calls += 1
+        command.seconds += elapsed
+        command.latency.observe(elapsed)
+
+    """Returns True if the session of handler is in state for a request with the arguments obj"""
+    def inState(self, state, obj, handler):
+        if state == ANY:
+            return True
+        session = self.client_map.getSession(handler)
+        if session is None or session.username == "" or session.username != obj.get("username"):
+            return False
+        return state == AUTHENTICATED or session.chat_name == obj.get("chat_name")
+
+    """Sends the invalid request response to the client that sent the request"""
+    def reject(self, handler, reason, request_id=None):
+        handler.push(handler.codec.encodeResponse(PDUResponse("300", {}, "CC", reason, request_id)))
+
+    """Returns the calls, rejected requests and total and average processing time of every command that has been
+    called, the busiest command first"""
+    def stats(self):
+        rows = []
+        for command in self.commands.values():
+            if command.calls:
+                rows.append((command.name, command.calls, command.rejected, command.seconds,
+                             command.seconds / command.calls))
+        rows.sort(key=lambda row: row[3], reverse=True)
+        return rows
+
+    """Returns the stats as a printable table"""
+    def summary(self):
+        lines = ["%-8s %10s %10s %12s %12s" % ("command", "calls", "rejected", "total ms", "avg us")]
+        for name, calls, rejected, seconds, average in self.stats():
+            lines.append("%-8s %10d %10d %12.2f %12.2f" % (name, calls, rejected, seconds * 1000, average * 1000000))
+        return "\n".join(lines)
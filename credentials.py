@@ -0,0 +1,157 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: credentials.py
+
+File summary:
+    The purpose of this file is to store the passwords of the user accounts as salted slow hashes instead of plaintext,
+    and to keep the cost of hashing off the thread that drives the sockets. A stored password has the form
+
+        pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>
+
+    PBKDF2 is used since it is part of hashlib on every Python version the server runs on. Checking a password takes
+    tens of milliseconds by design, so a burst of logins processed on the event loop would stall the chat messages of
+    every group. The CredentialPool hashes and checks the passwords in worker threads, or in worker processes when
+    hashlib computes PBKDF2 in Python and would hold the GIL, and hands every result back to the event loop through
+    the post function of the engine. The AUTH / NWUA response is only sent once the result is back. A worker that
+    fails hands the error back the same way, the client is then answered with 200 instead of being left waiting.
+
+    Accounts created before the passwords were hashed still hold the plaintext password. verifyPassword accepts them,
+    the StateStore hashes them once when it is loaded and a successful login hashes them again if needed (see
+    needsRehash).
+"""
+
+import binascii
+import hashlib
+import hmac
+import multiprocessing
+import multiprocessing.pool
+import os
+
+ALGORITHM = "pbkdf2_sha256"
+ITERATIONS = 100000     # PBKDF2 rounds of new hashes, stored with each hash so that it can be raised later
+SALT_BYTES = 16
+
+# True when hashlib computes PBKDF2 in C, which releases the GIL while hashing
+NATIVE_HASH = getattr(hashlib.pbkdf2_hmac, "__module__", "") == "_hashlib"
+
+
+"""Returns text as UTF-8 bytes, the decoded requests hold str or unicode depending on the codec and Python version"""
+def toBytes(text):
+    if isinstance(text, bytes):
+        return text
+    return text.encode("utf-8")
+
+
+"""Returns the stored form of password hashed with a new random salt"""
+def hashPassword(password, iterations=ITERATIONS):
+    salt = binascii.hexlify(os.urandom(SALT_BYTES)).decode("ascii")
+    digest = hashlib.pbkdf2_hmac("sha256", toBytes(password), toBytes(salt), iterations)
+    return "%s$%d$%s$%s" % (ALGORITHM, iterations, salt, binascii.hexlify(digest).decode("ascii"))
+
+
+"""Returns True if stored is a hash made by hashPassword and not a plaintext password"""
+def isHashed(stored):
+    return stored.startswith(ALGORITHM + "$") and stored.count("$") == 3
+
+
+"""Returns True if password matches stored, a hash or the plaintext password of an account that has not been migrated"""
+def verifyPassword(password, stored):
+    if not isHashed(stored):
+        return hmac.compare_digest(toBytes(password), toBytes(stored))
+
+    algorithm, iterations, salt, expected = stored.split("$")
+    try:
+        iterations = int(iterations)
+    except ValueError:
+        return False
+    digest = hashlib.pbkdf2_hmac("sha256", toBytes(password), toBytes(salt), iterations)
+    return hmac.compare_digest(binascii.hexlify(digest), toBytes(expected))
+
+
+"""Returns True if stored should be replaced by a new hash, it is plaintext or made with fewer rounds than ITERATIONS"""
+def needsRehash(stored):
+    return not isHashed(stored) or int(stored.split("$")[1]) < ITERATIONS
+
+
+"""Checks password against stored and returns the result along with a new hash when stored needs one, or None"""
+def verifyAndRehash(password, stored):
+    if not verifyPassword(password, stored):
+        return False, None
+    if needsRehash(stored):
+        return True, hashPassword(password)
+    return True, None
+
+
+"""Returns (True, result) of function called with args, or (False, error) if it raises. Runs in the workers, whose
+errors would otherwise be lost: apply_async has no error callback on Python 2"""
+def guarded(function, args):
+    try:
+        return True, function(*args)
+    except Exception as error:
+        return False, repr(error)
+
+
+"""CredentialPool runs the password hashing of the server in worker threads or processes"""
+class CredentialPool:
+
+    """Constructor of CredentialPool
+    workers -> number of workers, 0 hashes on the calling thread
+    processes -> True to use processes, by default only when hashlib would hold the GIL while hashing"""
+    def __init__(self, workers=4, processes=None):
+        self.workers = workers
+        self.processes = (not NATIVE_HASH) if processes is None else processes
+        self.pool = None
+
+        # Function called from a worker with a function and its arguments, it has to run the function on the event loop
+        # thread. Set by the engine, results are handed over on the calling thread while it is None
+        self.post = None
+
+        # Hash that the password of a login for an unknown username is checked against, so that the response takes as
+        # long as for a known username
+        self.dummy = None
+
+    """Calls function with args in a worker and then callback with the result on the event loop thread, or failed with
+    the error if function raises"""
+    def submit(self, function, args, callback, failed):
+        def done(outcome):
+            succeeded, result = outcome
+            if succeeded:
+                callback(result)
+            else:
+                print("Password worker failed: " + result)
+                failed(result)
+
+        if self.workers <= 0 or self.post is None:
+            done(guarded(function, args))
+            return
+
+        # Started on first use, not in the constructor (see cluster.py on threads and fork)
+        if self.pool is None:
+            if self.processes:
+                self.pool = multiprocessing.Pool(self.workers)
+            else:
+                self.pool = multiprocessing.pool.ThreadPool(self.workers)
+        post = self.post
+        self.pool.apply_async(guarded, (function, args), callback=lambda outcome: post(done, outcome))
+
+    """Hashes password and calls callback with the stored form, or failed with the error"""
+    def hash(self, password, callback, failed):
+        self.submit(hashPassword, (password,), callback, failed)
+
+    """Checks password against stored, None for an unknown username, and calls callback with the result of
+    verifyAndRehash, or failed with the error"""
+    def verify(self, password, stored, callback, failed):
+        if stored is None:
+            if self.dummy is None:
+                self.dummy = hashPassword("")
+            self.submit(verifyPassword, (password, self.dummy), lambda valid: callback((False, None)), failed)
+        else:
+            self.submit(verifyAndRehash, (password, stored), callback, failed)
+
+    """Stops the workers"""
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
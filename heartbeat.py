@@ -0,0 +1,127 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: heartbeat.py
+
+File summary:
+    The purpose of this file is to find the connections whose client has gone without closing them, e.g. a peer that
+    crashed or lost its network, which would otherwise keep their session and their place in the groups forever.
+
+    A connection that has not sent anything for interval seconds is sent a probe, a 102 response. A client answers it
+    with PING, or with any other request. A connection that has sent nothing timeout seconds after the probe is closed,
+    its session can then be resumed like any other dropped session (see resume.py).
+
+    The deadlines of the connections are kept in a hashed TimerWheel: a ring of slots, each holding the connections
+    whose deadline falls in its resolution seconds. Every tick only visits the slot whose time has come, so the cost of
+    the heartbeats does not grow with the number of idle connections. Receiving bytes does not touch the wheel either,
+    the engines only record the tick it happened in (InboundQueue.active, see inbound.py). When the slot of a
+    connection comes, a connection that has been active since is put back in the slot of its new deadline.
+"""
+
+import time
+from pdu_response import PDUResponse
+
+INTERVAL = 60.0     # seconds without a request before a connection is probed
+TIMEOUT = 30.0      # seconds a probed connection has to answer
+RESOLUTION = 1.0    # seconds between two ticks of the wheel
+SLOTS = 512         # slots of the wheel, a deadline further away than SLOTS ticks waits one more turn
+
+
+"""TimerWheel holds items by the tick of their deadline in a ring of slots"""
+class TimerWheel:
+
+    """Constructor of TimerWheel
+    resolution -> seconds between two ticks
+    slots -> number of slots of the ring
+    now -> current time"""
+    def __init__(self, resolution=RESOLUTION, slots=SLOTS, now=0.0):
+        self.resolution = resolution
+        self.slots = [[] for slot in range(slots)]
+        self.tick = int(now / resolution)      # last tick whose slot has been visited
+
+    """Adds item, returned by advance at the first tick after deadline"""
+    def schedule(self, deadline, item):
+        tick = max(int(deadline / self.resolution) + 1, self.tick + 1)
+        self.slots[tick % len(self.slots)].append((tick, item))
+
+    """Visits the slots of the ticks up to now. Returns the items whose deadline has passed"""
+    def advance(self, now):
+        due = []
+        slots = self.slots
+        last = int(now / self.resolution)
+        if last - self.tick > len(slots):
+            # The loop was held up for more than a turn of the wheel, every slot is visited once
+            self.tick = last - len(slots)
+        while self.tick < last:
+            self.tick += 1
+            position = self.tick % len(slots)
+            slot = slots[position]
+            if not slot:
+                continue
+            kept = slots[position] = []
+            for tick, item in slot:
+                if tick <= self.tick:
+                    due.append(item)
+                else:
+                    kept.append((tick, item))
+        return due
+
+    """Returns the time of the next tick"""
+    def next(self):
+        return (self.tick + 1) * self.resolution
+
+
+"""Heartbeats probes the idle connections and closes the ones that do not answer"""
+class Heartbeats:
+
+    """Constructor of Heartbeats
+    interval -> seconds without a request before a connection is probed, 0 never probes
+    timeout -> seconds a probed connection has to answer
+    resolution -> seconds between two ticks"""
+    def __init__(self, interval=INTERVAL, timeout=TIMEOUT, resolution=RESOLUTION):
+        self.interval = interval
+        self.timeout = timeout
+        self.clock = time.time()                # time of the last tick, recorded as the activity of the connections
+        self.wheel = TimerWheel(resolution, SLOTS, self.clock)
+        self.probe = PDUResponse("102", {}, "CC", "Heartbeat")
+        self.frames = {}                        # frame of the probe by wire format name
+        self.probes = 0                         # probes sent
+        self.reaped = 0                         # connections closed for not answering
+
+    """Starts watching the connection of handler"""
+    def add(self, handler):
+        if self.interval > 0:
+            handler.inbound.active = self.clock
+            self.wheel.schedule(self.clock + self.interval, handler)
+
+    ## STATEFUL - a connection is probed once idle and closed once the probe has gone unanswered ##
+    """Probes or closes the connections whose deadline has passed. Returns the seconds until the next tick, or None
+    when the heartbeats are off"""
+    def tick(self, now):
+        if self.interval <= 0:
+            return None
+        self.clock = now
+        wheel = self.wheel
+        for handler in wheel.advance(now):
+            inbound = handler.inbound
+            if inbound.closed:
+                continue
+
+            if inbound.probed is not None and inbound.active < inbound.probed:
+                # Nothing has arrived since the probe
+                self.reaped += 1
+                handler.abort()
+            elif inbound.active + self.interval > now:
+                # The connection has been active since it was scheduled
+                inbound.probed = None
+                wheel.schedule(inbound.active + self.interval, handler)
+            else:
+                inbound.probed = now
+                frame = self.frames.get(handler.codec.name)
+                if frame is None:
+                    frame = self.frames[handler.codec.name] = handler.codec.encodeResponse(self.probe)
+                handler.push(frame)
+                self.probes += 1
+                wheel.schedule(now + self.timeout, handler)
+        return max(0.0, wheel.next() - time.time())
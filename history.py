@@ -0,0 +1,160 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: history.py
+
+File summary:
+    The purpose of this file is to keep the last chat messages of every group, so that a client joining a group in the
+    middle of a conversation receives them (receiveQueuedMessages, response code 140) instead of an empty chat.
+
+    Every group has a RoomHistory holding its last messages as the frames that were pushed to the members, so replaying
+    them costs no serialization for the wire formats that were in use. A frame for another wire format is encoded from
+    the kept PDUResponse the first time it is needed and kept as well. The history of a group is limited to
+    max_messages messages and max_bytes bytes of frames, the oldest messages are dropped first.
+
+    The histories of all the groups share a memory budget. Once it is exceeded the history of the group that received
+    its last message or JOIN the longest time ago is dropped first, the group in use is only trimmed when it is the last
+    one left.
+
+    On a JOIN the history of the group is pushed to the new member with a single push, after the 180 response.
+
+    With several worker processes (see cluster.py) a worker only keeps the messages of the groups it has members in.
+    A JOIN on a worker that does not own the group replays the history kept by the owner, which every message of the
+    group is relayed through. With a broker (see broker.py) every node keeps its own history, a JOIN replays the
+    messages the node has received while it had members in the group.
+
+    Every message gets a sequence number, counted for all the groups together. A client resuming its session (see
+    resume.py) only receives the kept messages with a sequence number after the last one sent before it went away.
+    The numbers are counted by each process, a session resumes with the history of the worker or node it resumes on.
+"""
+
+from collections import deque, OrderedDict
+
+
+"""HistoryLimits holds the limits that every RoomHistory of the server is kept within"""
+class HistoryLimits:
+
+    """Constructor of HistoryLimits
+    max_messages -> most messages kept for a group, 0 keeps no history
+    max_bytes -> most bytes of frames kept for a group
+    budget -> most bytes of frames kept for all the groups together"""
+    def __init__(self, max_messages=100, max_bytes=65536, budget=16777216):
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.budget = budget
+
+
+"""RoomHistory holds the last chat messages of a single group"""
+class RoomHistory:
+
+    """Constructor of RoomHistory"""
+    def __init__(self):
+        self.entries = deque()      # (sequence, response, {wire format name -> frame}) in the order they were sent
+        self.bytes = 0              # total length of the frames
+
+    """Adds message number sequence. frames holds the frames pushed to the members, by wire format name"""
+    def append(self, sequence, response, frames):
+        self.entries.append((sequence, response, dict(frames)))
+        self.bytes += sum(len(frame) for frame in frames.values())
+
+    """Drops the oldest messages until at most max_messages messages and max_bytes bytes are left. Returns the number of
+    bytes freed"""
+    def trim(self, max_messages, max_bytes):
+        freed = 0
+        while self.entries and (len(self.entries) > max_messages or self.bytes > max_bytes):
+            sequence, response, frames = self.entries.popleft()
+            size = sum(len(frame) for frame in frames.values())
+            self.bytes -= size
+            freed += size
+        return freed
+
+    """Returns the frames of the messages numbered after sequence for codec, oldest first, and the number of bytes
+    encoded for it"""
+    def frames(self, codec, sequence=0):
+        added = 0
+        result = []
+        for number, response, frames in self.entries:
+            if number <= sequence:
+                continue
+            frame = frames.get(codec.name)
+            if frame is None:
+                frame = frames[codec.name] = codec.encodeResponse(response)
+                added += len(frame)
+            result.append(frame)
+        self.bytes += added
+        return result, added
+
+
+"""MessageHistory holds the RoomHistory of every group that has received messages"""
+class MessageHistory:
+
+    """Constructor of MessageHistory
+    limits -> HistoryLimits of the server"""
+    def __init__(self, limits=None):
+        self.limits = limits or HistoryLimits()
+
+        # chat_name -> RoomHistory, the group used the longest time ago first
+        self.rooms = OrderedDict()
+        self.bytes = 0
+
+        # Sequence number of the last message recorded
+        self.sequence = 0
+
+    """Returns the RoomHistory of chat_name and marks it as the most recently used, or None if it has none"""
+    def touch(self, chat_name):
+        room = self.rooms.pop(chat_name, None)
+        if room is not None:
+            self.rooms[chat_name] = room
+        return room
+
+    """Keeps a chat message sent to chat_name. frames holds the frames that have been pushed to the members, by wire
+    format name"""
+    def record(self, chat_name, response, frames):
+        limits = self.limits
+        self.sequence += 1
+        if limits.max_messages <= 0:
+            return
+
+        room = self.touch(chat_name)
+        if room is None:
+            room = self.rooms[chat_name] = RoomHistory()
+        before = room.bytes
+        room.append(self.sequence, response, frames)
+        room.trim(limits.max_messages, limits.max_bytes)
+        self.bytes += room.bytes - before
+        self.evict()
+
+    """Returns the frames of the kept messages of chat_name numbered after sequence for codec, oldest first"""
+    def frames(self, chat_name, codec, sequence=0):
+        room = self.touch(chat_name)
+        if room is None or not room.entries:
+            return []
+
+        frames, added = room.frames(codec, sequence)
+        self.bytes += added
+        self.evict()
+        return frames
+
+    ## STATEFUL - the history is only replayed to a client that has joined the group ##
+    """Pushes the kept messages of chat_name numbered after sequence to handler as a single push"""
+    def replay(self, chat_name, handler, sequence=0):
+        frames = self.frames(chat_name, handler.codec, sequence)
+        if frames:
+            handler.push(b''.join(frames), True)
+
+    """Drops the histories of the groups used the longest time ago until the histories fit in the budget. The history
+    of the most recently used group is trimmed instead when it is the last one left"""
+    def evict(self):
+        budget = self.limits.budget
+        while self.bytes > budget and len(self.rooms) > 1:
+            chat_name, room = self.rooms.popitem(last=False)
+            self.bytes -= room.bytes
+        if self.bytes > budget and self.rooms:
+            room = next(iter(self.rooms.values()))
+            self.bytes -= room.trim(len(room.entries), budget)
+
+    """Returns the number of groups with a history, the number of messages and the bytes kept"""
+    def stats(self):
+        messages = sum(len(room.entries) for room in self.rooms.values())
+        return {"rooms": len(self.rooms), "messages": messages, "bytes": self.bytes}
@@ -0,0 +1,289 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: inbound.py
+
+File summary:
+    The purpose of this file is to keep a single client from taking the server for itself. The bytes read from a
+    connection wait in its InboundQueue, and the RequestScheduler takes the requests out of the queues in turns: one
+    request of every connection that has one, then the next one of every connection, and so on. A client sending
+    thousands of requests at once therefore delays the others by one request per turn, not by thousands. The engines
+    run at most QUANTUM requests before they go back to their event loop, so the sockets are read in the meantime.
+
+    Every connection has two token buckets, one for the chat messages (the commands declared as data in the
+    CommandRegistry, MSSG) and one for the other commands, and every group has a bucket for the chat messages sent to it
+    by all its members. The kind of a request is taken from the declaration of its command, not from the channel the
+    client has put in the request, and the bucket of a group is only used by the requests of its members, which the
+    CommandRegistry would let through. A client can therefore not use up the rate of a group it is not in. A bucket
+    holds up to rate * BURST_SECONDS tokens and gains rate tokens per second, a request takes a token from each of its
+    buckets. When a bucket is empty, the policy of the server decides what happens to the request:
+
+        queue   -> the request waits until the buckets have a token again. The connection is no longer read once
+                   BACKLOG bytes are waiting, so the client is slowed down by TCP instead of filling the memory. It is
+                   read again as soon as the bytes waiting are only part of a frame, which cannot be processed before
+                   the rest of it has been read
+        reject  -> the request is answered with 310 and the number of seconds after which it would be accepted
+
+    The frames are split off the bytes of a connection only when their turn comes, with the codec of the connection at
+    that time, so the frames sent after a REDY are read with the wire format it has negotiated. A frame that cannot be
+    decoded into a request object is answered with 300, and a request the server fails on closes its own connection.
+    Neither reaches the other connections. The connection of a frame longer than MAX_FRAME bytes is closed, the server
+    does not hold such a frame in memory until it is complete.
+
+    The engines rely on three things from a connection:
+
+        handler.inbound         -> InboundQueue of the connection
+        handler.resumeReading() -> reads the connection again after the engine has stopped reading it
+        handler.push(frame)     -> sends a 310 or 300 response to the client
+        handler.abort()         -> closes the connection of a request the server has failed on, or of a frame that
+                                   is too long
+"""
+
+import heapq
+import traceback
+from collections import deque
+from commands import TEXT, requestId
+from pdu_response import PDUResponse
+
+POLICIES = ["queue", "reject"]
+
+BURST_SECONDS = 2.0     # seconds of requests a bucket holds
+BACKLOG = 65536         # bytes waiting for their turn before the connection is no longer read
+QUANTUM = 64            # most requests processed before going back to the event loop
+MAX_FRAME = 1048576     # longest frame a client may send
+
+
+"""RateLimits holds the request rates and the policy that every InboundQueue of the server is created with"""
+class RateLimits:
+
+    """Constructor of RateLimits
+    control_rate -> requests per second on the control channel of a connection, 0 for no limit
+    data_rate -> chat messages per second of a connection, 0 for no limit
+    room_rate -> chat messages per second sent to a group by all its members, 0 for no limit
+    policy -> queue or reject
+    backlog -> bytes waiting for their turn before the connection is no longer read
+    max_frame -> longest frame a client may send, a longer one closes the connection"""
+    def __init__(self, control_rate=20.0, data_rate=20.0, room_rate=200.0, policy="queue", backlog=BACKLOG,
+                 max_frame=MAX_FRAME):
+        if policy not in POLICIES:
+            raise ValueError("unknown rate limit policy " + repr(policy))
+        self.control_rate = control_rate
+        self.data_rate = data_rate
+        self.room_rate = room_rate
+        self.policy = policy
+        self.backlog = backlog
+        self.max_frame = max_frame
+
+
+"""TokenBucket lets rate requests per second through, and bursts of up to burst requests"""
+class TokenBucket:
+
+    """Constructor of TokenBucket
+    rate -> tokens gained per second
+    now -> current time, the bucket starts full"""
+    def __init__(self, rate, now):
+        self.rate = rate
+        self.burst = max(1.0, rate * BURST_SECONDS)
+        self.tokens = self.burst
+        self.stamp = now
+
+    """Returns the seconds until the bucket holds a token, 0 if it holds one now"""
+    def wait(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    """Takes a token, wait must have returned 0 just before"""
+    def take(self):
+        self.tokens -= 1.0
+
+    """Returns True if the bucket is full, i.e. nothing has been taken from it for a while"""
+    def full(self, now):
+        return self.wait(now) == 0.0 and self.tokens >= self.burst
+
+
+"""InboundQueue holds the bytes received from a connection that have not been processed yet"""
+class InboundQueue:
+
+    """Constructor of InboundQueue
+    limits -> RateLimits of the server
+    now -> time the connection was accepted"""
+    def __init__(self, limits, now):
+        self.limits = limits
+        self.buffer = bytearray()   # bytes received that have not been split into frames yet
+        self.held = None            # request waiting for a token, taken before the buffer
+        self.scheduled = False      # True while the connection is in the turns of the RequestScheduler
+        self.reading = True         # False while the engine does not read the connection
+        self.closed = False         # True once the connection has been closed
+        self.active = now           # tick of the Heartbeats the last bytes were received in (see heartbeat.py)
+        self.probed = None          # time the connection was sent a heartbeat probe, None if it has answered
+        self.control = TokenBucket(limits.control_rate, now) if limits.control_rate > 0 else None
+        self.data = TokenBucket(limits.data_rate, now) if limits.data_rate > 0 else None
+
+    """Adds bytes read from the connection. Returns False if the engine has to stop reading the connection"""
+    def feed(self, data):
+        self.buffer.extend(data)
+        return len(self.buffer) < self.limits.backlog
+
+    """Returns the next request decoded with codec, or None if the buffer does not hold a complete frame"""
+    def next(self, codec):
+        request = self.held
+        if request is not None:
+            self.held = None
+            return request
+
+        buffer = self.buffer
+        if isinstance(codec.terminator, int):
+            # Binary frame, the uint32 length comes first
+            if len(buffer) < codec.terminator:
+                return None
+            end = codec.terminator + codec.bodyLength(bytes(buffer[:codec.terminator]))
+            if len(buffer) < end:
+                return None
+            msg = bytes(buffer[codec.terminator:end])
+        else:
+            # JSON frame, terminated by a new line
+            position = buffer.find(codec.terminator)
+            if position < 0:
+                return None
+            msg = bytes(buffer[:position])
+            end = position + len(codec.terminator)
+        del buffer[:end]
+        return codec.decode(msg)
+
+
+"""RequestScheduler processes the requests of the connections in turns and keeps them within their rates"""
+class RequestScheduler:
+
+    """Constructor of RequestScheduler
+    service -> ChatService processing the requests
+    limits -> RateLimits of the server"""
+    def __init__(self, service, limits):
+        self.service = service
+        self.limits = limits
+        self.ready = deque()        # connections with bytes to process, in the order of their turns
+        self.sleeping = []          # heap of (time, number, connection) of the connections waiting for a token
+        self.slept = 0              # number of the last connection put to sleep, keeps the heap from comparing them
+        self.rooms = {}             # chat_name -> TokenBucket of the data channel of the group
+        self.pruned = 0             # number of group buckets left by the last pruning
+        self.throttled = 0          # requests that had to wait or were rejected
+
+    """Gives handler a turn once bytes have been added to its InboundQueue"""
+    def add(self, handler):
+        inbound = handler.inbound
+        if not inbound.scheduled:
+            inbound.scheduled = True
+            self.ready.append(handler)
+
+    """Processes up to quantum requests, one per connection per turn. Returns the seconds until it has to run again, 0
+    if requests are waiting, or None if there is nothing left to do"""
+    def run(self, now, quantum=QUANTUM):
+        sleeping = self.sleeping
+        while sleeping and sleeping[0][0] <= now:
+            self.ready.append(heapq.heappop(sleeping)[2])
+
+        ready = self.ready
+        while ready and quantum > 0:
+            handler = ready.popleft()
+            if self.step(handler, now):
+                ready.append(handler)
+            quantum -= 1
+
+        if ready:
+            return 0.0
+        if sleeping:
+            return max(0.0, sleeping[0][0] - now)
+        return None
+
+    ## STATEFUL - a request is processed once the buckets of its connection and of its group hold a token ##
+    """Processes the next request of handler. Returns True if handler has more requests to process"""
+    def step(self, handler, now):
+        inbound = handler.inbound
+        if inbound.closed:
+            inbound.scheduled = False
+            return False
+
+        request = None
+        try:
+            request = inbound.next(handler.codec)
+            valid = request is None or isinstance(request, dict)
+        except Exception:
+            # The frame has been taken off the buffer, the next one is read as usual
+            valid = False
+        if request is None and len(inbound.buffer) > self.limits.max_frame:
+            # The buffer only holds a part of a frame, which is already too long
+            print("Closing a connection sending a frame of more than %d bytes" % self.limits.max_frame)
+            inbound.scheduled = False
+            handler.abort()
+            return False
+        if not inbound.reading and (request is None or len(inbound.buffer) < self.limits.backlog // 2):
+            # A frame longer than the backlog is only complete once the rest of it has been read
+            inbound.reading = True
+            handler.resumeReading()
+        if not valid:
+            handler.push(handler.codec.encodeResponse(PDUResponse("300", {}, "CC", "Malformed request")))
+            return True
+        if request is None:
+            inbound.scheduled = False
+            return False
+
+        buckets = self.buckets(handler, request, now)
+        wait = max([bucket.wait(now) for bucket in buckets] or [0.0])
+        if wait > 0.0:
+            self.throttled += 1
+            if self.limits.policy == "reject":
+                response = PDUResponse("310", {"retry": round(wait, 3)}, "CC", "Rate limit exceeded",
+                                       requestId(request))
+                handler.push(handler.codec.encodeResponse(response))
+                return True
+
+            # The request keeps its place, the connection sleeps until the buckets have a token
+            inbound.held = request
+            self.slept += 1
+            heapq.heappush(self.sleeping, (now + wait, self.slept, handler))
+            return False
+
+        for bucket in buckets:
+            bucket.take()
+        try:
+            self.service.handleRequest(request, handler)
+        except Exception:
+            # Only the connection of the request is lost, the other connections keep their turns
+            traceback.print_exc()
+            inbound.scheduled = False
+            handler.abort()
+            return False
+        return True
+
+    """Returns the buckets a token is taken from for request, received on the connection of handler. Unknown commands
+    count as control requests"""
+    def buckets(self, handler, request, now):
+        inbound = handler.inbound
+        registry = self.service.registry
+        name = request.get("command")
+        command = registry.commands.get(name) if isinstance(name, TEXT) else None
+        if command is None or not command.data:
+            return [inbound.control] if inbound.control is not None else []
+
+        buckets = [inbound.data] if inbound.data is not None else []
+        parameters = request.get("parameters")
+        chat_name = parameters.get("chat_name") if isinstance(parameters, dict) else None
+        # A request the registry answers with 300, e.g. from a client that is not in the group, spares the group
+        member = isinstance(chat_name, TEXT) and registry.inState(command.state, parameters, handler)
+        if self.limits.room_rate > 0 and member:
+            bucket = self.rooms.get(chat_name)
+            if bucket is None:
+                if len(self.rooms) >= 2 * max(self.pruned, 1024):
+                    self.prune(now)
+                bucket = self.rooms[chat_name] = TokenBucket(self.limits.room_rate, now)
+            buckets.append(bucket)
+        return buckets
+
+    """Drops the buckets of the groups that have not sent a chat message for a while"""
+    def prune(self, now):
+        for chat_name in [name for name, bucket in self.rooms.items() if bucket.full(now)]:
+            del self.rooms[chat_name]
+        self.pruned = len(self.rooms)
@@ -0,0 +1,203 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: journal.py
+
+File summary:
+    The purpose of this file is to persist the changes made to the user accounts and the group details without
+    rewriting the files. Each change (new user, new group, ban, admin grant) is appended to the journal file as a single
+    JSON line. When the server starts, the StateStore loads the last snapshot (user_accounts.txt and list.txt) and
+    replays the journal on top of it.
+
+    Once enough records have been appended the StateStore writes a fresh snapshot. The journal is rotated first: its
+    file is renamed to the rotated journal (.old) and the following records go to a new file. The snapshot holding the
+    records of the rotated journal is written by the syncer thread, which deletes the rotated journal once the snapshot
+    is on disk. A crash before that leaves the rotated journal behind, it is replayed before the journal and merged
+    back into it when the server starts. A crash in the middle of an append can only leave a partial last line, which
+    is dropped when the journal is replayed. Only the process appending to the journal cuts the partial line off the
+    file and merges the rotated journal, for the other worker processes of the server it may be a record that is being
+    appended.
+
+    A record is written and flushed to the operating system on the event loop, so it survives a crash of the server.
+    The fsync that makes it survive a crash of the machine is left to a syncer thread, which syncs all the records
+    appended since its last fsync at once (group commit) instead of holding up the event loop for every record.
+"""
+
+import json
+import os
+import threading
+
+
+"""Journal appends state changes to a file and reads them back when the server starts"""
+class Journal:
+
+    """Constructor of Journal
+    filename -> file that the records are appended to
+    sync -> when True the records are synced to disk by the syncer thread"""
+    def __init__(self, filename, sync=True):
+        self.filename = filename
+        self.old_filename = filename + ".old"
+        self.sync = sync
+        self.count = 0          # number of records in the journal since the last snapshot
+        self.file = None
+
+        # Guards dirty, stopping and file between the event loop and the syncer
+        self.lock = threading.Lock()
+        self.pending = threading.Condition(self.lock)
+        self.dirty = False      # True when records have been appended since the last fsync
+        self.stopping = False
+        self.syncer = None
+
+        # (rotated journal file, function writing the snapshot) waiting for the syncer. compacting is True from the
+        # rotation until the snapshot has replaced the rotated journal
+        self.snapshot = None
+        self.compacting = False
+
+    """Returns every complete record of the journal in the order they were appended, the records of a rotated journal
+    left behind by a crash first. When truncate is True, a partial last line left behind by a crash is cut off so that
+    new records are appended after the last complete one, and the rotated journal is merged into the journal"""
+    def replay(self, truncate=True):
+        old_records, old_size = self.readRecords(self.old_filename)
+        records, valid_size = self.readRecords(self.filename)
+
+        if truncate and os.path.isfile(self.filename) and valid_size != os.path.getsize(self.filename):
+            with open(self.filename, 'r+b') as myfile:
+                myfile.truncate(valid_size)
+
+        # The snapshot may not hold the records of the rotated journal, they stay in the journal until the next one
+        if truncate and os.path.isfile(self.old_filename):
+            with open(self.old_filename, 'r+b') as myfile:
+                myfile.truncate(old_size)
+                myfile.seek(old_size)
+                if valid_size:
+                    with open(self.filename, 'rb') as current:
+                        myfile.write(current.read(valid_size))
+                myfile.flush()
+                os.fsync(myfile.fileno())
+            os.rename(self.old_filename, self.filename)
+
+        self.count = len(old_records) + len(records)
+        return old_records + records
+
+    """Returns the complete records of filename and the size of the lines holding them"""
+    def readRecords(self, filename):
+        records = []
+        valid_size = 0
+        if not os.path.isfile(filename):
+            return records, valid_size
+
+        with open(filename, 'rb') as myfile:
+            for line in myfile:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    records.append(json.loads(line.decode('utf-8')))
+                except ValueError:
+                    break
+                valid_size += len(line)
+        return records, valid_size
+
+    """Appends a single record to the journal, the syncer thread syncs it to disk"""
+    def append(self, record):
+        if self.file is None:
+            self.file = open(self.filename, 'ab')
+
+        self.file.write(json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n')
+        self.file.flush()
+        self.count += 1
+        if self.sync:
+            self.startSyncer()
+            with self.lock:
+                self.dirty = True
+                self.pending.notify()
+
+    """Starts the syncer thread if it is not running"""
+    def startSyncer(self):
+        # Started on first use, not in the constructor (see cluster.py on threads and fork)
+        if self.syncer is None:
+            self.syncer = threading.Thread(target=self.syncLoop)
+            self.syncer.daemon = True
+            self.syncer.start()
+
+    """Moves the records appended so far to the rotated journal and starts an empty journal. write is called on the
+    syncer thread to write the snapshot holding those records, the rotated journal is deleted once it has returned"""
+    def rotate(self, write):
+        with self.lock:
+            rotated = self.file
+            self.file = None
+            self.dirty = False
+            if os.path.isfile(self.filename):
+                os.rename(self.filename, self.old_filename)
+            self.count = 0
+            self.compacting = True
+            if self.sync:
+                self.snapshot = (rotated, write)
+                self.pending.notify()
+        if self.sync:
+            self.startSyncer()
+        else:
+            self.replaceRotated(rotated, write)
+
+    """Syncs and closes the rotated journal, calls write and deletes the rotated journal. When the snapshot could not be
+    written the rotated journal is kept and the journal is not compacted again until the server restarts"""
+    def replaceRotated(self, rotated, write):
+        try:
+            if rotated is not None:
+                os.fsync(rotated.fileno())
+                rotated.close()
+            write()
+            os.remove(self.old_filename)
+        except (IOError, OSError) as error:
+            print("Could not write the snapshot: %s" % error)
+            return
+        self.compacting = False
+
+    """Body of the syncer thread, writes the snapshot of a rotated journal and syncs the journal file once for all the
+    records appended while it was busy. The fsync is made on a duplicate of the file descriptor without holding the
+    lock, so append never waits for the disk and the file can be closed in the meantime"""
+    def syncLoop(self):
+        while True:
+            with self.lock:
+                while not self.dirty and self.snapshot is None and not self.stopping:
+                    self.pending.wait()
+                snapshot, self.snapshot = self.snapshot, None
+                if snapshot is None and not self.dirty:
+                    return
+                descriptor = None
+                if self.dirty and self.file is not None:
+                    descriptor = os.dup(self.file.fileno())
+                self.dirty = False
+
+            if snapshot is not None:
+                self.replaceRotated(*snapshot)
+            if descriptor is None:
+                continue
+            try:
+                os.fsync(descriptor)
+            except OSError as error:
+                print("Could not sync the journal: %s" % error)
+            finally:
+                os.close(descriptor)
+
+    """Closes the journal file, the records that have not been synced yet are synced first"""
+    def closeFile(self):
+        with self.lock:
+            if self.file is not None:
+                if self.dirty:
+                    # Records the syncer has not caught up with
+                    self.dirty = False
+                    os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+
+    """Closes the journal file and stops the syncer thread once it has written the snapshot it was handed"""
+    def close(self):
+        self.closeFile()
+        if self.syncer is not None:
+            with self.lock:
+                self.stopping = True
+                self.pending.notify()
+            self.syncer.join()
+            self.syncer = None
+            self.stopping = False
@@ -0,0 +1,388 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: message_log.py
+
+File summary:
+    The purpose of this file is to keep every chat message on disk, for auditing and for the clients that scroll back
+    further than the history kept in memory (see history.py). Every group has its own append-only log in a directory
+    of the message log directory. The log is split into segments that roll once they reach segment_bytes. A segment is
+    made of two files named after the position of its first message in the log of the group:
+
+        <base>.log  -> the 140 response of every message, as the frame that the 1.0 JSON clients received
+        <base>.idx  -> one uint64 per message, the offset in the .log file where the message ends
+
+    The index file is created at its full size (a sparse file) and filled from the start, an entry of 0 has not been
+    written yet. Any process can therefore map the index and find the number of messages in a segment with a binary
+    search, while another process is appending to it, and no file is ever shrunk under a reader. A message is written
+    to the .log file before its index entry, so an indexed message is always complete.
+
+    Appends are handed to a writer thread, the event loop only queues the frame. The writer writes all the queued frames
+    before flushing and syncing the touched segments once (group commit). A message that cannot be written (e.g. a
+    full disk) is reported and dropped, the writer carries on with the next one. When the server runs several worker
+    processes, only the owner of a group writes its log, since every message of the group is relayed through it.
+
+    Reading messages N..M of a group looks up the segments holding them by their base and the offsets of the messages
+    in the mapped index, then reads the whole range of each segment as a single slice. Sealed segments are read from a
+    memory map of the .log file. The frames are never parsed, a JSON client gets the slice as it is. The reads of HIST
+    are done by a reader thread, which hands the frames back to the event loop, so a slow disk does not hold it up.
+
+    The directory of a group is its hex encoded name. The names longer than MAX_NAME_BYTES, whose hex encoding would be
+    too long for a file name, use the SHA-256 of the name instead.
+"""
+
+import binascii
+import bisect
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+SEGMENT_BYTES = 16777216    # size at which a new segment is started
+ENTRY = struct.Struct("<Q") # index entry, offset in the .log file where a message ends
+ENTRY_BYTES = 64            # smallest message size that the index of a segment is sized for
+OPEN_SEGMENTS = 64          # most sealed segments kept mapped by a reader
+MAX_NAME_BYTES = 100        # longest group name, in UTF-8 bytes, whose directory is its hex encoded name
+
+
+"""Returns the directory holding the log of chat_name. The name is hex encoded so that any group name is a valid file
+name, a long name is hashed so that the file name stays within the limits of the file system"""
+def roomDirectory(directory, chat_name):
+    name = chat_name.encode("utf-8")
+    if len(name) > MAX_NAME_BYTES:
+        return os.path.join(directory, "sha256-" + hashlib.sha256(name).hexdigest())
+    return os.path.join(directory, binascii.hexlify(name).decode("ascii"))
+
+
+"""Returns the bases of the segments in room_dir in increasing order"""
+def listSegments(room_dir):
+    if not os.path.isdir(room_dir):
+        return []
+    return sorted(int(name[:-4]) for name in os.listdir(room_dir) if name.endswith(".log"))
+
+
+"""Returns the number of entries written to the mapped index, the entries are filled from the start"""
+def countEntries(index, capacity):
+    low, high = 0, capacity
+    while low < high:
+        middle = (low + high) // 2
+        if ENTRY.unpack_from(index, middle * ENTRY.size)[0]:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+"""Segment reads the messages of a single segment"""
+class Segment:
+
+    """Constructor of Segment
+    path -> path of the segment files without the extension
+    base -> position of the first message of the segment in the log of the group
+    sealed -> True if no more messages are appended to the segment, its .log file is then mapped as well"""
+    def __init__(self, path, base, sealed):
+        self.base = base
+        self.sealed = sealed
+
+        self.index_file = open(path + ".idx", "rb")
+        self.capacity = os.fstat(self.index_file.fileno()).st_size // ENTRY.size
+        self.index = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.log_file = open(path + ".log", "rb")
+        self.log = None
+        self.count = countEntries(self.index, self.capacity)
+        if sealed and self.count:
+            self.log = mmap.mmap(self.log_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    """Returns the number of messages in the segment"""
+    def messages(self):
+        if not self.sealed:
+            self.count = countEntries(self.index, self.capacity)
+        return self.count
+
+    """Returns the offset in the .log file where message number position of the segment ends"""
+    def end(self, position):
+        if position < 0:
+            return 0
+        return ENTRY.unpack_from(self.index, position * ENTRY.size)[0]
+
+    """Returns the frames of the messages first to last (exclusive) of the segment as a single string"""
+    def read(self, first, last):
+        start = self.end(first - 1)
+        stop = self.end(last - 1)
+        if self.log is not None:
+            return self.log[start:stop]
+        self.log_file.seek(start)
+        return self.log_file.read(stop - start)
+
+    """Unmaps and closes the files"""
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+        self.index.close()
+        self.index_file.close()
+        self.log_file.close()
+
+
+"""ActiveSegment appends messages to the last segment of a group, it is only used by the writer thread"""
+class ActiveSegment:
+
+    """Constructor of ActiveSegment
+    path -> path of the segment files without the extension
+    base -> position of the first message of the segment in the log of the group
+    capacity -> number of index entries the segment is created with"""
+    def __init__(self, path, base, capacity):
+        self.base = base
+
+        if not os.path.isfile(path + ".idx"):
+            with open(path + ".idx", "wb") as index_file:
+                index_file.truncate(capacity * ENTRY.size)
+        self.index_file = open(path + ".idx", "r+b")
+        self.capacity = os.fstat(self.index_file.fileno()).st_size // ENTRY.size
+        self.index = mmap.mmap(self.index_file.fileno(), 0)
+        self.log_file = open(path + ".log", "ab")
+        self.count = countEntries(self.index, self.capacity)
+        self.ends = []      # ends of the messages written since the last commit
+        self.recover()
+
+    """Makes the .log file and the index agree after a crash. Bytes after the last indexed message are a partial write
+    and are cut off, index entries past the end of the .log file are cleared"""
+    def recover(self):
+        size = os.fstat(self.log_file.fileno()).st_size
+        while self.count and self.end(self.count - 1) > size:
+            self.count -= 1
+            ENTRY.pack_into(self.index, self.count * ENTRY.size, 0)
+        self.size = self.end(self.count - 1)
+        if size > self.size:
+            self.log_file.truncate(self.size)
+
+    """Returns the offset in the .log file where message number position of the segment ends"""
+    def end(self, position):
+        if position < 0:
+            return 0
+        return ENTRY.unpack_from(self.index, position * ENTRY.size)[0]
+
+    """Returns True if the segment cannot take another message"""
+    def full(self, segment_bytes):
+        return self.size >= segment_bytes or self.count + len(self.ends) >= self.capacity
+
+    """Writes frame to the .log file. Its index entry is written by commit"""
+    def write(self, frame):
+        self.log_file.write(frame)
+        self.size += len(frame)
+        self.ends.append(self.size)
+
+    """Writes the .log file to disk, then the index entries of the messages written since the last commit"""
+    def commit(self):
+        if not self.ends:
+            return
+        self.log_file.flush()
+        os.fsync(self.log_file.fileno())
+        for end in self.ends:
+            ENTRY.pack_into(self.index, self.count * ENTRY.size, end)
+            self.count += 1
+        self.ends = []
+
+    """Closes the files"""
+    def close(self):
+        self.index.flush()
+        self.index.close()
+        self.index_file.close()
+        self.log_file.close()
+
+
+"""MessageLog appends the chat messages of every group to its log and reads them back"""
+class MessageLog:
+
+    """Constructor of MessageLog
+    directory -> directory holding a directory per group
+    segment_bytes -> size at which a new segment is started"""
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # (chat_name, frame) waiting for the writer thread, None stops it
+        self.appends = queue.Queue()
+        self.writer = None
+
+        # (chat_name, start, count, done, post) waiting for the reader thread, None stops it
+        self.reads = queue.Queue()
+        self.reader = None
+
+        # Messages that could not be written
+        self.errors = 0
+
+        # chat_name -> ActiveSegment, only used by the writer thread
+        self.active = {}
+
+        # (chat_name, base) -> sealed Segment, the segment used the longest time ago first. Only used by the thread
+        # reading, the reader thread once it has been started
+        self.sealed = OrderedDict()
+
+    """Queues the 1.0 JSON frame of a chat message sent to chat_name. Returns right away, the writer thread writes it"""
+    def append(self, chat_name, frame):
+        # Started on first use, not in the constructor (see cluster.py on threads and fork)
+        if self.writer is None:
+            self.writer = threading.Thread(target=self.write)
+            self.writer.daemon = True
+            self.writer.start()
+        self.appends.put((chat_name, frame))
+
+    """Body of the writer thread. Writes every queued message, then commits every segment written to at once"""
+    def write(self):
+        while True:
+            item = self.appends.get()
+            written = set()     # ActiveSegments with messages to commit
+            while item is not None:
+                chat_name, frame = item
+                try:
+                    segment = self.activeSegment(chat_name)
+                    if segment.full(self.segment_bytes):
+                        # The messages written so far are committed before the segment is sealed
+                        written.discard(segment)
+                        segment.commit()
+                        segment = self.roll(chat_name, segment)
+                    segment.write(frame)
+                    written.add(segment)
+                except (IOError, OSError, ValueError) as error:
+                    # Only this message is lost, the writer goes on with the others
+                    self.errors += 1
+                    print("Could not log a message of group %r: %s" % (chat_name, error))
+                try:
+                    item = self.appends.get_nowait()
+                except queue.Empty:
+                    break
+
+            for segment in written:
+                try:
+                    segment.commit()
+                except (IOError, OSError, ValueError) as error:
+                    self.errors += 1
+                    print("Could not commit a log segment: %s" % error)
+            if item is None:
+                return
+
+    """Returns the ActiveSegment of chat_name, opening the last segment of the group or creating the first one"""
+    def activeSegment(self, chat_name):
+        segment = self.active.get(chat_name)
+        if segment is None:
+            room_dir = roomDirectory(self.directory, chat_name)
+            if not os.path.isdir(room_dir):
+                os.makedirs(room_dir)
+            bases = listSegments(room_dir)
+            base = bases[-1] if bases else 0
+            segment = self.active[chat_name] = ActiveSegment(os.path.join(room_dir, "%020d" % base), base,
+                                                             self.capacity())
+        return segment
+
+    """Returns the number of index entries of a new segment"""
+    def capacity(self):
+        return max(1, self.segment_bytes // ENTRY_BYTES)
+
+    """Seals segment and starts the next segment of chat_name"""
+    def roll(self, chat_name, segment):
+        segment.close()
+        base = segment.base + segment.count
+        path = os.path.join(roomDirectory(self.directory, chat_name), "%020d" % base)
+        segment = self.active[chat_name] = ActiveSegment(path, base, self.capacity())
+        return segment
+
+    """Returns the sealed Segment of chat_name starting at base, mapping it if it is not mapped yet"""
+    def sealedSegment(self, chat_name, base):
+        key = (chat_name, base)
+        segment = self.sealed.pop(key, None)
+        if segment is None:
+            segment = Segment(os.path.join(roomDirectory(self.directory, chat_name), "%020d" % base), base, True)
+            while len(self.sealed) >= OPEN_SEGMENTS:
+                self.sealed.popitem(last=False)[1].close()
+        self.sealed[key] = segment
+        return segment
+
+    """Calls done with the result of read on the event loop thread. The log is read by the reader thread, which hands
+    the result over with post. Without post the log is read and done is called right away. A log that cannot be read
+    gives no messages"""
+    def readLater(self, chat_name, start, count, done, post=None):
+        if post is None:
+            done(self.readSafely(chat_name, start, count))
+            return
+
+        # Started on first use like the writer
+        if self.reader is None:
+            self.reader = threading.Thread(target=self.readLoop)
+            self.reader.daemon = True
+            self.reader.start()
+        self.reads.put((chat_name, start, count, done, post))
+
+    """Body of the reader thread"""
+    def readLoop(self):
+        while True:
+            item = self.reads.get()
+            if item is None:
+                return
+            chat_name, start, count, done, post = item
+            post(done, self.readSafely(chat_name, start, count))
+
+    """Returns the result of read, or no messages when the log cannot be read"""
+    def readSafely(self, chat_name, start, count):
+        try:
+            return self.read(chat_name, start, count)
+        except (IOError, OSError, ValueError) as error:
+            print("Could not read the log of group %r: %s" % (chat_name, error))
+            return [], 0, 0, 0
+
+    """Reads up to count messages of chat_name starting with message number start, or the last count messages when
+    start is None. Returns the frames as a list of strings, each holding consecutive frames, the position of the first
+    message read, the position after the last one and the number of messages in the log"""
+    def read(self, chat_name, start, count):
+        bases = listSegments(roomDirectory(self.directory, chat_name))
+        if not bases:
+            return [], 0, 0, 0
+
+        # The last segment is still being written to, it is opened for this read only
+        last = Segment(os.path.join(roomDirectory(self.directory, chat_name), "%020d" % bases[-1]), bases[-1], False)
+        try:
+            total = last.base + last.messages()
+            if start is None:
+                start = max(0, total - count)
+            start = max(0, min(start, total))
+            stop = min(total, start + count)
+
+            chunks = []
+            position = start
+            while position < stop:
+                base = bases[bisect.bisect_right(bases, position) - 1]
+                segment = last if base == last.base else self.sealedSegment(chat_name, base)
+                end = min(stop, segment.base + segment.messages())
+                if end <= position:
+                    break
+                chunks.append(segment.read(position - segment.base, end - segment.base))
+                position = end
+            return chunks, start, position, total
+        finally:
+            last.close()
+
+    """Writes the queued messages and stops the writer thread"""
+    def close(self):
+        if self.writer is not None:
+            self.appends.put(None)
+            self.writer.join()
+            self.writer = None
+        if self.reader is not None:
+            self.reads.put(None)
+            self.reader.join()
+            self.reader = None
+        for segment in self.active.values():
+            segment.close()
+        self.active = {}
+        for segment in self.sealed.values():
+            segment.close()
+        self.sealed = OrderedDict()
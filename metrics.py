@@ -0,0 +1,162 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: metrics.py
+
+File summary:
+    The purpose of this file is to let an operator watch a running server. The Metrics of a ChatService hold:
+
+        chat_requests_total, chat_request_duration_seconds
+                                    -> number and processing time of the requests of every command, kept by the
+                                       CommandRegistry (see commands.py)
+        chat_mssg_fanout            -> number of members a chat message has been pushed to
+        chat_bytes_received_total, chat_bytes_sent_total
+                                    -> bytes read from and handed to the sockets by the engine
+        chat_outbound_queue_bytes   -> bytes waiting in the OutboundQueue of every connection that has any
+        chat_connections, chat_authenticated_users, chat_rooms
+                                    -> state of the RoutingIndex
+
+    Recording a value on the hot path is an addition to an attribute, or for a histogram a bisect over a short tuple of
+    bucket bounds and an addition to a list. Everything runs on the event loop thread, so there are no locks. Values
+    that can be read from the state of the server (connections, queue depths, ...) are not recorded at all, they are
+    only computed when the metrics are rendered.
+
+    The metrics are rendered as text in the Prometheus exposition format. An admin of the server (--admin) gets them
+    as the payload of the 160 response to STAT. With --metrics the engine also serves them over HTTP on a loopback port
+    or on a Unix socket, e.g.
+
+        curl http://127.0.0.1:9100/metrics
+        curl --unix-socket /tmp/chat-metrics.sock http://localhost/metrics
+
+    With several worker processes every worker has its own metrics, worker N serves them on port + N, or on path.N.
+"""
+
+import time
+from bisect import bisect_left
+
+# Bucket bounds of the processing time of a request, in seconds
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Bucket bounds of the number of members a chat message is pushed to
+FANOUT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+"""Histogram counts the observed values in buckets with fixed upper bounds"""
+class Histogram:
+
+    """Constructor of Histogram
+    bounds -> increasing upper bounds of the buckets, a last bucket takes the values above the last bound"""
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+
+    """Records value"""
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    """Returns the number of observed values"""
+    def count(self):
+        return sum(self.counts)
+
+    """Returns the samples of the histogram as (suffix, labels, value), with cumulative bucket counts"""
+    def samples(self, labels):
+        samples = []
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            samples.append(("_bucket", labels + (("le", formatValue(bound)),), total))
+        total += self.counts[-1]
+        samples.append(("_bucket", labels + (("le", "+Inf"),), total))
+        samples.append(("_sum", labels, self.sum))
+        samples.append(("_count", labels, total))
+        return samples
+
+
+"""Metrics holds the values recorded by the server and the functions that read the others"""
+class Metrics:
+
+    """Constructor of Metrics"""
+    def __init__(self):
+        # Recorded on the hot path
+        self.bytes_in = 0                           # bytes read from the sockets
+        self.bytes_out = 0                          # bytes handed to the sockets
+        self.accepted = 0                           # connections accepted
+        self.fanout = Histogram(FANOUT_BUCKETS)     # members every chat message has been pushed to
+        self.started = time.time()
+
+        # (name, type, help, function) in the order they are rendered. function returns a value or a Histogram, or a
+        # list of (labels, value or Histogram) where labels is a tuple of (label name, label value)
+        self.families = []
+
+    """Adds a metric read by function when the metrics are rendered
+    kind -> counter, gauge or histogram"""
+    def register(self, name, kind, help_text, function):
+        self.families.append((name, kind, help_text, function))
+
+    """Returns every metric as text in the Prometheus exposition format"""
+    def render(self):
+        lines = []
+        for name, kind, help_text, function in self.families:
+            values = function()
+            if not isinstance(values, list):
+                values = [((), values)]
+            lines.append("# HELP %s %s" % (name, help_text))
+            lines.append("# TYPE %s %s" % (name, kind))
+            for labels, value in values:
+                if isinstance(value, Histogram):
+                    for suffix, sample_labels, sample in value.samples(labels):
+                        lines.append("%s%s%s %s" % (name, suffix, formatLabels(sample_labels), formatValue(sample)))
+                else:
+                    lines.append("%s%s %s" % (name, formatLabels(labels), formatValue(value)))
+        return "\n".join(lines) + "\n"
+
+
+"""Returns labels as {name="value",...}, or an empty string when there are none"""
+def formatLabels(labels):
+    if not labels:
+        return ""
+    escaped = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        escaped.append("%s=\"%s\"" % (name, value))
+    return "{" + ",".join(escaped) + "}"
+
+
+"""Returns value as the text of a sample"""
+def formatValue(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+## SERVICE - the metrics endpoint only listens on the loopback interface or on a Unix socket ##
+"""Returns the address of the metrics endpoint of worker index given the --metrics option. A number is a loopback port,
+anything else the path of a Unix socket. Returns None when there is no endpoint"""
+def endpointAddress(option, index=0):
+    if not option:
+        return None
+    if option.isdigit():
+        return ("127.0.0.1", int(option) + index)
+    if index:
+        return "%s.%d" % (option, index)
+    return option
+
+
+"""Returns the HTTP response to a request for the metrics. request_line is the first line of the HTTP request"""
+def httpResponse(request_line, metrics):
+    parts = request_line.split()
+    if len(parts) < 2 or parts[0] != b"GET" or parts[1].split(b"?")[0] not in (b"/", b"/metrics"):
+        status, body = "404 Not Found", "Not found\n"
+        content_type = "text/plain"
+    else:
+        status, body = "200 OK", metrics.render()
+        content_type = CONTENT_TYPE
+    body = body.encode("utf-8")
+    header = "HTTP/1.0 %s\r\nContent-Type: %s\r\nContent-Length: %d\r\nConnection: close\r\n\r\n" % (
+        status, content_type, len(body))
+    return header.encode("ascii") + body
@@ -0,0 +1,139 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: outbound.py
+
+File summary:
+    The purpose of this file is to bound the memory that the responses waiting for a slow client can take. The frames
+    pushed to a connection wait in its OutboundQueue, which has a limit on the number of frames and on the number of
+    bytes. While the socket keeps up, frames only stay there until the next flush. Once the socket (or the transport
+    buffer of asyncio) is full, they stay until it can take more. A client that stops reading in a busy group therefore
+    costs a fixed amount of memory.
+
+    When a frame does not fit in the queue, the policy of the server decides what happens:
+
+        drop        -> the oldest chat messages (DC channel frames) in the queue are dropped to make room
+        disconnect  -> the connection of the client is closed
+        pause       -> the client stops receiving chat messages until its queue has drained to half the limits
+
+    Control frames (JOIN, KICK, BANN, ... responses) are never dropped, since the client would lose track of its state.
+    If a control frame does not fit even after the policy has been applied, the connection is closed.
+
+    Every pushed frame goes through the queue. The engines flush the queue of a connection once per turn of their event
+    loop, or flush_delay seconds after the first frame was queued, so that all the frames fanned out to a client in that
+    time are sent with a single send call instead of one call per frame.
+"""
+
+from collections import deque
+
+POLICIES = ["drop", "disconnect", "pause"]
+
+# Most bytes handed to the socket with a single send call
+BATCH_BYTES = 65536
+
+
+"""OutboundLimits holds the limits and the policy that every OutboundQueue of the server is created with"""
+class OutboundLimits:
+
+    """Constructor of OutboundLimits
+    max_bytes -> most bytes waiting for a client
+    max_frames -> most frames waiting for a client
+    policy -> drop, disconnect or pause
+    flush_delay -> most seconds a frame waits for other frames to be sent along with it, 0 flushes once per loop turn
+    coalesce -> False sends every frame with its own send call as soon as it is pushed"""
+    def __init__(self, max_bytes=1048576, max_frames=4096, policy="drop", flush_delay=0.0, coalesce=True):
+        if policy not in POLICIES:
+            raise ValueError("unknown slow consumer policy " + repr(policy))
+        self.max_bytes = max_bytes
+        self.max_frames = max_frames
+        self.policy = policy
+        self.flush_delay = flush_delay
+        self.coalesce = coalesce
+
+
+"""OutboundQueue holds the frames that could not be written to the socket of a connection yet"""
+class OutboundQueue:
+
+    """Constructor of OutboundQueue
+    limits -> OutboundLimits of the server"""
+    def __init__(self, limits):
+        self.limits = limits
+        self.frames = deque()   # (frame, droppable) in the order they have to be sent
+        self.bytes = 0          # total length of the frames
+        self.dropped = 0        # number of chat messages the client has not received
+        self.paused = False     # True while chat messages are not queued (pause policy)
+
+    """Returns True if a frame of length bytes fits in the queue"""
+    def fits(self, length):
+        return len(self.frames) < self.limits.max_frames and self.bytes + length <= self.limits.max_bytes
+
+    """Queues frame. droppable is True for chat messages. Returns False if the connection has to be closed"""
+    def put(self, frame, droppable=False):
+        if droppable and self.paused:
+            self.dropped += 1
+            return True
+
+        if not self.fits(len(frame)):
+            policy = self.limits.policy
+            if policy == "disconnect":
+                return False
+            elif policy == "pause":
+                if droppable:
+                    self.paused = True
+                    self.dropped += 1
+                    return True
+            else:
+                self.dropOldest(len(frame))
+
+            if not self.fits(len(frame)):
+                if not droppable:
+                    return False
+                self.dropped += 1
+                return True
+
+        self.frames.append((frame, droppable))
+        self.bytes += len(frame)
+        return True
+
+    """Drops the oldest chat messages until a frame of length bytes fits"""
+    def dropOldest(self, length):
+        limits = self.limits
+        kept = deque()
+        count = len(self.frames)
+        while self.frames and (count >= limits.max_frames or self.bytes + length > limits.max_bytes):
+            frame, droppable = self.frames.popleft()
+            if droppable:
+                self.bytes -= len(frame)
+                self.dropped += 1
+                count -= 1
+            else:
+                kept.append((frame, droppable))
+        kept.extend(self.frames)
+        self.frames = kept
+
+    """Removes and returns the oldest frame"""
+    def pop(self):
+        frame, droppable = self.frames.popleft()
+        self.bytes -= len(frame)
+
+        # Chat messages are queued again once the client has caught up with half of the queue
+        if self.paused and self.bytes <= self.limits.max_bytes // 2 and len(self.frames) <= self.limits.max_frames // 2:
+            self.paused = False
+        return frame
+
+    """Removes and returns the oldest frames, as many as fit in max_bytes but at least one"""
+    def popBatch(self, max_bytes=BATCH_BYTES):
+        frame = self.pop()
+        batch = [frame]
+        size = len(frame)
+        frames = self.frames
+        while frames and size + len(frames[0][0]) <= max_bytes:
+            frame = self.pop()
+            batch.append(frame)
+            size += len(frame)
+        return batch
+
+    """Returns the depth of the queue and the number of dropped chat messages"""
+    def stats(self):
+        return {"frames": len(self.frames), "bytes": self.bytes, "dropped": self.dropped, "paused": self.paused}
@@ -0,0 +1,324 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: pdu_codec.py
+
+File summary:
+    The purpose of this file is to convert PDURequest and PDUResponse objects to and from the bytes that are sent over
+    the connection. Two wire formats are supported and the version field selects between them:
+
+        1.0 -> JSON text terminated by "\n" (PDURequest.createRequestStr / PDUResponse.createResponseStr)
+        2.0 -> length prefixed binary frames
+
+    A connection always starts with 1.0. A client that wants the binary format sends REDY with version 2.0. The server
+    answers with 100 in JSON, with "version": 2.0 in the parameters, and from then on both sides only send binary
+    frames. A server that only knows 1.0 answers with 330 and the client keeps using JSON.
+
+    Binary frame layout (all integers are big-endian):
+
+        uint32  length of the rest of the frame
+        uint8   version (2)
+        uint16  command code (request) or response code (response)
+        uint8   channel (0 = none, 1 = AC, 2 = CC, 3 = DC)
+        uint8   number of parameters
+        parameters, each one:
+            uint8   key id (0 = the key name follows as uint8 length + UTF-8 name)
+            uint8   value type
+            uint16  value length
+            value
+        uint8   payload type
+        payload (the rest of the frame)
+
+    Values are UTF-8 text, booleans, or JSON for anything else (e.g. the list of groups returned by LIST). Since
+    the length is known up front, payloads may contain "\n".
+
+    The optional request_id field (see pdu_request.py) is sent as a parameter with its own key id. Decoding moves it
+    back out of the parameters, so both formats decode to the same object.
+
+    Compression is negotiated along with the binary format. The REDY may list the compressions the client supports in
+    the compression parameter, in order of preference. The server picks the first one it supports and returns it in
+    the compression parameter of the 100 response, from then on both sides use a DeflateCodec. A frame whose body is
+    longer than the threshold of the codec is sent as:
+
+        uint32  length of the rest of the frame
+        uint8   version with the COMPRESSED bit set (0x82)
+        raw deflate stream of the rest of the body (code, channel, parameters, payload)
+
+    Every frame is compressed on its own, without a stream shared with the previous frames of the connection, so a
+    frame fanned out to a group is compressed once and the same bytes are pushed to every member. With deflate-dict
+    the stream starts with DICTIONARY, the strings that the frames have in common (field names, response texts, the
+    JSON of the group list), which short frames benefit from most. Python 2 has no preset dictionaries, it only
+    offers deflate. The 1.0 JSON format is never compressed since its frames end with a new line.
+
+    Every codec has a name that tells the wire formats apart, the frames serialized for a group are shared by the
+    connections using the codec of the same name.
+"""
+
+import json
+import struct
+import zlib
+
+
+"""JSONCodec is the 1.0 wire format, JSON text terminated by a new line"""
+class JSONCodec:
+
+    version = 1.0
+    name = "1.0"
+    terminator = b'\n'      # asynchat terminator that ends a frame
+
+    """Serializes a PDURequest object"""
+    def encodeRequest(self, request):
+        return self.toBytes(request.createRequestStr())
+
+    """Serializes a PDUResponse object"""
+    def encodeResponse(self, response):
+        return self.toBytes(response.createResponseStr())
+
+    """Returns frame as bytes, json.dumps only returns bytes on Python 2"""
+    def toBytes(self, frame):
+        if isinstance(frame, bytes):
+            return frame
+        return frame.encode('utf-8')
+
+    """Converts a received frame back to a JSON object"""
+    def decode(self, data):
+        return json.loads(data)
+
+
+"""BinaryCodec is the 2.0 wire format, length prefixed binary frames"""
+class BinaryCodec:
+
+    version = 2.0
+    name = "2.0"
+    terminator = 4          # asynchat reads the uint32 length first and then the rest of the frame
+
+    LENGTH = struct.Struct(">I")
+    HEADER = struct.Struct(">BHBB")
+    PARAM = struct.Struct(">BBH")
+    BYTE = struct.Struct(">B")
+    WIRE_VERSION = 2
+
+    # Numeric command codes
+    COMMANDS = ["REDY", "AUTH", "NWUA", "LIST", "CHAT", "JOIN", "LEVE", "KICK", "BANN", "MSSG", "HIST", "STAT", "PROF",
+                "RSTR", "RSUM", "PING"]
+    COMMAND_CODES = dict((command, code) for code, command in enumerate(COMMANDS, 1))
+
+    CHANNELS = ["", "AC", "CC", "DC"]
+    CHANNEL_CODES = dict((channel, code) for code, channel in enumerate(CHANNELS))
+
+    # Parameter names that are sent as a single byte
+    KEYS = ["username", "password", "chat_name", "kicked_user", "banned_user", "echo", "version", "request_id",
+            "start", "count", "end", "total", "action", "rate", "compression", "prefix", "cursor", "next", "revision",
+            "base", "token", "retry"]
+    KEY_CODES = dict((key, code) for code, key in enumerate(KEYS, 1))
+
+    # Value types
+    TEXT = 0
+    TRUE = 1
+    FALSE = 2
+    JSON = 3
+
+    """Returns the number of bytes that follow the uint32 length at the start of a frame"""
+    def bodyLength(self, data):
+        return BinaryCodec.LENGTH.unpack(data)[0]
+
+    """Serializes a PDURequest object"""
+    def encodeRequest(self, request):
+        return self.encode(BinaryCodec.COMMAND_CODES[request.command], request.channel, request.parameters,
+                           request.payload, getattr(request, "request_id", None))
+
+    """Serializes a PDUResponse object"""
+    def encodeResponse(self, response):
+        return self.encode(int(response.response_code), response.channel, response.parameters, response.payload,
+                           getattr(response, "request_id", None))
+
+    """Builds a frame from its fields"""
+    def encode(self, code, channel, parameters, payload, request_id=None):
+        if request_id is not None:
+            parameters = dict(parameters)
+            parameters["request_id"] = request_id
+
+        parts = [BinaryCodec.HEADER.pack(BinaryCodec.WIRE_VERSION, code, BinaryCodec.CHANNEL_CODES.get(channel, 0),
+                                         len(parameters))]
+
+        for key in parameters:
+            key_id = BinaryCodec.KEY_CODES.get(key, 0)
+            value_type, value = self.encodeValue(parameters[key])
+            parts.append(BinaryCodec.PARAM.pack(key_id, value_type, len(value)))
+            if key_id == 0:
+                name = self.toBytes(key)
+                parts.append(BinaryCodec.BYTE.pack(len(name)))
+                parts.append(name)
+            parts.append(value)
+
+        value_type, value = self.encodeValue(payload)
+        parts.append(BinaryCodec.BYTE.pack(value_type))
+        parts.append(value)
+
+        body = b"".join(parts)
+        return BinaryCodec.LENGTH.pack(len(body)) + body
+
+    """Returns the type and the bytes of a parameter or payload value"""
+    def encodeValue(self, value):
+        if value is True:
+            return BinaryCodec.TRUE, b""
+        elif value is False:
+            return BinaryCodec.FALSE, b""
+        elif isinstance(value, (bytes, type(u""))):
+            return BinaryCodec.TEXT, self.toBytes(value)
+        else:
+            return BinaryCodec.JSON, self.toBytes(json.dumps(value, separators=(',', ':')))
+
+    """Returns value as UTF-8 bytes"""
+    def toBytes(self, value):
+        if isinstance(value, bytes):
+            return value
+        return value.encode('utf-8')
+
+    """Converts the body of a frame (everything after the uint32 length) back to the same JSON object that the 1.0
+    format produces, with either a command or a response_code"""
+    def decode(self, data):
+        version, code, channel, count = BinaryCodec.HEADER.unpack_from(data, 0)
+        offset = BinaryCodec.HEADER.size
+
+        parameters = {}
+        for i in range(count):
+            key_id, value_type, length = BinaryCodec.PARAM.unpack_from(data, offset)
+            offset += BinaryCodec.PARAM.size
+            if key_id == 0:
+                name_length = BinaryCodec.BYTE.unpack_from(data, offset)[0]
+                key = data[offset + 1:offset + 1 + name_length].decode('utf-8')
+                offset += 1 + name_length
+            else:
+                key = BinaryCodec.KEYS[key_id - 1]
+            parameters[key] = self.decodeValue(value_type, data[offset:offset + length])
+            offset += length
+
+        value_type = BinaryCodec.BYTE.unpack_from(data, offset)[0]
+        payload = self.decodeValue(value_type, data[offset + 1:])
+
+        obj = {
+            "version": BinaryCodec.version,
+            "parameters": parameters,
+            "channel": BinaryCodec.CHANNELS[channel],
+            "payload": payload
+        }
+        if "request_id" in parameters:
+            obj["request_id"] = parameters.pop("request_id")
+
+        # Command codes are all below 100, response codes are 3 digits
+        if code < 100:
+            obj["command"] = BinaryCodec.COMMANDS[code - 1]
+        else:
+            obj["response_code"] = str(code)
+        return obj
+
+    """Converts the bytes of a parameter or payload value back to its value"""
+    def decodeValue(self, value_type, data):
+        if value_type == BinaryCodec.TRUE:
+            return True
+        elif value_type == BinaryCodec.FALSE:
+            return False
+        elif value_type == BinaryCodec.JSON:
+            return json.loads(data.decode('utf-8'))
+        else:
+            return data.decode('utf-8')
+
+
+# Frames with a longer body are compressed by a DeflateCodec
+COMPRESS_BYTES = 256
+
+# Longest body a compressed frame may inflate to
+MAX_INFLATED_BYTES = 4194304
+
+# Preset dictionary of deflate-dict. Deflate finds matches closer to the end of the dictionary with fewer bits, the
+# most common strings come last
+DICTIONARY = (b'There are currently no groups Group name already exists You are banned from joining this group '
+              b'You are not the admin of this group You are not an admin of the server Invalid history range '
+              b'Server is running on a different protocol version has been banned from the group '
+              b'has been kicked from the group has left the group has joined the group '
+              b'"version" "command" "parameters" "channel" "payload" "response_code" "request_id" "username" '
+              b'"password" "chat_name" "kicked_user" "banned_user" "echo" "start" "count" "end" "total" '
+              b'the you to and is of it that in for what are this have we be on with not just was so but '
+              b'["group","chat","room","general","team","'
+              b'","room","group","chat","')
+
+# Python 2 has no preset dictionaries
+try:
+    zlib.compressobj(6, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, DICTIONARY)
+    COMPRESSIONS = ["deflate-dict", "deflate"]
+except TypeError:
+    COMPRESSIONS = ["deflate"]
+
+
+"""DeflateCodec is the 2.0 binary wire format with the frames longer than a threshold deflated"""
+class DeflateCodec(BinaryCodec):
+
+    COMPRESSED = 0x80       # bit set in the version byte of a compressed frame
+
+    """Constructor of DeflateCodec
+    compression -> deflate, or deflate-dict to start every stream with DICTIONARY
+    threshold -> frames with a longer body are compressed
+    level -> zlib compression level"""
+    def __init__(self, compression, threshold=COMPRESS_BYTES, level=6):
+        self.compression = compression
+        self.name = BinaryCodec.name + "+" + compression
+        self.threshold = threshold
+        self.level = level
+        self.zdict = DICTIONARY if compression == "deflate-dict" else None
+
+    """Builds a frame from its fields, compressed when its body is longer than the threshold and gets shorter"""
+    def encode(self, code, channel, parameters, payload, request_id=None):
+        frame = BinaryCodec.encode(self, code, channel, parameters, payload, request_id)
+        length = BinaryCodec.LENGTH.size
+        if len(frame) - length <= self.threshold:
+            return frame
+
+        if self.zdict is not None:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, self.zdict)
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        deflated = compressor.compress(frame[length + 1:]) + compressor.flush()
+        if 1 + len(deflated) >= len(frame) - length:
+            return frame
+        body = BinaryCodec.BYTE.pack(BinaryCodec.WIRE_VERSION | DeflateCodec.COMPRESSED) + deflated
+        return BinaryCodec.LENGTH.pack(len(body)) + body
+
+    """Converts the body of a frame, compressed or not, back to the object that the 1.0 format produces"""
+    def decode(self, data):
+        if BinaryCodec.BYTE.unpack_from(data, 0)[0] & DeflateCodec.COMPRESSED:
+            data = BinaryCodec.BYTE.pack(BinaryCodec.WIRE_VERSION) + self.inflate(data[1:])
+        return BinaryCodec.decode(self, data)
+
+    """Returns the inflated deflate stream data. Raises ValueError if it inflates to more than MAX_INFLATED_BYTES"""
+    def inflate(self, data):
+        if self.zdict is not None:
+            decompressor = zlib.decompressobj(-15, self.zdict)
+        else:
+            decompressor = zlib.decompressobj(-15)
+        try:
+            inflated = decompressor.decompress(bytes(data), MAX_INFLATED_BYTES)
+        except zlib.error as error:
+            raise ValueError("invalid compressed frame: %s" % error)
+        if decompressor.unconsumed_tail:
+            raise ValueError("compressed frame inflates to more than %d bytes" % MAX_INFLATED_BYTES)
+        return inflated
+
+
+"""Returns the codec of the first compression of offered that this side supports, or None. offered is a name or a list
+of names in order of preference"""
+def negotiateCompression(offered, threshold=COMPRESS_BYTES):
+    if not isinstance(offered, list):
+        offered = [offered]
+    for compression in offered:
+        if compression in COMPRESSIONS:
+            return DeflateCodec(compression, threshold)
+    return None
+
+
+# Wire formats by protocol version
+CODECS = {
+    JSONCodec.version: JSONCodec(),
+    BinaryCodec.version: BinaryCodec()
+}
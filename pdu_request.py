@@ -14,13 +14,16 @@ import json
 
 """Requests from client are made into the PDURequest object"""
 class PDURequest:
-    """Constructor for PDURequest"""
-    def __init__(self, version, command, parameters, channel, payload):
+    """Constructor for PDURequest
+    request_id -> optional number chosen by the client, the server copies it to the response sent back to the client"""
+    def __init__(self, version, command, parameters, channel, payload, request_id=None):
         self.version = version                  # Client protocol version
         self.command = command                  # 4 char command text
         self.parameters = parameters            # JSON object with parameters
         self.channel = channel                  # AC | CC | DC
         self.payload = payload                  # chat text | data
+        if request_id is not None:
+            self.request_id = request_id        # only serialized when it is set
 
     """Serializes PDURequest object"""
     def createRequestStr(self):
@@ -8,6 +8,9 @@ File summary:
     The purpose of this file is to create a new response object. The response object is created when the server wants to 
     send a response to the client. The class has a function to convert the object into an string for the resposne to be 
     sent towards the client.
+
+    A response that answers a request carrying a request_id carries the same request_id, so that the client can match
+    it with the request. Only the copy sent to the client that made the request has it.
 """
 
 import json
@@ -18,13 +21,20 @@ class PDUResponse:
 
     __version = 1.0     # Servers protocol version
 
-    """Constructor of PDUResponse"""
-    def __init__(self, code, parameters, channel, payload):
+    """Constructor of PDUResponse
+    request_id -> request_id of the request this response answers, only set on the copy sent to the requester"""
+    def __init__(self, code, parameters, channel, payload, request_id=None):
         self.version = PDUResponse.__version
         self.response_code = code                   # 3 digit response code | string
         self.parameters = parameters                # JSON obj of parameters
         self.channel = channel                      # AC | CC | DC
         self.payload = payload                      # Data
+        if request_id is not None:
+            self.request_id = request_id            # only serialized when it is set
+
+    """Returns a copy of the response answering the request with request_id"""
+    def withRequestId(self, request_id):
+        return PDUResponse(self.response_code, self.parameters, self.channel, self.payload, request_id)
 
     """Serializes PDUResponse object"""
     def createResponseStr(self):
@@ -0,0 +1,140 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: profiler.py
+
+File summary:
+    The purpose of this file is to find out where a running server spends its time without restarting it. The
+    SamplingProfiler is switched on and off at runtime, by an admin of the server with PROF or with SIGUSR1 (see
+    server.py). While it is on, a thread reads the stack of the event loop thread rate times per second with
+    sys._current_frames() and counts every distinct stack. Switching it off writes two files to the profile directory:
+
+        profile-<pid>-<time>.collapsed  -> one line per stack, "outer;...;inner count", the input of flamegraph.pl and
+                                           of speedscope
+        profile-<pid>-<time>.txt        -> the functions the thread was running in the most samples (self), with the
+                                           number of samples they were anywhere on the stack (total)
+
+    The profiler never touches the event loop thread: it installs no trace or profile hook, it only reads the frames of
+    the thread from its own thread. While it is off, there is no thread and the server runs exactly as without it.
+"""
+
+import os
+import signal
+import sys
+import threading
+import time
+
+RATE = 100      # samples per second
+TOP = 20        # functions listed in the summary
+
+
+"""SamplingProfiler samples the stack of a single thread while it is on"""
+class SamplingProfiler:
+
+    """Constructor of SamplingProfiler
+    directory -> directory the profiles are written to
+    rate -> samples per second
+    top -> number of functions listed in the summary
+    thread_id -> thread to sample, by default the thread creating the profiler (the event loop thread)"""
+    def __init__(self, directory="./profiles", rate=RATE, top=TOP, thread_id=None):
+        self.directory = directory
+        self.rate = rate
+        self.top = top
+        self.thread_id = thread_id if thread_id is not None else threading.current_thread().ident
+
+        self.sampler = None         # sampling thread, None while the profiler is off
+        self.stopping = None        # Event set to stop the sampling thread
+        self.stacks = {}            # collapsed stack -> number of samples
+        self.samples = 0
+        self.started = 0.0
+
+    """Returns True while the profiler is sampling"""
+    def running(self):
+        return self.sampler is not None
+
+    """Starts sampling at rate samples per second, the rate of the profiler by default. Returns False if the profiler
+    is already on"""
+    def start(self, rate=None):
+        if self.sampler is not None:
+            return False
+        self.stacks = {}
+        self.samples = 0
+        self.started = time.time()
+        self.stopping = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, args=(1.0 / (rate or self.rate),))
+        self.sampler.daemon = True
+        self.sampler.start()
+        return True
+
+    """Body of the sampling thread"""
+    def sample(self, interval):
+        stacks = self.stacks
+        thread_id = self.thread_id
+        while not self.stopping.wait(interval):
+            frame = sys._current_frames().get(thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append("%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                frame = frame.f_back
+            if names:
+                names.reverse()
+                stack = ";".join(names)
+                stacks[stack] = stacks.get(stack, 0) + 1
+                self.samples += 1
+
+    """Stops sampling and writes the profile. Returns the paths of the collapsed stacks and of the summary and the
+    summary, or None if the profiler is off"""
+    def stop(self):
+        if self.sampler is None:
+            return None
+        self.stopping.set()
+        self.sampler.join()
+        self.sampler = None
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        base = os.path.join(self.directory, "profile-%d-%s" % (os.getpid(), time.strftime("%Y%m%d-%H%M%S")))
+        with open(base + ".collapsed", "w") as collapsed:
+            for stack, count in sorted(self.stacks.items()):
+                collapsed.write("%s %d\n" % (stack, count))
+        summary = self.summary(time.time() - self.started)
+        with open(base + ".txt", "w") as summary_file:
+            summary_file.write(summary)
+        return base + ".collapsed", base + ".txt", summary
+
+    """Switches the profiler on when it is off and off when it is on, used by the signal handler"""
+    def toggle(self):
+        if self.start():
+            print("Profiler started, sampling %g times per second" % self.rate)
+        else:
+            collapsed, summary_path, summary = self.stop()
+            print("Profile written to %s and %s" % (collapsed, summary_path))
+
+    """Returns the functions the thread was running in the most samples as a printable table. self is the number of
+    samples the function was running in, total the number of samples it was on the stack in"""
+    def summary(self, seconds):
+        own = {}
+        total = {}
+        for stack, count in self.stacks.items():
+            names = stack.split(";")
+            own[names[-1]] = own.get(names[-1], 0) + count
+            for name in set(names):
+                total[name] = total.get(name, 0) + count
+
+        samples = max(1, self.samples)
+        lines = ["%d samples in %.1f s" % (self.samples, seconds),
+                 "%8s %7s %8s %7s  %s" % ("self", "self %", "total", "total %", "function")]
+        for name in sorted(total, key=lambda name: (own.get(name, 0), total[name]), reverse=True)[:self.top]:
+            lines.append("%8d %6.1f%% %8d %6.1f%%  %s" % (own.get(name, 0), own.get(name, 0) * 100.0 / samples,
+                                                          total[name], total[name] * 100.0 / samples, name))
+        return "\n".join(lines) + "\n"
+
+
+"""Makes signum (SIGUSR1 by default) switch profiler on and off. Does nothing where the signal does not exist"""
+def toggleOnSignal(profiler, signum=None):
+    if signum is None:
+        signum = getattr(signal, "SIGUSR1", None)
+    if signum is not None:
+        signal.signal(signum, lambda received, frame: profiler.toggle())
@@ -6,408 +6,218 @@ File: request_handler.py
 
 File summary:
     The purpose of this file is to handle the requests coming from the client. The requests first reach the server file and
-    control is passed to this request_handler file. The RequestHandler class has the run_command function which calls
-    the required function based on the command received from the client.
+    control is passed to this request_handler file. Every command is registered with the function of the RequestHandler
+    that handles it (see commands.py and chat_service.py). The functions are called with obj, the parameters of the
+    request that the command declares, and the handler of the connection the request arrived on. A single
+    RequestHandler serves all the requests.
 
-    The handler and client_map has been passed on so that the client_map can be updated with the relevant values. Different
-    functions handles updation of client_map differently. It must be noted that the client_map's client list is being
-    updated and in no point of the code is the client_map lists being replaced. This allows the client_map changes to
-    be preserved when the control returns back to the server file.
+    Every function returns a PDUResponse object. The server serializes it once for each wire format (see pdu_codec.py)
+    used by the clients that receive it.
+
+    All user account and group lookups are made against the StateStore that the server loaded at startup. The files
+    are only written by the store when an account or a group changes.
+
+    The client_map is the servers RoutingIndex, the functions update it through login, join and moveOut so that its
+    per group indexes stay in step with the sessions.
+
+    NWUA and AUTH hash the password in the CredentialPool (see credentials.py) instead of on the event loop. Their
+    functions return None and send the response with the respond function once the pool has handed the result back.
+    A password that is not a string is refused with 300 before it reaches the pool, and a request the pool fails on is
+    answered with 200.
 """
 
-import json
-import os
-from user import User
-from chat_room import Chat_room
 from pdu_response import PDUResponse
 
+TEXT = (bytes, type(u""))
+
 
 """RequestHandler class is used by the server to handle all the incoming requests from the client"""
 class RequestHandler:
-    """Constructor for RequestHandler class"""
-    def __init__(self, req_obj=None):
-        self.obj = req_obj
-
-    ## STATEFUL - calls a different function depending on which state the PDU action belongs to ##
-    """Calls the associated function of the command received
-    handler -> the client socket
-    client_map -> map of username and the client socket"""
-    def run_command(self, command, handler, client_map):
-        # Following if-else loops checks the command received and perform the associated function
-        if command == "REDY":
-            return self.readyAction()
-        elif command == "JOIN":
-            return self.joinAction(handler, client_map)
-        elif command == "MSSG":
-            return self.mssgAction()
-        elif command == "KICK":
-            return self.kickAction(client_map)
-        elif command == "BANN":
-            return self.banAction(client_map)
-        elif command == "LIST":
-            return self.listAction()
-        elif command == "AUTH":
-            return self.loginAuthentication(handler, client_map)
-        elif command == "NWUA":
-            return self.createNewUserAccount(handler, client_map)
-        elif command == "CHAT":
-            return self.createNewChat(handler, client_map)
-        elif command == "LEVE":
-            return self.leaveChat(handler, client_map)
-        elif command == "VRSN":
-            return self.incompatibleVersion()
-
-    """Reads and returns contents of filename"""
-    def getFileContents(self, filename):
-        # If filename does not exist
-        if not os.path.isfile('./' + filename):
-            # Creates new file with name as filename
-            file = open(filename, "w+")
-            file.close()
-            return ""
-
-        # Filename exists
-        else:
-            # Reads file and returns file contents
-            with open(filename, 'r') as myfile:
-                data = myfile.read().replace('\n', '')
-            return data
-
-    """Creates new user account and saves it to file"""
-    def createNewUserAccount(self, handler, client_map):
-        # Fetching user account file data
-        users_str = self.getFileContents(self.obj["filename"]).strip()
-
-        # Constructing JSON object of existing data from text of the file
-        if users_str is not None and users_str:
-            all_users_obj = json.loads(users_str)
-        else:
-            all_users_obj = {"users": []}
-
-        # Checking if user already exists
-        for user_acc in all_users_obj["users"]:
-            if user_acc["username"] == self.obj["username"]:
+    """Constructor for RequestHandler class
+    store -> StateStore holding the user accounts and group details
+    client_map -> RoutingIndex of the sessions of all connected clients
+    credentials -> CredentialPool hashing and checking the passwords
+    respond -> function called with the command, the parameters, the response and the handler to deliver a response
+               that is sent after the function has returned"""
+    def __init__(self, store=None, client_map=None, credentials=None, respond=None):
+        self.store = store
+        self.client_map = client_map
+        self.credentials = credentials
+        self.respond = respond
+
+    """Creates new user account and saves it to file. The password is hashed in the CredentialPool, the response is
+    sent once the account has been created"""
+    def createNewUserAccount(self, obj, handler):
+        # Usernames that already exist are refused right away
+        if self.store.getUser(obj["username"]) is not None:
+            return PDUResponse("200", {}, "", "")
+        if not isinstance(obj["password"], TEXT):
+            return PDUResponse("300", {}, "CC", "Invalid password")
+
+        def created(password):
+            # The client has gone while its password was hashed
+            if self.client_map.getSession(handler) is None:
+                return
+
+            # Creating the new user. The store refuses usernames that have been taken in the meantime
+            if not self.store.addUser(obj["username"], password):
                 # Username already exists
-                return PDUResponse("200", {}, "", "").createResponseStr()
+                self.respond("NWUA", obj, PDUResponse("200", {}, "", ""), handler)
+                return
 
-        # Creating new user and updating the users file
-        new_user = User(self.obj["username"], self.obj["password"])
+            # Updating the client_map object
+            self.client_map.login(obj["username"], handler)
 
-        # Updating the all_users object with new user
-        all_users_obj["users"].append(json.loads(json.dumps(new_user.__dict__)))
+            # Creating and sending response for new user created
+            self.respond("NWUA", obj, PDUResponse("110", {}, "CC", ""), handler)
 
-        # Opening file in empty mode and dumps the updated data back to the file
-        file = open(self.obj["filename"], "w")
-        file.write(json.dumps(all_users_obj))
-        file.close()
+        self.credentials.hash(obj["password"], created, lambda error: self.failed("NWUA", obj, handler))
 
-        # Updating the client_map object
-        client_map["clients"].append({
-            "username": self.obj["username"],
-            "chat_name": "",
-            "prev_chat": None,
-            "handler": handler
-        })
-
-        # Creating and returning response for new user created
-        return PDUResponse("110", {}, "CC", "").createResponseStr()
-
-    """Authenticates user based on given credentials"""
-    def loginAuthentication(self, handler, client_map):
-        # Fetching user account file data
-        users_str = self.getFileContents(self.obj["filename"]).strip()
-
-        # Constructing JSON object of existing data from text of the file
-        if users_str is not None and users_str:
-            all_users_obj = json.loads(users_str)
-        else:
-            all_users_obj = {"users": []}
+    """Authenticates user based on given credentials. The password is checked in the CredentialPool, the response is
+    sent once the check is done"""
+    def loginAuthentication(self, obj, handler):
+        if not isinstance(obj["password"], TEXT):
+            return PDUResponse("300", {}, "CC", "Invalid password")
+        user_acc = self.store.getUser(obj["username"])
 
-        if len(all_users_obj["users"]) == 0:
-            # No user data available
-            return PDUResponse("200", {}, "CC", "").createResponseStr()
-        else:
-            valid_user = False
+        def verified(result):
+            valid_user, new_password = result
 
-            # Checking if credentials are correct
-            for user_acc in all_users_obj["users"]:
-                if user_acc["username"] == self.obj["username"] and user_acc["password"] == self.obj["password"]:
-                    valid_user = True
-                    break
+            # The client has gone while its password was checked
+            if self.client_map.getSession(handler) is None:
+                return
 
             if valid_user:
+                # Plaintext passwords and hashes with too few rounds are replaced on a successful login
+                if new_password is not None:
+                    self.store.setPassword(obj["username"], new_password)
+
                 # Updating client_map object
-                client_map["clients"].append({
-                    "username": self.obj["username"],
-                    "chat_name": "",
-                    "prev_chat": None,
-                    "handler": handler
-                })
-                # Creating and returning successful authentication response
-                return PDUResponse("110", {}, "CC", "").createResponseStr()
+                self.client_map.login(obj["username"], handler)
+                # Creating and sending successful authentication response
+                self.respond("AUTH", obj, PDUResponse("110", {}, "CC", ""), handler)
 
             else:
-                print "Either your username or password is incorrect"
-                # Creating and returning response for invalid credentials
-                return PDUResponse("200", {}, "CC", "").createResponseStr()
-
-    """Function to check if server is alive"""
-    def readyAction(self):
+                print("Either your username or password is incorrect")
+                # Creating and sending response for invalid credentials
+                self.respond("AUTH", obj, PDUResponse("200", {}, "CC", ""), handler)
+
+        # Checking if credentials are correct. An unknown username is checked against a dummy hash so that it takes as
+        # long as a wrong password
+        self.credentials.verify(obj["password"], user_acc["password"] if user_acc is not None else None, verified,
+                                lambda error: self.failed("AUTH", obj, handler))
+
+    """Answers NWUA or AUTH with 200 when the CredentialPool has failed on its password"""
+    def failed(self, command, obj, handler):
+        if self.client_map.getSession(handler) is not None:
+            self.respond(command, obj, PDUResponse("200", {}, "CC", "Could not check the password"), handler)
+
+    """Function to check if server is alive. The version the server accepted is returned so that a client asking for
+    2.0 knows that it can switch to the binary format"""
+    def readyAction(self, obj, handler):
         # Return server is ready response
-        return PDUResponse("100", {}, "CC", "Ready").createResponseStr()
+        return PDUResponse("100", {"version": obj["version"]}, "CC", "Ready")
 
     """Function responsible for allowing client to join a group"""
-    def joinAction(self, handler, client_map):
-        # Fetching group details data from list file
-        chat_para = self.getFileContents(self.obj["list"]).strip()
-
-        # Constructing JSON object of existing data from text of the file
-        all_chat_obj = json.loads(chat_para)
-        isBanned = False
-
+    def joinAction(self, obj, handler):
         # Checking if joining user is banned from the group
-        for chat in all_chat_obj["chats"]:
-            if chat["chat_name"] == self.obj["chat_name"] and self.obj["username"] in chat["banned_users"]:
-                isBanned = True
-                break
+        isBanned = self.store.isBanned(obj["chat_name"], obj["username"])
 
         # Not banned
         if not isBanned:
-            # Update the group list file
-            file = open(self.obj["list"], "w")
-            file.write(json.dumps(all_chat_obj))
-            file.close()
-
-            # Update the client_map
-            for client in client_map["clients"]:
-                if client["username"] == self.obj["username"]:
-                    prev_chat = client["chat_name"]
-                    client["chat_name"] = self.obj["chat_name"]     # set to new chat
-                    client["prev_chat"] = prev_chat                 # set to previous chat
-                    client["handler"] = handler
+            # Update the client_map. The previous chat is kept as prev_chat
+            self.client_map.join(obj["username"], obj["chat_name"], handler)
 
-            parameters = {"username": self.obj["username"], "chat_name": self.obj["chat_name"]}
+            parameters = {"username": obj["username"], "chat_name": obj["chat_name"]}
 
             # Creating and returning group joined successfully response
-            return PDUResponse("180", parameters, "CC", self.obj["username"] + " has joined the group").createResponseStr()
+            return PDUResponse("180", parameters, "CC", obj["username"] + " has joined the group")
 
         else:
-            parameters = {"username": self.obj["username"], "chat_name": self.obj["chat_name"]}
+            parameters = {"username": obj["username"], "chat_name": obj["chat_name"]}
             # Creating and returning group joining failed response
-            return PDUResponse("240", parameters, "CC", "You are banned from joining this group").createResponseStr()
-
-    """Receive message from client and creating response to send to all other clients in the group"""
-    def mssgAction(self):
-        # Creating and returning message response
-        return PDUResponse("140", {}, "DC", self.obj["payload"]).createResponseStr()
+            return PDUResponse("240", parameters, "CC", "You are banned from joining this group")
 
     """Function for kicking username from a group. Can only be performed by an admin. Username can rejoin"""
-    def kickAction(self, client_map):
-        # Fetching group details data from list file
-        groups_str = self.getFileContents(self.obj["list"]).strip()
-
-        # Constructing JSON object of existing data from text of the file
-        if groups_str is not None and groups_str:
-            groups_obj = json.loads(groups_str)
-        else:
-            groups_obj = {"chats": []}
-
-        isAdmin = False
-
+    def kickAction(self, obj, handler):
         # Checking if client is admin
-        for chat in groups_obj["chats"]:
-            if chat["chat_name"] == self.obj["chat_name"]:
-                for admin in chat["admins"]:
-                    if admin == self.obj["username"]:
-                        isAdmin = True
-                        break
-                break
+        isAdmin = self.store.isAdmin(obj["chat_name"], obj["username"])
 
         if isAdmin:
-            # Updating the client_map object
-            for client in client_map["clients"]:
-                if client["username"] == self.obj["kicked_user"]:
-                    prev_chat = client["chat_name"]
-                    client["chat_name"] = ""            # emptying current chat
-                    client["prev_chat"] = prev_chat     # setting to previous chat
-                    client["handler"].chat_name = ""
+            # Updating the client_map object. Empties the current chat and sets it as the previous chat
+            self.client_map.moveOut(obj["kicked_user"])
 
-            parameters = {"kicked_user": self.obj["kicked_user"]}
+            parameters = {"kicked_user": obj["kicked_user"]}
 
             # Creating and returning successfully kicked response
-            return PDUResponse("192", parameters, "CC", self.obj["kicked_user"] + " has been kicked from the group")\
-                .createResponseStr()
+            return PDUResponse("192", parameters, "CC", obj["kicked_user"] + " has been kicked from the group")
 
         else:
             # Creating and returning failed to kick response
-            return PDUResponse("260", {"username": self.obj["username"]}, "CC", "You are not the admin of this group") \
-                .createResponseStr()
+            return PDUResponse("260", {"username": obj["username"]}, "CC", "You are not the admin of this group")
 
     """Function for banning username from a group. Can only be performed by an admin. Username cannot rejoin"""
-    def banAction(self, client_map):
-        # Loading both user credentials and group details file
-        users_str = self.getFileContents(self.obj["filename"]).strip()
-        groups_str = self.getFileContents(self.obj["list"]).strip()
-
-        # Construction JSON object from the user credentials string
-        if users_str is not None and users_str:
-            all_users_obj = json.loads(users_str)
-        else:
-            all_users_obj = {"users": []}
-
-        # Construction JSON object from the group details string
-        if groups_str is not None and groups_str:
-            groups_obj = json.loads(groups_str)
-        else:
-            groups_obj = {"chats": []}
-
-        isAdmin = False
-
+    def banAction(self, obj, handler):
         # Checking if admin
-        for chat in groups_obj["chats"]:
-            if chat["chat_name"] == self.obj["chat_name"]:
-                for admin in chat["admins"]:
-                    if admin == self.obj["username"]:
-                        isAdmin = True
-
-                        # The client is admin, thus can ban the user. Adding to list of banned users of the group
-                        chat["banned_users"].append(self.obj["banned_user"])
-                        break
-                break
+        isAdmin = self.store.isAdmin(obj["chat_name"], obj["username"])
 
         if isAdmin:
-            # Updating users account
-            for user_acc in all_users_obj["users"]:
-                if user_acc["username"] == self.obj["banned_user"]:
-                    # User accounts maintaining list of groups banned from
-                    user_acc["bannedGroups"].append(self.obj["chat_name"])
-                    break
-
-            # Writing back the updated user accounts and group details to the files
-            file = open(self.obj["filename"], "w")
-            file.write(json.dumps(all_users_obj))
-            file.close()
-
-            file = open(self.obj["list"], "w")
-            file.write(json.dumps(groups_obj))
-            file.close()
+            # The client is admin, thus can ban the user. The group and the banned users account both keep track of the ban
+            self.store.banUser(obj["chat_name"], obj["banned_user"])
 
             # Updating the client_map object
-            for client in client_map["clients"]:
-                if client["username"] == self.obj["banned_user"]:
-                    prev_chat = client["chat_name"]
-                    client["chat_name"] = ""
-                    client["prev_chat"] = prev_chat
-                    client["handler"].chat_name = ""
+            self.client_map.moveOut(obj["banned_user"])
 
             # Creating and returning a successful ban response
-            return PDUResponse("191", {"banned_user": self.obj["banned_user"]}, "CC",
-                               self.obj["banned_user"] + " has been banned from the group").createResponseStr()
+            return PDUResponse("191", {"banned_user": obj["banned_user"]}, "CC",
+                               obj["banned_user"] + " has been banned from the group")
 
         else:
             # Creating and returning a failed to ban response
-            return PDUResponse("250", {"username": self.obj["username"]}, "CC", "You are not the admin of this group")\
-                .createResponseStr()
-
-    """Returns list of existing groups available in the server"""
-    def listAction(self):
-        # Getting contents of group details file
-        chat_para = self.getFileContents(self.obj["list"]).strip()
-
-        if chat_para is not None and chat_para:
-            # Creating JSON object from group details string
-            all_chat_obj = json.loads(chat_para)
-            groupList = []
-            for user_acc in all_chat_obj["chats"]:
-                groupList.append(user_acc["chat_name"])
-
-            # Creating and returning successful group fetch response
-            return PDUResponse("130", {"username": self.obj["username"]}, "", groupList).createResponseStr()
-        else:
+            return PDUResponse("250", {"username": obj["username"]}, "CC", "You are not the admin of this group")
+
+    """Returns a page of at most count groups whose names start with prefix and sort after cursor (see
+    room_directory.py). A client that already holds the page at the current revision of the directory gets 131"""
+    def listAction(self, obj, handler):
+        directory = self.store.directory
+        revision = directory.revision()
+
+        if revision == 0:
             # Creating and returning failed group fetch response
-            return PDUResponse("240", {"username": self.obj["username"]}, "", "There are currently no groups").createResponseStr()
+            return PDUResponse("240", {"username": obj["username"]}, "", "There are currently no groups")
 
-    """Creates new group and maintains the groups in a file"""
-    def createNewChat(self, handler, client_map):
-        # Load group details file
-        chat_para = self.getFileContents(self.obj["list"]).strip()
+        parameters = {"prefix": obj["prefix"], "cursor": obj["cursor"], "revision": revision}
+        if obj["revision"] == revision:
+            # No group has been created since the client fetched the page
+            return PDUResponse("131", parameters, "", "Group list not modified")
 
-        # Construct JSON from group details string
-        if chat_para is not None and chat_para:
-            all_chat_obj = json.loads(chat_para)
-        else:
-            all_chat_obj = {"chats": []}
-
-        # Checking if group already exists
-        for groupChat in all_chat_obj["chats"]:
-            if groupChat["chat_name"] == self.obj["chat_name"]:
-                return PDUResponse("230", {}, "", "Group name already exists").createResponseStr()
-
-        users = [self.obj["username"]]
-        admins = [self.obj["username"]]
-        new_user = Chat_room(self.obj["chat_name"], users, admins)
-
-        # Updating the all_chat_obj with the new user
-        all_chat_obj["chats"].append(json.loads(json.dumps(new_user.__dict__)))
-
-        # Updating group details
-        file = open(self.obj["list"], "w")
-        file.write(json.dumps(all_chat_obj))
-        file.close()
-
-        # Updating the user accounts file
-        f = open("user_accounts.txt")
-        data = f.read().replace('\n', '').strip()
-        all_users_obj = json.loads(data)
-        for user_acc in all_users_obj["users"]:
-            if user_acc["username"] == self.obj["username"]:
-                # Retrieving admins
-                adminGroups = user_acc["adminGroups"]
-                for i in range(0, len(adminGroups)):
-                    if adminGroups[i] == self.obj["chat_name"]:
-                        break
-                    if len(adminGroups) - 1 == i:
-                        # Adding to list of admins
-                        adminGroups.append(self.obj["chat_name"])
-                if len(adminGroups) == 0:
-                    # Adding to list of admins
-                    adminGroups.append(self.obj["chat_name"])
-                break
-
-        f.close()
-
-        # Writing updated user accounts data back to the file
-        file = open("user_accounts.txt", "w")
-        file.write(json.dumps(all_users_obj))
-        file.close()
+        # Creating and returning successful group fetch response
+        groupList, parameters["next"], parameters["total"] = directory.page(obj["prefix"], obj["cursor"], obj["count"])
+        return PDUResponse("130", parameters, "", groupList)
+
+    """Creates new group and maintains the groups in a file"""
+    def createNewChat(self, obj, handler):
+        # Creating the group with the client as its admin. The store refuses group names that already exist
+        if not self.store.addChat(obj["chat_name"], obj["username"]):
+            return PDUResponse("230", {}, "", "Group name already exists")
 
         # Updating the client_map object
-        for client in client_map["clients"]:
-            if client["username"] == self.obj["username"]:
-                client["chat_name"] = self.obj["chat_name"]
-                client["prev_chat"] = ""
-                client["handler"] = handler
+        self.client_map.join(obj["username"], obj["chat_name"], handler, "")
 
         # Creating and returning group created successfully response
-        return PDUResponse("170", {}, "", "").createResponseStr()
+        return PDUResponse("170", {}, "", "")
 
     """Function responsible for removing user from chat room"""
-    def leaveChat(self, handler, client_map):
+    def leaveChat(self, obj, handler):
 
         # Updating the client_map object
-        for client in client_map["clients"]:
-            if client["username"] == self.obj["username"]:
-                prev_chat = client["chat_name"]
-                client["chat_name"] = ""
-                client["prev_chat"] = prev_chat
-                client["handler"] = handler
-                break
+        self.client_map.moveOut(obj["username"], handler)
 
         # Creating and returning a left group successfully response
-        return PDUResponse("190", {"username": self.obj["username"]}, "",
-                           self.obj["username"] + " has left the chat room").createResponseStr()
+        return PDUResponse("190", {"username": obj["username"]}, "",
+                           obj["username"] + " has left the chat room")
 
     """Function responsible for returning incompatible versions response"""
-    def incompatibleVersion(self):
+    def incompatibleVersion(self, obj, handler):
         # Creating and returning incompatible version response
-        return PDUResponse("330", {}, "CC", "Server is running on a different protocol version").createResponseStr()
+        return PDUResponse("330", {}, "CC", "Server is running on a different protocol version")
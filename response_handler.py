@@ -30,6 +30,12 @@ class ResponseHandler:
             return self.receiveListOfChannelsAction()
         elif resp_code == "140":
             return self.receiveQueuedMessagesAction()
+        elif resp_code == "150":
+            return self.historyPageAction()
+        elif resp_code == "160":
+            return self.serverStatsAction()
+        elif resp_code == "161":
+            return self.profilerAction()
         elif resp_code == "180":
             return self.groupJoinedAction()
         elif resp_code == "190":
@@ -46,6 +52,12 @@ class ResponseHandler:
             return self.banFailedAction()
         elif resp_code == "260":
             return self.kickFailedAction()
+        elif resp_code == "270":
+            return self.serverStatsFailedAction()
+        elif resp_code == "300":
+            return self.invalidRequestAction()
+        elif resp_code == "310":
+            return self.rateLimitedAction()
         elif resp_code == "330":
             return self.incompatibleVersionAction()
 
@@ -71,15 +83,41 @@ class ResponseHandler:
 
     """Prints list of groups"""
     def receiveListOfChannelsAction(self):
-        print "Choose Group"
+        parameters = self.obj.message_parameters
+        if parameters["prefix"]:
+            print "Choose Group (%d starting with %s)" % (parameters["total"], parameters["prefix"])
+        else:
+            print "Choose Group (%d groups)" % parameters["total"]
         chatList = self.obj.payload
         for i in range(0, len(chatList)):
             print i+1, ":", chatList[i]
+        if parameters["next"] is not None:
+            print "..."
 
     """Prints payload"""
     def receiveQueuedMessagesAction(self):
         print self.obj.payload
 
+    """Prints the range of the messages of the group that have been displayed"""
+    def historyPageAction(self):
+        parameters = self.obj.message_parameters
+        if parameters["end"] == parameters["start"]:
+            print "**** No older messages ****"
+        else:
+            print "**** Messages", parameters["start"] + 1, "to", parameters["end"], "of", parameters["total"], "****"
+
+    """Prints the metrics of the server"""
+    def serverStatsAction(self):
+        print self.obj.payload
+
+    """Prints payload, the summary of the profile once the profiler has been switched off"""
+    def profilerAction(self):
+        print self.obj.payload
+
+    """Prints payload"""
+    def serverStatsFailedAction(self):
+        print "****", self.obj.payload, "****"
+
     """Prints payload"""
     def groupCreationFailedAction(self):
         # print self.obj.payload
@@ -100,6 +138,14 @@ class ResponseHandler:
         print "****", self.obj.payload, "****"
         print ""
 
+    """Prints payload"""
+    def invalidRequestAction(self):
+        print "****", self.obj.payload, "****"
+
+    """Prints payload and the seconds after which the request would have been accepted"""
+    def rateLimitedAction(self):
+        print "****", self.obj.payload, "- retry in", self.obj.message_parameters.get("retry"), "seconds ****"
+
     """Prints payload"""
     def incompatibleVersionAction(self):
         print "****", self.obj.payload, "****"
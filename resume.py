@@ -0,0 +1,108 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: resume.py
+
+File summary:
+    The purpose of this file is to let a client whose connection has dropped carry on where it was, without logging in,
+    listing the groups and joining its group again. A successful NWUA or AUTH response (110) holds a token:
+
+        {"token": "9f86d081884c7d659a2feaa0c55ad015"}
+
+    When the connection of the client is closed, its Ticket keeps the group it was in and the sequence number of the
+    last chat message the server had sent at that time (see history.py). A client that connects again within the
+    retention window sends RSUM with the token. It is logged in again as the same user, put back in its group and
+    receives the chat messages of the group it has missed, as long as the MessageHistory still holds them. The 111
+    response to RSUM holds the username, the group and a new token, a token is only used once.
+
+    A token also resumes a session whose connection the server still thinks is open, e.g. when the client noticed the
+    drop first. The session then moves to the new connection, the same way it does for a login on another connection.
+
+    A client that has been kicked or banned from its group while it was away resumes outside of the group. A token is
+    dropped when the user logs in again, when the session has been away for longer than the retention window and when
+    the server restarts, the client then logs in with AUTH. With several worker processes or a broker a token is only
+    known to the process that issued it.
+"""
+
+import binascii
+import os
+from collections import deque
+
+RETENTION = 120.0   # seconds a session that has lost its connection can be resumed
+
+
+"""Ticket holds what a session needs to be resumed"""
+class Ticket:
+
+    """Constructor of Ticket
+    username -> user the token was issued to"""
+    def __init__(self, username):
+        self.username = username
+        self.chat_name = ""         # group the session was in when its connection was closed
+        self.sequence = None        # sequence number of the last chat message sent before the connection was closed
+        self.detached = None        # time the connection was closed, None while it is open
+
+
+"""SessionTokens holds the ticket of every token that can be used to resume a session"""
+class SessionTokens:
+
+    """Constructor of SessionTokens
+    retention -> seconds a session that has lost its connection can be resumed"""
+    def __init__(self, retention=RETENTION):
+        self.retention = retention
+        self.tickets = {}           # token -> Ticket
+        self.tokens = {}            # username -> its token, a user holds a single token
+        self.detached = deque()     # (time, token) of the closed connections, oldest first
+
+    """Returns a new token for username, the token issued before to the user can no longer be used"""
+    def issue(self, username):
+        previous = self.tokens.get(username)
+        if previous is not None:
+            del self.tickets[previous]
+        token = binascii.hexlify(os.urandom(16)).decode('ascii')
+        self.tickets[token] = Ticket(username)
+        self.tokens[username] = token
+        return token
+
+    """Records that the connection of username has been closed while it was in chat_name. sequence is the sequence
+    number of the last chat message sent"""
+    def detach(self, username, chat_name, sequence, now):
+        self.expire(now)
+        token = self.tokens.get(username)
+        if token is None:
+            return
+        ticket = self.tickets[token]
+        ticket.chat_name = chat_name
+        ticket.sequence = sequence
+        ticket.detached = now
+        self.detached.append((now, token))
+
+    """Returns the Ticket of token and drops the token, or None if it cannot be used to resume a session"""
+    def redeem(self, token, now):
+        self.expire(now)
+        ticket = self.tickets.pop(token, None)
+        if ticket is not None:
+            del self.tokens[ticket.username]
+        return ticket
+
+    """Forgets that username was in chat_name when it is taken out of the group while its connection is closed"""
+    def moveOut(self, username, chat_name):
+        token = self.tokens.get(username)
+        if token is not None:
+            ticket = self.tickets[token]
+            if ticket.detached is not None and ticket.chat_name == chat_name:
+                ticket.chat_name = ""
+
+    """Drops the tokens of the sessions whose connection was closed longer than the retention window ago"""
+    def expire(self, now):
+        detached = self.detached
+        deadline = now - self.retention
+        while detached and detached[0][0] < deadline:
+            closed, token = detached.popleft()
+            ticket = self.tickets.get(token)
+
+            # The session may have been resumed, or detached again since
+            if ticket is not None and ticket.detached == closed:
+                del self.tickets[token]
+                del self.tokens[ticket.username]
@@ -0,0 +1,68 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: room_directory.py
+
+File summary:
+    The purpose of this file is to let a client find a group among many without receiving the name of every group. The
+    RoomDirectory keeps the names of the groups sorted, so the names starting with a prefix are a contiguous range that
+    two binary searches find, and a page of that range is a slice of the list.
+
+    LIST returns a page of at most count names starting with prefix, after the name given as cursor. The next parameter
+    of the 130 response is the cursor of the following page, None on the last page. A cursor is a name and not a
+    position, so a group created while a client pages through the list does not shift the pages it has not read yet.
+
+    Groups are never removed, so the number of groups is the revision of the directory. It only changes when CHAT
+    creates a group, and the worker processes of a cluster reach the same revision once the group has been replicated
+    to them (see cluster.py). A client sending the revision of the page it holds gets a 131 response without the names
+    when no group has been created since.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+
+try:
+    unichr
+except NameError:
+    unichr = chr
+
+
+"""RoomDirectory holds the sorted names of all the groups"""
+class RoomDirectory:
+
+    """Constructor of RoomDirectory
+    names -> names of the existing groups, in any order"""
+    def __init__(self, names=()):
+        self.names = sorted(names)
+
+    """Returns the revision of the directory, the number of groups"""
+    def revision(self):
+        return len(self.names)
+
+    """Adds the name of a new group"""
+    def add(self, name):
+        insort(self.names, name)
+
+    """Returns the positions of the first name starting with prefix and of the first name after them"""
+    def prefixRange(self, prefix):
+        names = self.names
+        if not prefix:
+            return 0, len(names)
+        start = bisect_left(names, prefix)
+
+        # The names starting with prefix sort before the prefix with its last character incremented
+        while prefix and ord(prefix[-1]) == 0x10ffff:
+            prefix = prefix[:-1]
+        if not prefix:
+            return start, len(names)
+        return start, bisect_left(names, prefix[:-1] + unichr(ord(prefix[-1]) + 1), start)
+
+    """Returns at most count names starting with prefix and sorting after cursor, the cursor of the next page or None
+    when there are no more names, and the number of names starting with prefix"""
+    def page(self, prefix, cursor, count):
+        start, end = self.prefixRange(prefix)
+        first = start if cursor is None else max(start, bisect_right(self.names, cursor, start, end))
+        last = min(first + count, end)
+        names = self.names[first:last]
+        next_cursor = names[-1] if names and last < end else None
+        return names, next_cursor, end - start
@@ -0,0 +1,79 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: roster.py
+
+File summary:
+    The purpose of this file is to let the members of a group see who else is in it and keep that list up to date
+    without fetching it again. Every group with members has a RoomRoster, kept by the RoutingIndex (see routing.py)
+    from the same membership that routes the responses of the group: a member is added when its session is linked into
+    the group and removed when it is unlinked, whether it left, was kicked or banned, logged in elsewhere or
+    disconnected.
+
+    Every change gives the roster a new revision. The revisions are taken from a counter shared by all the groups of
+    the server, so a group that empties and fills again never hands out a revision it has used before. A change is
+    sent as a delta, a 133 response with the revision it applies to (base), the new revision and the list of changes:
+
+        {"chat_name": "group", "base": 41, "revision": 57}    [["join", "carol"]]
+
+    A client fetches the roster with RSTR, in pages of count usernames after cursor (132 responses with next, total
+    and revision, like LIST). From then on it receives the delta of every change of the group until it leaves the
+    group (the subscribers of the roster), and applies the ones whose base is the revision it holds. A delta with
+    another base means the client has missed some, it then sends RSTR with the revision it holds. The server answers
+    with a single 133 holding all the changes since that revision, or, when the revision is older than the changes it
+    keeps (MAX_CHANGES), with the first page of the roster, which the client replaces its copy with.
+
+    With several worker processes a worker only knows the members connected to it, so the roster lists the local
+    members of the group.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+MAX_CHANGES = 256   # changes kept per group for the clients catching up
+
+
+"""RoomRoster holds the usernames of the members of a single group and its last changes"""
+class RoomRoster:
+
+    """Constructor of RoomRoster
+    revision -> revision of the empty roster"""
+    def __init__(self, revision):
+        self.members = []                           # usernames of the members, sorted
+        self.revision = revision
+        self.changes = deque(maxlen=MAX_CHANGES)    # (base, revision, action, username) oldest first
+        self.subscribers = set()                    # sessions of the members that receive the changes
+
+    """Records that action (join or leave) happened to username at revision, returns the base of the change"""
+    def change(self, action, username, revision):
+        members = self.members
+        position = bisect_left(members, username)
+        present = position < len(members) and members[position] == username
+        if action == "join" and not present:
+            members.insert(position, username)
+        elif action != "join" and present:
+            del members[position]
+        base = self.revision
+        self.revision = revision
+        self.changes.append((base, revision, action, username))
+        return base
+
+    """Returns the changes since revision as a list of [action, username], or None if they are no longer kept"""
+    def changesSince(self, revision):
+        if revision == self.revision:
+            return []
+        changes = list(self.changes)
+        for position, change in enumerate(changes):
+            if change[0] == revision:
+                return [[action, username] for base, changed, action, username in changes[position:]]
+        return None
+
+    """Returns at most count usernames after cursor, the cursor of the next page or None, and the number of members"""
+    def page(self, cursor, count):
+        members = self.members
+        first = 0 if cursor is None else bisect_right(members, cursor)
+        last = min(first + count, len(members))
+        usernames = members[first:last]
+        next_cursor = usernames[-1] if usernames and last < len(members) else None
+        return usernames, next_cursor, len(members)
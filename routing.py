@@ -0,0 +1,259 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: routing.py
+
+File summary:
+    The purpose of this file is to decide which connected clients receive a response. Each connection has a Session
+    holding the clients username, chat_name and prev_chat. The RoutingIndex keeps the sessions indexed by connection,
+    by username and by group, so that a response for a group only touches the members of that group instead of every
+    client connected to the server.
+
+    The JOIN, CHAT, LEVE, KICK and BANN handlers update the index through join and moveOut. chat_name is set to an
+    empty string when a client is kicked, banned or has left the group, and prev_chat keeps the name of that group. Such
+    clients are kept in a separate index per group (lingering) because they still receive the next JOIN, KICK, BANN or
+    LEVE response of the group they were in, after which prev_chat is reset.
+
+    A listener can be set to be told when a group gets its first local session (members or lingering) and when it loses
+    the last one. The multi-process server uses it to subscribe the worker to the groups it has clients in.
+
+    The members of every group are also kept in a RoomRoster (see roster.py), updated whenever a session is linked into
+    or unlinked from the members of a group. The roster_listener is told the changes of the rosters that have
+    subscribers, the ChatService sends them to the members that have fetched the roster.
+"""
+
+from roster import RoomRoster
+
+
+"""Session stores the state of a single connection"""
+class Session:
+    """Constructor of Session"""
+    def __init__(self, handler):
+        self.username = ""          # set once the client has been authenticated
+        self.chat_name = ""         # group that the client is in
+        self.prev_chat = ""         # group that the client was in before being kicked, banned or leaving
+        self.handler = handler      # connection of the client
+
+
+"""RoutingIndex maps connections, usernames and groups to sessions"""
+class RoutingIndex:
+
+    # Commands whose responses only go back to the client that sent the request
+    REPLY_COMMANDS = ["NWUA", "AUTH", "LIST", "CHAT", "REDY", "VRSN", "HIST", "STAT", "PROF", "RSTR", "RSUM"]
+
+    # Commands whose responses also reach the clients that were last in the group (prev_chat)
+    MEMBERSHIP_COMMANDS = ["JOIN", "KICK", "BANN", "LEVE"]
+
+    """Constructor of RoutingIndex"""
+    def __init__(self):
+        self.connections = {}   # handler -> session
+        self.users = {}         # username -> session
+        self.rooms = {}         # chat_name -> set of sessions in the group
+        self.lingering = {}     # chat_name -> set of sessions whose prev_chat is chat_name and chat_name is empty
+
+        # Object with roomOpened(chat_name) and roomClosed(chat_name), or None
+        self.listener = None
+
+        self.rosters = {}       # chat_name -> RoomRoster of the members of the group
+        self.revision = 0       # last revision given to a roster, shared by all the groups
+
+        # Function called with the roster, chat_name, base, revision, action and username on every change of a roster
+        # with subscribers, or None
+        self.roster_listener = None
+
+    """Creates the session of a newly connected client"""
+    def connect(self, handler):
+        session = Session(handler)
+        self.connections[handler] = session
+        return session
+
+    """Removes every trace of a closed connection"""
+    def disconnect(self, handler):
+        session = self.connections.pop(handler, None)
+        if session is None:
+            return
+        self.unlink(session)
+        if session.username != "" and self.users.get(session.username) is session:
+            del self.users[session.username]
+
+    """Returns the session of the given connection, or None"""
+    def getSession(self, handler):
+        return self.connections.get(handler)
+
+    """Returns the session of the given username, or None"""
+    def getUserSession(self, username):
+        return self.users.get(username)
+
+    """Returns the sessions of all the clients in chat_name"""
+    def members(self, chat_name):
+        return self.rooms.get(chat_name, ())
+
+    """Returns the RoomRoster of chat_name, or None when the group has no members"""
+    def roster(self, chat_name):
+        return self.rosters.get(chat_name)
+
+    """Binds username to the session of handler once the client has been authenticated. If the username is already
+    logged in on another connection, the older connection stops receiving responses for its group"""
+    def login(self, username, handler):
+        session = self.connections.get(handler)
+        if session is None:
+            session = self.connect(handler)
+
+        previous = self.users.get(username)
+        if previous is not None and previous is not session:
+            self.unlink(previous)
+            previous.username = ""
+            previous.chat_name = ""
+            previous.prev_chat = ""
+
+        self.unlink(session)
+        session.username = username
+        session.chat_name = ""
+        session.prev_chat = None
+        self.users[username] = session
+        return session
+
+    """Moves username into chat_name. prev_chat defaults to the group the client was in before"""
+    def join(self, username, chat_name, handler, prev_chat=None):
+        session = self.bind(username, handler)
+        if session is None:
+            return None
+
+        if prev_chat is None:
+            prev_chat = session.chat_name
+
+        self.unlink(session)
+        session.chat_name = chat_name
+        session.prev_chat = prev_chat
+        self.link(session)
+        return session
+
+    """Takes username out of its group, used when the client leaves, is kicked or is banned"""
+    def moveOut(self, username, handler=None):
+        if handler is not None:
+            session = self.bind(username, handler)
+        else:
+            session = self.users.get(username)
+        if session is None:
+            return None
+
+        prev_chat = session.chat_name
+        self.unlink(session)
+        session.chat_name = ""
+        session.prev_chat = prev_chat
+        self.link(session)
+        return session
+
+    """Returns the session of username, moving it to handler if the request arrived on a different connection"""
+    def bind(self, username, handler):
+        session = self.users.get(username)
+        if session is None or session.handler is handler:
+            return session
+
+        # Same as a login on the new connection, the group membership moves along with the session
+        old_handler = session.handler
+        if self.connections.get(old_handler) is session:
+            self.connections[old_handler] = Session(old_handler)
+        stale = self.connections.get(handler)
+        if stale is not None and stale is not session:
+            self.unlink(stale)
+        session.handler = handler
+        self.connections[handler] = session
+        return session
+
+    """Returns True if any session is in chat_name or was last in it"""
+    def isOpen(self, chat_name):
+        return chat_name in self.rooms or chat_name in self.lingering
+
+    """Adds session to the group index that matches its chat_name and prev_chat"""
+    def link(self, session):
+        if session.chat_name != "":
+            chat_name, index = session.chat_name, self.rooms
+        elif session.prev_chat:
+            chat_name, index = session.prev_chat, self.lingering
+        else:
+            return
+
+        opened = self.listener is not None and not self.isOpen(chat_name)
+        index.setdefault(chat_name, set()).add(session)
+        if opened:
+            self.listener.roomOpened(chat_name)
+        if index is self.rooms:
+            self.rosterChange(chat_name, "join", session.username)
+
+    """Removes session from the group indexes"""
+    def unlink(self, session):
+        if session.chat_name != "":
+            roster = self.rosters.get(session.chat_name)
+            if roster is not None:
+                roster.subscribers.discard(session)
+            self.discard(self.rooms, session.chat_name, session)
+            self.rosterChange(session.chat_name, "leave", session.username)
+        elif session.prev_chat:
+            self.discard(self.lingering, session.prev_chat, session)
+
+    """Records in the roster of chat_name that username has joined or left the group and tells the roster_listener. The
+    roster is dropped once the group has no members"""
+    def rosterChange(self, chat_name, action, username):
+        roster = self.rosters.get(chat_name)
+        if roster is None:
+            roster = self.rosters[chat_name] = RoomRoster(self.revision)
+        self.revision += 1
+        base = roster.change(action, username, self.revision)
+
+        if chat_name not in self.rooms:
+            del self.rosters[chat_name]
+        elif roster.subscribers and self.roster_listener is not None:
+            self.roster_listener(roster, chat_name, base, self.revision, action, username)
+
+    """Removes session from index[key], dropping the entry when the set becomes empty"""
+    def discard(self, index, key, session):
+        sessions = index.get(key)
+        if sessions is None:
+            return
+        sessions.discard(session)
+        if not sessions:
+            del index[key]
+            if self.listener is not None and not self.isOpen(key):
+                self.listener.roomClosed(key)
+
+    ## STATEFUL - the recipients of a response depend on the state of every session in the group ##
+    """Returns the connections that should receive the response to command.
+    command -> command of the request
+    chat_name -> chat_name parameter of the request
+    response_code -> response code of the response
+    handler -> connection that sent the request"""
+    def recipients(self, command, chat_name, response_code, handler):
+        # Clients that are not in a group only get the responses to their own requests
+        if command in RoutingIndex.REPLY_COMMANDS:
+            return [handler]
+
+        recipients = self.groupRecipients(command, chat_name)
+
+        # The client that failed to join the group is told so even though it is not part of the group
+        if response_code == "240" and handler not in recipients:
+            recipients.append(handler)
+
+        return recipients
+
+    """Returns the connections in chat_name that receive the response to command, leaving out the client that sent the
+    request unless it is part of the group. Used on its own for responses that were relayed from another worker"""
+    def groupRecipients(self, command, chat_name):
+        recipients = []
+        if chat_name == "":
+            return recipients
+
+        # All the clients in the group
+        for session in self.rooms.get(chat_name, ()):
+            recipients.append(session.handler)
+
+        # Clients that were kicked, banned or have left the group get the next membership change of the group once
+        if command in RoutingIndex.MEMBERSHIP_COMMANDS and chat_name in self.lingering:
+            for session in self.lingering.pop(chat_name):
+                session.prev_chat = None
+                recipients.append(session.handler)
+            if self.listener is not None and not self.isOpen(chat_name):
+                self.listener.roomClosed(chat_name)
+
+        return recipients
@@ -9,202 +9,228 @@ File summary:
     connect to the server using the server IP and the port that the server is listening to. The server receives the
     commands from the client, and it is the responsibility of the server to decide what to do with the request.
 
-    Async_chat has been used to detect the terminating character/s in the request stream. Once the server receives the
-    terminating character/s, the found_terminator function gets called after which further request processing can be
-    performed. Additionally, async_chat keeps updating the chat_room object with the clients IP address as well as the
-    port number whenever a new client connects with the server.
+    Two engines can drive the sockets. By default the server runs on asyncio (see aio_server.py), which uses the epoll
+    selector on Linux. The asyncore engine (see asyncore_server.py) is kept as a legacy mode (--engine asyncore), it is
+    also used when asyncio is not available. Both engines hand the decoded requests to the same ChatService (see
+    chat_service.py), so the PDU semantics and response codes do not depend on the engine.
 
-    The client_map object is critical for the proper functioning of the protocol. The chat_room object is updated by
-    async chat. It has all the IP addresses and port numbers of all the clients that are connected to the server. Our
-    code makes use of the chat_room object to update the client_map. The client_map is essentially a map between
-    clients username and the socket details (i.e. the clients IP and port no) in the chat_room.
+    The client_map object is critical for the proper functioning of the protocol. The client_map is essentially a map
+    between clients username and the connection of the client. It is a RoutingIndex that also indexes the clients by
+    group, so that a response for a group is only pushed to the members of the group.
 
+    Each connection has a codec (see pdu_codec.py) for its wire format. Connections start with the 1.0 JSON format, a
+    REDY with version 2.0 switches the connection to length prefixed binary frames. Responses are serialized once per
+    wire format no matter how many clients receive them.
+
+    The user accounts and group details are loaded into a StateStore once when the ChatServer starts. The request
+    handlers use the store for all their lookups. Changes are appended to a journal file, the two files are only rewritten
+    as a snapshot once the journal has grown large enough.
+
+    --workers N runs N asyncio worker processes that share the port and relay the group responses and state changes to
+    each other (see cluster.py), so that the server can use more than one core.
+
+    Responses waiting for a client that does not keep up are held in a bounded queue per connection (see outbound.py).
+    --slow-policy decides what happens once the queue of a client is full. The queued responses of a client are sent
+    with one send call per turn of the event loop, --flush-delay lets them wait a few milliseconds longer for more.
+
+    Passwords are stored as salted PBKDF2 hashes (see credentials.py). --auth-workers threads (or processes) hash and
+    check them, so that a burst of logins does not hold up the chat messages.
+
+    The last --history-messages chat messages of every group are kept in memory and sent to the clients joining the
+    group (see history.py). --history-budget bounds the memory taken by the messages of all the groups.
+
+    Every chat message is also appended to a log on disk in the --message-log directory (see message_log.py), which the
+    clients page through with HIST.
+
+    The server keeps metrics of its requests, connections and queues (see metrics.py). The users given with --admin get
+    them with STAT, --metrics serves them over HTTP on a loopback port or on a Unix socket.
+
+    The admins can also switch a sampling profiler on and off at runtime with PROF, as can SIGUSR1 (see profiler.py).
+    The profiles are written to the --profile-dir directory.
+
+    Several servers on different ports or hosts can share the groups through a broker (see broker.py), every server is
+    started with --broker HOST:PORT|PATH and a unique --node-name (HOST:PORT by default).
+
+    Clients on the binary wire format may negotiate compression with REDY (see pdu_codec.py), the frames longer than
+    --compress-threshold bytes are then deflated. --no-compression keeps every frame uncompressed.
+
+    The requests of the connections are processed in turns. Every connection may send --control-rate requests and
+    --data-rate chat messages per second, every group receives at most --room-rate chat messages per second. Requests
+    over the rates wait for their turn or are rejected with 310 (--rate-policy queue|reject, see inbound.py).
+
+    A connection without requests for --heartbeat seconds is probed, it is closed if the client does not answer within
+    --heartbeat-timeout seconds (see heartbeat.py).
+
+    A client whose connection has dropped can resume its session with the token of its login for --resume-seconds
+    seconds (see resume.py), it then receives the chat messages of its group that it has missed.
+
+    Command to execute the server:
+
+        python server.py [--engine asyncio|asyncore] [--loop MODULE] [--workers N] [--slow-policy drop|disconnect|pause]
+                         [--max-queue-bytes BYTES] [--max-queue-frames FRAMES] [--flush-delay MS] [--no-coalesce]
+                         [--auth-workers N] [--history-messages N] [--history-bytes BYTES]
+                         [--history-budget BYTES] [--message-log DIR | --no-message-log] [--segment-bytes BYTES]
+                         [--admin USERNAME ...] [--metrics PORT|PATH] [--profile-dir DIR] [--profile-rate HZ]
+                         [--compress-threshold BYTES | --no-compression] [--resume-seconds SECONDS]
+                         [--control-rate N] [--data-rate N] [--room-rate N] [--rate-policy queue|reject]
+                         [--heartbeat SECONDS] [--heartbeat-timeout SECONDS]
+                         [--broker HOST:PORT|PATH] [--node-name NAME] [--host HOST] [--port PORT]
 """
 
-import asynchat
-import asyncore
-import socket
-import json
-import request_handler as reqh
-
-## CONCURRENT - the chat_room map accepts and stores multiple client objects ##
-chat_room = {}          # chat_room is being updated by async chat
-client_map = {          # client_map is being updated by the server code
-    "clients": []       # "clients" stores a list of individual clients that are authenticated by the server
-}
-
-"""A new ChatHandler object is created each time a client connects with the server"""
-class ChatHandler(asynchat.async_chat):
-
-    """Constructor of ChatHandler"""
-    def __init__(self, sock, server_obj):
-        # Initialises async_chat with the clients socket as its parameter. chat_room is passed along for it to be updated with the new client details
-        asynchat.async_chat.__init__(self, sock=sock, map=chat_room)
-
-        # Setting up the terminator. So if the response stream ends with this terminator, found_terminator function is called
-        self.set_terminator('\n')
-
-        # Async_chat stores all incoming request streams in the buffer until the terminator has been received
-        self.buffer = []
-
-        # This is the ChatServer classes object
-        self.server_obj = server_obj
-
-    """Collects all incoming data from the client until the terminator string has been received"""
-    def collect_incoming_data(self, data):
-        self.buffer.append(data)
-
-    ## STATEFUL - calls the processRequest function ##
-    """This function is called by async_chat when the terminator, set by set_terminator, is found in the request stream"""
-    def found_terminator(self):
-        # Joins all the values in the buffer as a single string
-        msg = ''.join(self.buffer)
-
-        # Converts the serialized message received from the client back to a JSON object
-        req_obj = json.loads(msg)
-
-        # checking if client and the server are running on the same version of the protocol
-        if req_obj["version"] == self.server_obj.getVersion():
-            # processRequest processes the request by calling the associated function for the command sent by the client
-            # The variable response is a serialized string that is to be sent to all appropriate clients
-            response = self.server_obj.processRequest(req_obj, self)
-
-            # response_obj is the JSON object of the response string
-            response_obj = json.loads(response)
-        else:
-            # The versions of the client and server is not the same. Returns response code associated with incompatible version
-            response = self.server_obj.incompatibleVersion()
-
-        # Iterating through client_map i.e. every client that is connected on the server
-        for client in client_map["clients"]:
-            # When username has not been set, only NWUA and AUTH are valid request commands from the client
-            if client["username"] == "":
-                if req_obj["command"] in ["NWUA", "AUTH"]:      # ignore all other commands
-                    # pushes the response to the client IP and port number. client["handler"] has those client details
-                    client["handler"].push(response)
-
-            # When client has not joined a group or if banned, kicked or has moved out from group
-            elif client["chat_name"] == "" and client["prev_chat"] != req_obj["parameters"]["chat_name"]:
-                # When chat_name = "", only AUTH, LIST, CHAT, JOIN, REDY are valid commands from the client.
-                if req_obj["command"] in ["AUTH", "LIST", "CHAT", "REDY"]:
-                    client["handler"].push(response)
-
-                # If command is JOIN, the response needs to be pushed only when response_code is 240 i.e. when joining a group has failed
-                elif response_obj["response_code"] == "240":
-                    client["handler"].push(response)
-
-            # chat_name is set to an empty string when a client is kicked, banned or has left the group. Thus, the responses
-            # that needs to be sent to such clients would be based on the prev_chat attribute. Prev_chat stores the
-            # chat name of the previous chat that the client was connected to.
-            elif client["chat_name"] == "" and client["prev_chat"] == req_obj["parameters"]["chat_name"]:
-                # chat_name can also be empty when commands form the client is KICK, BANN and LEVE
-                if req_obj["command"] in ["JOIN", "KICK", "BANN", "LEVE"]:
-                    client["prev_chat"] = None
-                    client["handler"].push(response)
-
-            # Sending the response to all the other clients of the group
-            elif client["chat_name"] == req_obj["parameters"]["chat_name"]:
-                client["handler"].push(response)
-
-        # Clearing the buffer array to get ready for the next request
-        self.buffer = []
+import argparse
+import outbound
+import inbound
+import heartbeat
+import pdu_codec
+import history
+import message_log
+import metrics
+import profiler
+import resume
+from chat_service import ChatService
 
 ## SERVICE - hardcoding the port that will serve as the endpoint on the server ##
-"""ChatServer is the class that sets up the server and is responsible for listening to the incoming requests from the client"""
-class ChatServer(asyncore.dispatcher):
-    __host = "127.0.0.1"                    # IP of the server
-    __port = 12345                          # The server will listen to incoming requests on this port
-    __user_file = "./user_accounts.txt"     # File that stores the user credentials
-    __list = "./list.txt"                   # File that stores the group / chat room details
-    __version = 1.0                         # Server protocol version
-
-    """Constructor of ChatServer class"""
-    def __init__(self):
-        # Initializes asyncore dispatcher
-        asyncore.dispatcher.__init__(self, map=chat_room)
-        # Creates a new socket
-        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
-        # Binds server ip and port number
-        self.bind((ChatServer.__host, ChatServer.__port))
-        # Start listening to requests from the client
-        self.listen(5)
-        print 'Server listening on ', ChatServer.__host, ':', ChatServer.__port
-
-    """Returns version number of servers protocol"""
-    def getVersion(self):
-        return self.__version
-
-    ## CONCURRENT - the server accepts multiple connections and stores each new client's details in the client_map ##
-    """Asyncore calls this function when a client makes a connection with the server"""
-    def handle_accept(self):
-        # pair is a tuple of the client socket and port number
-        pair = self.accept()
-        if pair is not None:
-            sock, addr = pair
-            print 'Incoming connection from %s' % repr(addr)
-
-            # Creating a new instance of ChatHandler when a new client connects with the server
-            handler = ChatHandler(sock, self)
-
-            # Updating the client_map with the details of the new client that has connected with the server.
-            # Only the handler field is filled as the username, chat_name and prev_chat details won't exist when the
-            # client first connects with the server
-            client_map["clients"].append({
-                "username": "",
-                "chat_name": "",
-                "prev_chat": "",
-                "handler": handler
-            })
-
-    """Processes the requests from the client i.e. appropriate function is called on the RequestHandler class based
-    on the command"""
-    def processRequest(self, req_obj, handler):
-        command = req_obj["command"]
-
-        # Preparing a JSON object, obj, to be used by RequestHandler functions with different parameters based on the command
-        obj = {
-            "username": req_obj["parameters"]["username"]
-        }
-        if command == "AUTH" or command == "NWUA":
-            obj["password"] = req_obj["parameters"]["password"]
-            obj["filename"] = self.__user_file
-
-        elif command == "LIST":
-            obj["list"] = self.__list
-
-        elif command == "CHAT":
-            obj["chat_name"] = req_obj["parameters"]["chat_name"]
-            obj["list"] = self.__list
-
-        elif command == "JOIN":
-            obj["chat_name"] = req_obj["parameters"]["chat_name"]
-            obj["list"] = self.__list
-
-        elif command == "BANN":
-            obj["chat_name"] = req_obj["parameters"]["chat_name"]
-            obj["banned_user"] = req_obj["parameters"]["banned_user"]
-            obj["filename"] = self.__user_file
-            obj["list"] = self.__list
-
-        elif command == "KICK":
-            obj["chat_name"] = req_obj["parameters"]["chat_name"]
-            obj["kicked_user"] = req_obj["parameters"]["kicked_user"]
-            obj["filename"] = self.__user_file
-            obj["list"] = self.__list
-
-        elif command == "MSSG":
-            obj["payload"] = req_obj["payload"]
-
-        reqh_obj = reqh.RequestHandler(obj)
-        # Returns response string
-        return reqh_obj.run_command(command, handler, client_map)
-
-    def incompatibleVersion(self):
-        reqh_obj = reqh.RequestHandler()
-        # Returns response string
-        return reqh_obj.run_command("VRSN", "", "")
-
-# initializing the ChatServer class
-server = ChatServer()
-# Enter a polling loop that terminates after all channels have been closed
-asyncore.loop(map=chat_room)
+HOST = "127.0.0.1"      # IP of the server
+PORT = 12345            # The server will listen to incoming requests on this port
+
+
+"""Returns the command line options of the server"""
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Chat Service Protocol server")
+    parser.add_argument("--engine", choices=["asyncio", "asyncore"], default=None,
+                        help="event loop driving the sockets, asyncio unless it is not available")
+    parser.add_argument("--loop", default=None,
+                        help="module providing an asyncio EventLoopPolicy, e.g. uvloop (asyncio engine only)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes sharing the port (asyncio engine only)")
+    parser.add_argument("--max-queue-bytes", type=int, default=1048576,
+                        help="most bytes waiting to be sent to a single client")
+    parser.add_argument("--max-queue-frames", type=int, default=4096,
+                        help="most frames waiting to be sent to a single client")
+    parser.add_argument("--slow-policy", choices=outbound.POLICIES, default="drop",
+                        help="what happens when the queue of a client is full: drop the oldest chat messages, "
+                             "disconnect the client or pause its chat messages until it catches up")
+    parser.add_argument("--flush-delay", type=float, default=0.0,
+                        help="most milliseconds a response waits to be sent along with other responses, 0 sends the "
+                             "responses once per turn of the event loop")
+    parser.add_argument("--no-coalesce", action="store_true",
+                        help="send every response with its own send call as soon as it is ready")
+    parser.add_argument("--auth-workers", type=int, default=4,
+                        help="number of workers hashing and checking passwords, 0 hashes them on the event loop")
+    parser.add_argument("--history-messages", type=int, default=100,
+                        help="most chat messages kept for a group and sent to the clients joining it, 0 keeps none")
+    parser.add_argument("--history-bytes", type=int, default=65536,
+                        help="most bytes of chat messages kept for a group")
+    parser.add_argument("--history-budget", type=int, default=16777216,
+                        help="most bytes of chat messages kept for all the groups together")
+    parser.add_argument("--message-log", default="./messages",
+                        help="directory the chat messages of every group are appended to")
+    parser.add_argument("--no-message-log", action="store_true", help="do not keep the chat messages on disk")
+    parser.add_argument("--segment-bytes", type=int, default=message_log.SEGMENT_BYTES,
+                        help="size at which the message log of a group starts a new segment file")
+    parser.add_argument("--admin", action="append", default=[], metavar="USERNAME",
+                        help="user allowed to read the metrics of the server with STAT, can be given several times")
+    parser.add_argument("--metrics", default=None, metavar="PORT|PATH",
+                        help="serve the metrics over HTTP on this loopback port or Unix socket path, worker N of "
+                             "--workers uses PORT + N or PATH.N")
+    parser.add_argument("--profile-dir", default="./profiles",
+                        help="directory the profiles are written to when the profiler is switched off")
+    parser.add_argument("--profile-rate", type=float, default=profiler.RATE,
+                        help="samples per second taken by the profiler while it is on")
+    parser.add_argument("--compress-threshold", type=int, default=pdu_codec.COMPRESS_BYTES,
+                        help="frames with a longer body are compressed for the clients that negotiated compression")
+    parser.add_argument("--no-compression", action="store_true", help="do not negotiate compression with the clients")
+    parser.add_argument("--resume-seconds", type=float, default=resume.RETENTION,
+                        help="seconds a session that has lost its connection can be resumed, 0 issues no tokens")
+    parser.add_argument("--control-rate", type=float, default=20.0,
+                        help="control channel requests per second of a connection, 0 for no limit")
+    parser.add_argument("--data-rate", type=float, default=20.0,
+                        help="chat messages per second of a connection, 0 for no limit")
+    parser.add_argument("--room-rate", type=float, default=200.0,
+                        help="chat messages per second sent to a group by all its members, 0 for no limit")
+    parser.add_argument("--rate-policy", choices=inbound.POLICIES, default="queue",
+                        help="what happens to a request over the rates: it waits for a token or is rejected with 310")
+    parser.add_argument("--heartbeat", type=float, default=heartbeat.INTERVAL,
+                        help="seconds without a request before a connection is probed, 0 never probes")
+    parser.add_argument("--heartbeat-timeout", type=float, default=heartbeat.TIMEOUT,
+                        help="seconds a probed connection has to answer before it is closed")
+    parser.add_argument("--broker", default=None, metavar="HOST:PORT|PATH",
+                        help="share the groups with the other servers connected to this broker (asyncio engine only)")
+    parser.add_argument("--node-name", default=None,
+                        help="name of this server at the broker, unique among the servers, HOST:PORT by default")
+    parser.add_argument("--host", default=HOST, help="IP the server listens on")
+    parser.add_argument("--port", type=int, default=PORT, help="port the server listens on")
+    return parser.parse_args(argv)
+
+
+"""Starts the server with the engine selected on the command line"""
+def main(argv=None):
+    args = parse_args(argv)
+    limits = outbound.OutboundLimits(args.max_queue_bytes, args.max_queue_frames, args.slow_policy,
+                                     args.flush_delay / 1000.0, not args.no_coalesce)
+    service_options = {
+        "outbound_limits": limits,
+        "auth_workers": args.auth_workers,
+        "history_limits": history.HistoryLimits(args.history_messages, args.history_bytes, args.history_budget),
+        "log_directory": None if args.no_message_log else args.message_log,
+        "segment_bytes": args.segment_bytes,
+        "admins": args.admin,
+        "profile_directory": args.profile_dir,
+        "profile_rate": args.profile_rate,
+        "compress_threshold": None if args.no_compression else args.compress_threshold,
+        "resume_seconds": args.resume_seconds,
+        "rate_limits": inbound.RateLimits(args.control_rate, args.data_rate, args.room_rate, args.rate_policy),
+        "heartbeats": heartbeat.Heartbeats(args.heartbeat, args.heartbeat_timeout),
+    }
+
+    engine = args.engine
+    if engine is None:
+        try:
+            import asyncio
+            engine = "asyncio"
+        except ImportError:
+            engine = "asyncore"
+
+    if args.broker and engine != "asyncio":
+        raise SystemExit("--broker requires the asyncio engine")
+
+    if args.workers > 1:
+        if engine != "asyncio":
+            raise SystemExit("--workers requires the asyncio engine")
+        if args.broker:
+            raise SystemExit("--workers cannot be used with --broker")
+        import cluster
+        # Every worker process creates its own ChatService
+        cluster.run(args.workers, args.host, args.port, args.loop, args.metrics, **service_options)
+    else:
+        service = ChatService(**service_options)
+
+        # SIGUSR1 switches the profiler on and off
+        profiler.toggleOnSignal(service.profiler)
+        try:
+            if engine == "asyncio":
+                import aio_server
+                startup = None
+                if args.broker:
+                    import broker
+                    # The groups are shared with the other servers connected to the broker
+                    link = broker.BrokerLink(service, broker.brokerAddress(args.broker),
+                                             args.node_name or "%s:%d" % (args.host, args.port))
+                    startup = link.start
+                aio_server.run(service, args.host, args.port, args.loop, startup=startup,
+                               metrics_address=metrics.endpointAddress(args.metrics))
+            else:
+                import asyncore_server
+                # initializing the ChatServer class
+                server = asyncore_server.ChatServer(service, args.host, args.port,
+                                                    metrics.endpointAddress(args.metrics))
+                server.serve_forever()
+        finally:
+            service.close()
+
+            # Calls and processing time of every command since the server started
+            print(service.registry.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: state_store.py
+
+File summary:
+    The purpose of this file is to keep the user accounts and the group details in memory. The server loads both files
+    once when it starts and the request handlers do all their lookups against the StateStore object instead of reading
+    and parsing the files on every request.
+
+    The users and the chats are kept in the same JSON layout as the files ({"users": [...]} and {"chats": [...]}), so the
+    files can be written back without any conversion. The users and chats dicts index those same objects by username and
+    by chat_name. Reading never touches the disk.
+
+    Every change is recorded in the Journal as a single record and applied to the in-memory state by apply. The two
+    files are the snapshot that the journal is replayed on top of when the server starts. They are only rewritten when
+    the journal is compacted, and each of them is written to a temporary file first and renamed into place so that a
+    crash never leaves a half written snapshot. The snapshot is serialized on the event loop, where the state changes,
+    and written and synced by the syncer thread of the journal while the following records go to a new journal file
+    (see journal.py). Applying a record twice has no effect, so a crash between writing the snapshot and deleting the
+    rotated journal is harmless.
+
+    When the server runs several worker processes, each of them has a StateStore. Only one of them is writable, it is
+    the only one that appends to the journal and compacts it. The others read the files at startup and receive the
+    changes made by the other workers through the replicate callback (see cluster.py).
+
+    The users dict is the username index that logins are checked against. Passwords are stored as salted hashes (see
+    credentials.py). Accounts still holding a plaintext password are migrated once by the writable store when it is
+    loaded, and the snapshot is rewritten right away so that the plaintext passwords do not stay on disk.
+
+    The directory keeps the names of the groups sorted for LIST (see room_directory.py). It is updated by apply, so the
+    groups created by the other workers are listed as well.
+"""
+
+import json
+import os
+import credentials
+from user import User
+from chat_room import Chat_room
+from journal import Journal
+from room_directory import RoomDirectory
+
+
+"""StateStore holds the authoritative copy of the user accounts and group details while the server is running"""
+class StateStore:
+
+    """Constructor of StateStore
+    user_file -> file that stores the user credentials
+    list_file -> file that stores the group / chat room details
+    journal_file -> file that the changes since the last snapshot are appended to
+    compact_every -> number of journal records after which a new snapshot is written
+    writable -> False if another process appends to the journal and compacts it"""
+    def __init__(self, user_file, list_file, journal_file, compact_every=1000, writable=True):
+        self.user_file = user_file
+        self.list_file = list_file
+        self.journal = Journal(journal_file)
+        self.compact_every = compact_every
+        self.writable = writable
+
+        # Called with every record made by this store, or None
+        self.replicate = None
+
+        # Same layout as the files. The lists keep the order in which users and groups were created
+        self.all_users_obj = {"users": []}
+        self.all_chat_obj = {"chats": []}
+
+        # Indexes over the objects in the lists above
+        self.users = {}     # username -> user account object
+        self.chats = {}     # chat_name -> group details object
+        self.directory = RoomDirectory()    # sorted chat names
+
+        self.load()
+
+    """Reads both files once and builds the indexes"""
+    def load(self):
+        users_str = self.readFile(self.user_file)
+        chats_str = self.readFile(self.list_file)
+
+        if users_str:
+            self.all_users_obj = json.loads(users_str)
+        if chats_str:
+            self.all_chat_obj = json.loads(chats_str)
+
+        self.users = {}
+        for user_acc in self.all_users_obj["users"]:
+            self.users[user_acc["username"]] = user_acc
+
+        self.chats = {}
+        for chat in self.all_chat_obj["chats"]:
+            self.chats[chat["chat_name"]] = chat
+        self.directory = RoomDirectory(self.chats)
+
+        # Changes made after the snapshot was written
+        # Only the writable store, which appends to the journal, cuts a partial last record off
+        for record in self.journal.replay(self.writable):
+            self.apply(record)
+
+        if self.writable and self.migratePasswords():
+            self.compact()
+        elif self.writable and self.journal.count >= self.compact_every:
+            self.compact()
+
+    """Replaces the plaintext passwords of the accounts created before the passwords were hashed. Returns True if any
+    password has been replaced"""
+    def migratePasswords(self):
+        migrated = False
+        for user_acc in self.all_users_obj["users"]:
+            if not credentials.isHashed(user_acc["password"]):
+                self.record({"op": "password", "username": user_acc["username"],
+                             "password": credentials.hashPassword(user_acc["password"])})
+                migrated = True
+        return migrated
+
+    """Returns the contents of filename, or an empty string if the file does not exist yet"""
+    def readFile(self, filename):
+        if not os.path.isfile(filename):
+            return ""
+        with open(filename, 'r') as myfile:
+            return myfile.read().replace('\n', '').strip()
+
+    """Writes the JSON document data to filename. The data is written to a temporary file which then replaces filename,
+    so filename always holds either the old or the new document"""
+    def writeFile(self, filename, data):
+        tmp_filename = filename + ".tmp"
+        file = open(tmp_filename, "w")
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+        file.close()
+        os.rename(tmp_filename, filename)
+
+    """Writes a snapshot of the user accounts and group details and starts an empty journal. The objects are serialized
+    right away, the files are written by the syncer thread of the journal. Does nothing while the previous snapshot is
+    being written"""
+    def compact(self):
+        if self.journal.compacting:
+            return
+        users_str = json.dumps(self.all_users_obj)
+        chats_str = json.dumps(self.all_chat_obj)
+
+        def write():
+            self.writeFile(self.user_file, users_str)
+            self.writeFile(self.list_file, chats_str)
+        self.journal.rotate(write)
+
+    """Closes the journal, called when the server stops"""
+    def close(self):
+        self.journal.close()
+
+    """Applies record to the in-memory state, persists it and hands it to the replicate callback"""
+    def record(self, record):
+        self.apply(record)
+        self.persist(record)
+        if self.replicate is not None:
+            self.replicate(record)
+
+    """Appends record to the journal and compacts the journal when it is due. Does nothing if the store is not writable"""
+    def persist(self, record):
+        if not self.writable:
+            return
+        self.journal.append(record)
+        if self.journal.count >= self.compact_every:
+            self.compact()
+
+    ## STATEFUL - every change to the user accounts and group details goes through apply ##
+    """Applies a single journal record to the in-memory state. Records that are already part of the state are ignored.
+    Returns True if the record has changed the state"""
+    def apply(self, record):
+        op = record["op"]
+        changed = False
+
+        # New user account
+        if op == "user":
+            if record["username"] not in self.users:
+                new_user = User(record["username"], record["password"], [], []).__dict__
+                self.all_users_obj["users"].append(new_user)
+                self.users[record["username"]] = new_user
+                changed = True
+
+        # New password of a user account
+        elif op == "password":
+            user_acc = self.users.get(record["username"])
+            if user_acc is not None and user_acc["password"] != record["password"]:
+                user_acc["password"] = record["password"]
+                changed = True
+
+        # New group, its creator is its only user
+        elif op == "chat":
+            if record["chat_name"] not in self.chats:
+                new_chat = Chat_room(record["chat_name"], [record["username"]], [], [], []).__dict__
+                self.all_chat_obj["chats"].append(new_chat)
+                self.chats[record["chat_name"]] = new_chat
+                self.directory.add(record["chat_name"])
+                changed = True
+
+        # User made admin of a group
+        elif op == "admin":
+            chat = self.chats.get(record["chat_name"])
+            if chat is not None and record["username"] not in chat["admins"]:
+                chat["admins"].append(record["username"])
+                changed = True
+
+            user_acc = self.users.get(record["username"])
+            if user_acc is not None and record["chat_name"] not in user_acc["adminGroups"]:
+                user_acc["adminGroups"].append(record["chat_name"])
+                changed = True
+
+        # User banned from a group
+        elif op == "ban":
+            chat = self.chats.get(record["chat_name"])
+            if chat is not None and record["username"] not in chat["banned_users"]:
+                chat["banned_users"].append(record["username"])
+                changed = True
+
+            user_acc = self.users.get(record["username"])
+            if user_acc is not None and record["chat_name"] not in user_acc["bannedGroups"]:
+                user_acc["bannedGroups"].append(record["chat_name"])
+                changed = True
+
+        return changed
+
+    """Returns the user account object for username, or None"""
+    def getUser(self, username):
+        return self.users.get(username)
+
+    """Returns the group details object for chat_name, or None"""
+    def getChat(self, chat_name):
+        return self.chats.get(chat_name)
+
+    """Returns True when at least one user account exists"""
+    def hasUsers(self):
+        return len(self.users) > 0
+
+    """Returns the names of all the groups in the order they were created"""
+    def chatNames(self):
+        return [chat["chat_name"] for chat in self.all_chat_obj["chats"]]
+
+    """Creates a new user account, password is the hashed password. Returns False if the username already exists"""
+    def addUser(self, username, password):
+        if username in self.users:
+            return False
+
+        self.record({"op": "user", "username": username, "password": password})
+        return True
+
+    """Replaces the hashed password of username"""
+    def setPassword(self, username, password):
+        if username in self.users:
+            self.record({"op": "password", "username": username, "password": password})
+
+    """Creates a new group with username as its only user and admin. Returns False if the group already exists"""
+    def addChat(self, chat_name, username):
+        if chat_name in self.chats:
+            return False
+
+        self.record({"op": "chat", "chat_name": chat_name, "username": username})
+
+        # The creator of the group is its admin
+        self.record({"op": "admin", "chat_name": chat_name, "username": username})
+        return True
+
+    """Returns True if username is an admin of chat_name"""
+    def isAdmin(self, chat_name, username):
+        chat = self.chats.get(chat_name)
+        return chat is not None and username in chat["admins"]
+
+    """Returns True if username has been banned from chat_name"""
+    def isBanned(self, chat_name, username):
+        chat = self.chats.get(chat_name)
+        return chat is not None and username in chat["banned_users"]
+
+    """Records that banned_user has been banned from chat_name, both on the group and on the user account"""
+    def banUser(self, chat_name, banned_user):
+        if chat_name in self.chats:
+            self.record({"op": "ban", "chat_name": chat_name, "username": banned_user})
@@ -0,0 +1,106 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: tests/test_inbound.py
+
+File summary:
+    Tests of the InboundQueue and the RequestScheduler (see inbound.py) on frames longer than the backlog of a
+    connection. The scheduler is driven the way the engines drive it, without sockets.
+
+    Command to execute the tests:
+
+        python -m unittest discover tests
+"""
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pdu_codec
+from inbound import InboundQueue, RateLimits, RequestScheduler
+
+
+"""Service stands in for the ChatService, it records the requests it is handed"""
+class Service:
+
+    def __init__(self):
+        self.registry = self
+        self.commands = {}
+        self.requests = []
+
+    def handleRequest(self, request, handler):
+        self.requests.append(request)
+
+
+"""Handler stands in for the connection of an engine"""
+class Handler:
+
+    def __init__(self, limits):
+        self.codec = pdu_codec.CODECS[1.0]
+        self.inbound = InboundQueue(limits, 0.0)
+        self.pushed = []
+        self.aborted = False
+
+    """Feeds data the way the engines do, the connection is no longer read when feed returns False"""
+    def receive(self, scheduler, data):
+        if not self.inbound.feed(data):
+            self.inbound.reading = False
+        scheduler.add(self)
+
+    def resumeReading(self):
+        pass
+
+    def push(self, frame, droppable=False):
+        self.pushed.append(frame)
+
+    def abort(self):
+        self.aborted = True
+        self.inbound.closed = True
+
+
+"""Returns the JSON frame of a MSSG request with a payload of size bytes"""
+def frame(size):
+    request = {"version": 1.0, "command": "MSSG", "parameters": {"username": "alice", "chat_name": "room"},
+               "channel": "DC", "payload": "x" * size}
+    return json.dumps(request).encode("utf-8") + b"\n"
+
+
+class FrameLongerThanBacklogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.limits = RateLimits(0, 0, 0, backlog=1024, max_frame=8192)
+        self.service = Service()
+        self.scheduler = RequestScheduler(self.service, self.limits)
+        self.handler = Handler(self.limits)
+
+    """A frame longer than the backlog keeps its connection read until it is complete"""
+    def testLongFrameIsRead(self):
+        data = frame(4000) + frame(10)
+        for start in range(0, len(data), 512):
+            self.handler.receive(self.scheduler, data[start:start + 512])
+            self.scheduler.run(0.0)
+            self.assertTrue(self.handler.inbound.reading)
+
+        self.assertEqual([len(request["payload"]) for request in self.service.requests], [4000, 10])
+        self.assertFalse(self.handler.aborted)
+
+    """A frame longer than max_frame closes its connection instead of being held in memory"""
+    def testFrameOverLimitCloses(self):
+        data = frame(20000)
+        for start in range(0, len(data), 512):
+            if self.handler.aborted:
+                break
+            self.handler.receive(self.scheduler, data[start:start + 512])
+            self.scheduler.run(0.0)
+
+        self.assertTrue(self.handler.aborted)
+        self.assertEqual(self.service.requests, [])
+        self.assertLessEqual(len(self.handler.inbound.buffer), self.limits.max_frame + 512)
+
+
+if __name__ == "__main__":
+    unittest.main()
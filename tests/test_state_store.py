@@ -0,0 +1,81 @@
+"""
+CS 544 - Computer Networks
+10.18.2026
+Project Name: Chat Service Protocol
+File: tests/test_state_store.py
+
+File summary:
+    Tests of the compaction of the StateStore (see state_store.py), whose snapshot is written by the syncer thread of
+    the Journal while the following records go to a new journal file (see journal.py), and of the recovery from a
+    crash in the middle of it.
+
+    Command to execute the tests:
+
+        python -m unittest discover tests
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from state_store import StateStore
+
+
+class CompactionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.user_file = os.path.join(self.directory, "users.txt")
+        self.list_file = os.path.join(self.directory, "list.txt")
+        self.journal_file = os.path.join(self.directory, "journal.txt")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def load(self):
+        return StateStore(self.user_file, self.list_file, self.journal_file, compact_every=3)
+
+    """Records appended while the snapshot is written go to the new journal and are not lost"""
+    def testRecordsDuringCompaction(self):
+        store = self.load()
+        for index in range(5):
+            store.addUser("user%d" % index, "pw")
+        store.close()
+
+        self.assertFalse(os.path.exists(self.journal_file + ".old"))
+        with open(self.user_file) as myfile:
+            self.assertEqual(len(json.load(myfile)["users"]), 3)
+
+        store = self.load()
+        self.assertEqual(sorted(store.users), ["user%d" % index for index in range(5)])
+        store.close()
+
+    """A rotated journal left behind by a crash is replayed and merged back into the journal. The plaintext password
+    it holds is migrated, which compacts the journal into a new snapshot"""
+    def testCrashBeforeSnapshot(self):
+        with open(self.journal_file + ".old", "w") as myfile:
+            myfile.write(json.dumps({"op": "user", "username": "early", "password": "pw"}) + "\n")
+            myfile.write('{"op": "user", "user')
+        with open(self.journal_file, "w") as myfile:
+            myfile.write(json.dumps({"op": "chat", "chat_name": "room", "username": "early"}) + "\n")
+
+        store = self.load()
+        self.assertEqual(list(store.users), ["early"])
+        self.assertEqual(list(store.chats), ["room"])
+        store.close()
+
+        self.assertFalse(os.path.exists(self.journal_file + ".old"))
+        store = self.load()
+        self.assertEqual(store.journal.count, 0)
+        self.assertEqual(list(store.users), ["early"])
+        self.assertEqual(list(store.chats), ["room"])
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()